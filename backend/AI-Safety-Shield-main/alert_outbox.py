@@ -0,0 +1,289 @@
+# alert_outbox.py
+"""
+Durable outbox for WhatsApp alerts (transactional outbox in ai_shield.sqlite).
+
+enqueue(...) is the only thing the detection loop does: one small local transaction
+that inserts the `alerts` row (delivered = NULL) and one `outbox` row per recipient.
+No network I/O happens on the caller's thread, and the alert survives a crash or a
+network outage as soon as enqueue returns.
+
+A background sender thread picks due outbox rows, sends them through the shared
+WasenderDispatcher (all recipients concurrently) and records the outcome in the
+existing alerts table (delivered + delivery_meta JSON). Failed sends are retried with
+exponential backoff for up to MAX_ATTEMPTS; pending rows are picked up again after a
+restart.
+
+Delivery is at-least-once; event IDs deduplicate: enqueueing the same event_id again
+(same alert reported twice, a retry after a crash, ...) is a no-op.
+
+Each number also gets at most one message per COOLDOWN_SECONDS (the same setting
+whatsapp_wasender uses for direct sends), counted from the last outbox row for that
+number, so re-entering DANGER (or several cameras doing it) doesn't send a burst. A
+suppressed alert is still logged in `alerts` (delivered = 0, state "cooldown").
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from alert_store import ALERT_DB, connect, ensure_schema, utc_ts
+
+# --- CONFIGURATION ---
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))   # seconds between scans when idle
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))      # then the alert is marked failed
+RETRY_BASE = 5              # seconds; delay before attempt n is ~RETRY_BASE * 2**(n-1), capped
+RETRY_MAX = 600
+LEASE_SECONDS = 120         # a claimed row not finished within this is claimed again
+BATCH_SIZE = 16
+COOLDOWN_SECONDS = int(os.getenv("COOLDOWN_SECONDS", "60"))    # per target; see whatsapp_wasender
+
+
+def ensure_outbox_schema(conn):
+    ensure_schema(conn)
+    with conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                            id INTEGER NOT NULL,
+                            event_id VARCHAR(64) NOT NULL,
+                            alert_id INTEGER,
+                            target VARCHAR(64) NOT NULL,
+                            message TEXT NOT NULL,
+                            status VARCHAR(16) NOT NULL DEFAULT 'pending',
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            next_attempt FLOAT NOT NULL,
+                            lease_until FLOAT,
+                            last_error TEXT,
+                            created FLOAT NOT NULL,
+                            PRIMARY KEY (id),
+                            UNIQUE (event_id, target))""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (status, next_attempt)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_outbox_target ON outbox (target, created)")
+
+
+class AlertOutbox:
+    def __init__(self, path=ALERT_DB, dispatcher=None, poll_interval=POLL_INTERVAL,
+                 max_attempts=MAX_ATTEMPTS, batch_size=BATCH_SIZE, cooldown=COOLDOWN_SECONDS):
+        """
+        dispatcher: WasenderDispatcher-like object with submit(number, message) -> Future.
+        cooldown: minimum seconds between two queued messages to the same target (0 = off).
+        """
+        self.path = path
+        self._dispatcher = dispatcher
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, int(max_attempts))
+        self.batch_size = max(1, int(batch_size))
+        self.cooldown = max(0.0, float(cooldown))
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        ensure_outbox_schema(self._conn())
+
+        # counters
+        self.enqueued = 0
+        self.duplicates = 0
+        self.suppressed = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    @property
+    def dispatcher(self):
+        if self._dispatcher is None:
+            from whatsapp_wasender import get_dispatcher
+            self._dispatcher = get_dispatcher()
+        return self._dispatcher
+
+    # ---------- hot path ----------
+    def enqueue(self, message, targets, score, reason=None, lat=None, lon=None, event_id=None):
+        """
+        Durably queue an alert for every target. Returns (event_id, rows_added);
+        rows_added is 0 if this event_id was already queued or every target is in cooldown.
+        """
+        if isinstance(targets, str):
+            targets = [targets]
+        event_id = event_id or uuid.uuid4().hex
+        conn = self._conn()
+        added = suppressed = 0
+        # one transaction: alerts row + outbox rows, or nothing. IMMEDIATE takes the write
+        # lock up front, so the cooldown check and the insert can't interleave with another
+        # writer (a second server worker, main_surveillance.py) on the same file.
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()       # after the lock: compared with rows other writers just added
+        try:
+            for target in targets:
+                if conn.execute("SELECT 1 FROM outbox WHERE event_id = ? AND target = ?",
+                                (event_id, target)).fetchone():
+                    continue
+                if self.cooldown:
+                    last = conn.execute("SELECT MAX(created) FROM outbox WHERE target = ?",
+                                        (target,)).fetchone()[0]
+                    if last is not None and now - last < self.cooldown:
+                        conn.execute(
+                            "INSERT INTO alerts (ts, score, reason, target, delivered, delivery_meta, lat, lon) "
+                            "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                            (utc_ts(now), int(score), reason, target,
+                             json.dumps({"event_id": event_id, "state": "cooldown",
+                                         "retry_after": round(self.cooldown - (now - last), 1)}), lat, lon))
+                        suppressed += 1
+                        continue
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO outbox (event_id, target, message, next_attempt, created) "
+                    "VALUES (?, ?, ?, ?, ?)", (event_id, target, message, now, now))
+                if cur.rowcount != 1:
+                    continue
+                row_id = cur.lastrowid
+                alert = conn.execute(
+                    "INSERT INTO alerts (ts, score, reason, target, delivered, delivery_meta, lat, lon) "
+                    "VALUES (?, ?, ?, ?, NULL, ?, ?, ?)",
+                    (utc_ts(now), int(score), reason, target, json.dumps({"event_id": event_id, "state": "queued"}),
+                     lat, lon))
+                conn.execute("UPDATE outbox SET alert_id = ? WHERE id = ?", (alert.lastrowid, row_id))
+                added += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.suppressed += suppressed
+        if added:
+            self.enqueued += added
+            self._wake.set()
+        elif not suppressed:
+            self.duplicates += 1
+        return event_id, added
+
+    # ---------- sender ----------
+    def _claim(self, now):
+        """Lease up to batch_size due rows (so a second process won't send them too)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """SELECT id, alert_id, event_id, target, message, attempts FROM outbox
+                   WHERE status = 'pending' AND next_attempt <= ?
+                     AND (lease_until IS NULL OR lease_until < ?)
+                   ORDER BY next_attempt LIMIT ?""", (now, now, self.batch_size)).fetchall()
+            conn.executemany("UPDATE outbox SET lease_until = ? WHERE id = ?",
+                             [(now + LEASE_SECONDS, r[0]) for r in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _retry_delay(self, attempts):
+        return random.uniform(0.5, 1.0) * min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+
+    def process_once(self, now=None):
+        """Send every due row once. Returns the number of rows attempted."""
+        now = time.time() if now is None else now
+        rows = self._claim(now)
+        if not rows:
+            return 0
+
+        # fan out: every recipient at the same time
+        futures = [self.dispatcher.submit(target, message) for _, _, _, target, message, _ in rows]
+        updates, alert_updates = [], []
+        for (row_id, alert_id, event_id, target, _, attempts), fut in zip(rows, futures):
+            attempts += 1
+            try:
+                result = fut.result()
+            except Exception as e:
+                result = {"to": target, "ok": False, "status": None, "response": str(e)}
+            meta = dict(result, event_id=event_id, outbox_attempts=attempts)
+            if result.get("ok"):
+                self.delivered += 1
+                updates.append(("sent", attempts, now, None, row_id))
+                alert_updates.append((True, json.dumps(meta), alert_id))
+            elif attempts >= self.max_attempts:
+                self.failed += 1
+                print(f"[outbox] Giving up on {target} for event {event_id} after {attempts} attempts")
+                updates.append(("failed", attempts, now, str(result.get("response")), row_id))
+                alert_updates.append((False, json.dumps(meta), alert_id))
+            else:
+                self.retried += 1
+                updates.append(("pending", attempts, time.time() + self._retry_delay(attempts),
+                                str(result.get("response")), row_id))
+                meta["state"] = "retrying"
+                alert_updates.append((None, json.dumps(meta), alert_id))
+
+        conn = self._conn()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, "
+                    "lease_until = NULL WHERE id = ?", updates)
+                conn.executemany("UPDATE alerts SET delivered = ?, delivery_meta = ? WHERE id = ?",
+                                 alert_updates)
+        except sqlite3.Error as e:
+            # rows stay leased and are retried once the lease runs out
+            print(f"[outbox] Could not record delivery results: {e}")
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.process_once()
+            except Exception as e:
+                print(f"[outbox] Sender error: {e}")
+                worked = 0
+            if worked:
+                continue     # more may be due right away
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="alert-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+
+    def pending(self):
+        return self._conn().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "suppressed": self.suppressed,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+# --- SHARED OUTBOX ---
+_outbox = None
+_outbox_lock = threading.Lock()
+
+def get_outbox():
+    """Return the process-wide outbox (created and its sender started on first use)."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = AlertOutbox()
+        return _outbox.start()
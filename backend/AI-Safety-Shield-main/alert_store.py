@@ -0,0 +1,276 @@
+# alert_store.py
+"""
+Write-behind persistence of alerts and events into ai_shield.sqlite.
+
+The detection loop only appends to an in-memory queue (log_alert / log_event never
+touch the disk and never block). A background writer thread drains the queue every
+FLUSH_INTERVAL seconds and inserts everything it got in ONE transaction, with the
+database in WAL mode so readers (/api/alerts) never wait for the writer.
+
+Tables:
+- alerts : existing table (id, ts, score, reason, target, delivered, delivery_meta, lat, lon)
+- events : created on first start (id, ts, kind, score, source, data) - status changes etc.
+
+Timestamps are UTC strings "YYYY-MM-DD HH:MM:SS.ffffff" (same DATETIME format as the
+existing schema), so string order is time order.
+
+Reads use keyset pagination on ix_alerts_ts: list_alerts(before_ts, before_id, limit)
+returns the newest alerts older than the cursor (ts, id), each page is an index range
+scan whatever the page depth.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# --- CONFIGURATION ---
+ALERT_DB = os.getenv("ALERT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_shield.sqlite"))
+FLUSH_INTERVAL = float(os.getenv("ALERT_FLUSH_INTERVAL", "0.5"))   # seconds between write transactions
+MAX_PENDING = int(os.getenv("ALERT_MAX_PENDING", "10000"))         # queued rows before new ones are dropped
+MAX_BATCH = 1000                                                    # rows per transaction
+DEFAULT_PAGE = 50
+MAX_PAGE = 500
+
+_ALERT_COLUMNS = ("id", "ts", "score", "reason", "target", "delivered", "delivery_meta", "lat", "lon")
+_STOP = object()
+
+
+def utc_ts(t=None):
+    """Unix time -> "YYYY-MM-DD HH:MM:SS.ffffff" (UTC)."""
+    dt = datetime.fromtimestamp(time.time() if t is None else t, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")     # durable at checkpoints; fine for an event log
+    return conn
+
+
+def ensure_schema(conn):
+    """Create the alerts / events tables and indexes if they don't exist yet."""
+    with conn:
+        # same definitions as the existing database, for a fresh file
+        conn.execute("""CREATE TABLE IF NOT EXISTS alerts (
+                            id INTEGER NOT NULL,
+                            ts DATETIME,
+                            score INTEGER NOT NULL,
+                            reason TEXT,
+                            target VARCHAR(64),
+                            delivered BOOLEAN,
+                            delivery_meta TEXT,
+                            lat FLOAT,
+                            lon FLOAT,
+                            PRIMARY KEY (id))""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_alerts_ts ON alerts (ts)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS events (
+                            id INTEGER NOT NULL,
+                            ts DATETIME,
+                            kind VARCHAR(32) NOT NULL,
+                            score INTEGER,
+                            source VARCHAR(64),
+                            data TEXT,
+                            PRIMARY KEY (id))""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_events_ts ON events (ts)")
+
+
+class AlertStore:
+    def __init__(self, path=ALERT_DB, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max(0, int(max_pending)))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._read_local = threading.local()
+
+        # counters
+        self.written = 0
+        self.dropped = 0
+        self.transactions = 0
+        self.errors = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return self
+            conn = connect(self.path)
+            ensure_schema(conn)
+            self._thread = threading.Thread(target=self._run, args=(conn,), name="alert-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Write everything still queued, then stop the writer."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            with self._queue.mutex:
+                self._queue.queue.append(_STOP)
+                self._queue.not_empty.notify()
+            thread.join(timeout)
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # ---------- hot path ----------
+    def _enqueue(self, item):
+        if not self.is_running():
+            self.start()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def log_alert(self, score, reason=None, target=None, lat=None, lon=None,
+                  delivered=None, delivery_meta=None, ts=None):
+        """Queue one alerts row. Never blocks; returns False if the queue is full."""
+        if isinstance(delivery_meta, (dict, list)):
+            delivery_meta = json.dumps(delivery_meta)
+        return self._enqueue(("alert", (utc_ts(ts), int(score), reason, target,
+                                        None if delivered is None else bool(delivered),
+                                        delivery_meta, lat, lon)))
+
+    def log_event(self, kind, score=None, source=None, data=None, ts=None):
+        """Queue one events row (data may be any JSON-serialisable value)."""
+        if data is not None and not isinstance(data, str):
+            data = json.dumps(data)
+        return self._enqueue(("event", (utc_ts(ts), kind, None if score is None else int(score), source, data)))
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is written (for shutdown / tests)."""
+        done = threading.Event()
+        if not self._enqueue(("flush", done)):
+            return False
+        return done.wait(timeout)
+
+    # ---------- writer ----------
+    def _drain(self, first):
+        items = [first]
+        while len(items) < MAX_BATCH:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _write(self, conn, items):
+        alerts = [row for kind, row in items if kind == "alert"]
+        events = [row for kind, row in items if kind == "event"]
+        if alerts or events:
+            try:
+                with conn:   # one transaction for the whole batch
+                    if alerts:
+                        conn.executemany(
+                            "INSERT INTO alerts (ts, score, reason, target, delivered, delivery_meta, lat, lon) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", alerts)
+                    if events:
+                        conn.executemany(
+                            "INSERT INTO events (ts, kind, score, source, data) VALUES (?, ?, ?, ?, ?)", events)
+                self.transactions += 1
+                self.written += len(alerts) + len(events)
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"[alert_store] Write failed ({len(alerts)} alerts, {len(events)} events): {e}")
+        for kind, row in items:
+            if kind == "flush":
+                row.set()
+
+    def _run(self, conn):
+        try:
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                # let the batch fill up for one interval (a flush request writes right away)
+                if first[0] != "flush" and self.flush_interval > 0:
+                    time.sleep(self.flush_interval)
+                items = self._drain(first)
+                stop = _STOP in items
+                self._write(conn, [i for i in items if i is not _STOP])
+                if stop:
+                    break
+            # stopping: write whatever is left
+            rest = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    rest.append(item)
+            if rest:
+                self._write(conn, rest)
+        finally:
+            conn.close()
+
+    # ---------- reads ----------
+    def _reader(self):
+        conn = getattr(self._read_local, "conn", None)
+        if conn is None:
+            if not self.is_running():
+                self.start()     # makes sure the schema exists
+            conn = self._read_local.conn = connect(self.path)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def list_alerts(self, before_ts=None, before_id=None, limit=DEFAULT_PAGE):
+        """
+        Newest-first page of alerts strictly older than the cursor (before_ts, before_id).
+        Without before_id every alert at exactly before_ts is skipped.
+        Returns (rows, next_cursor) - next_cursor is None on the last page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE))
+        cols = ", ".join(_ALERT_COLUMNS)
+        if before_ts is None:
+            sql = f"SELECT {cols} FROM alerts ORDER BY ts DESC, id DESC LIMIT ?"
+            args = (limit,)
+        elif before_id is None:
+            sql = f"SELECT {cols} FROM alerts WHERE ts < ? ORDER BY ts DESC, id DESC LIMIT ?"
+            args = (before_ts, limit)
+        else:
+            # "ts <= ?" keeps this a range scan on ix_alerts_ts; the id breaks ties within one ts
+            sql = (f"SELECT {cols} FROM alerts WHERE ts <= ? AND (ts < ? OR id < ?) "
+                   f"ORDER BY ts DESC, id DESC LIMIT ?")
+            args = (before_ts, before_ts, int(before_id), limit)
+
+        rows = [dict(r) for r in self._reader().execute(sql, args).fetchall()]
+        for r in rows:
+            if r["delivered"] is not None:
+                r["delivered"] = bool(r["delivered"])
+        cursor = None
+        if len(rows) == limit:
+            cursor = {"before_ts": rows[-1]["ts"], "before_id": rows[-1]["id"]}
+        return rows, cursor
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "transactions": self.transactions,
+            "errors": self.errors,
+        }
+
+
+# --- SHARED STORE ---
+_store = None
+_store_lock = threading.Lock()
+
+def get_alert_store():
+    """Return the process-wide store (created and started on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AlertStore()
+            atexit.register(_store.stop)    # write the last batch on interpreter exit
+        return _store.start()
@@ -1,32 +1,125 @@
-import cv2
+import os
+import hmac
+import json
+import struct
+import threading
+import time
+import uuid
 import numpy as np
 import base64
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 
+# Optional: persistent WebSocket frame channel (pip install flask-sock)
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+
 # Import your existing AI modules
 # NOTE: We removed audio_thread because the browser will handle audio listening now.
-from weapon_detector import get_weapon_score
+import weapon_detector
+# Frames from concurrent browser sessions are micro-batched into shared YOLO calls
+# (batch size / wait / queue bound / latency budget: see INFER_* in batch_inference.py)
+from batch_inference import EngineBusy, get_engine
+# Header size guards + reduced-resolution decode + raw/YUV frames (see frame_ingest.py)
+from frame_ingest import IngestError, MAX_UPLOAD_BYTES, decode_image_bytes, decode_upload
+# Near-duplicate frames from a static camera reuse the last detection result
+from frame_cache import FrameResultCache, dhash
+# Per-session score history + alert cooldown (SESSION_* / ALERT_COOLDOWN in session_store.py)
+from session_store import SessionStore
+# Alerts / status changes are queued and written to ai_shield.sqlite in the background
+from alert_store import get_alert_store
+# WhatsApp alerts are written to a durable outbox and sent/retried in the background
+from alert_outbox import get_outbox
+# Score history per session for the dashboard charts (fixed memory, see metrics_buffer.py)
+from metrics_buffer import FIELDS as METRIC_FIELDS, MetricsRegistry
 from proximity_logic import get_proximity_score
-from whatsapp_wasender import send_wasender_alert_async
+# Same time-windowed fusion (weights, decay, hysteresis) as main_surveillance.py
+from score_fusion import get_fuser, level
+from whatsapp_wasender import build_alert_message
+# Phones push fixes to /api/location; alerts read them from memory (see location_helper.py)
+from location_helper import get_live_location, push_phone_location
 
 # Optional modules
 try:
-    from pose_module import get_pose_score
+    from pose_module import get_pose_score, pose_pool, roi_pose_pool
 except ImportError:
-    def get_pose_score(f): return 0
+    def get_pose_score(f, results=None, session_id=None): return 0
+    pose_pool = roi_pose_pool = None
 
 app = Flask(__name__)
 app.secret_key = "secret_safety_key"
+# Werkzeug refuses bigger request bodies with 413 before we read them
+# (+64 KB for the multipart envelope and the small form fields)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
+
+# Models load lazily (see model_registry). Warm the weapon model in the background
+# so importing the app stays fast but the first /api/analyze doesn't pay the load.
+if os.getenv("WARMUP_ON_START", "1") == "1":
+    threading.Thread(target=weapon_detector.warmup, name="model-warmup", daemon=True).start()
+
+# Max seconds a request waits for its YOLO result before answering 503
+ANALYZE_TIMEOUT = float(os.getenv("ANALYZE_TIMEOUT", "3"))
+
+# WebSocket binary message = header + JPEG bytes.
+# Header (little-endian): uint32 sequence number, float32 audio level.
+WS_HEADER = struct.Struct("<If")
+# MAX_CONTENT_LENGTH doesn't cover WebSocket messages: cap them at the same upload size so
+# an oversized frame is refused while it's read instead of being buffered whole first.
+# The ping closes sockets of clients that went away (the page reconnects every 5 s).
+app.config['SOCK_SERVER_OPTIONS'] = {'max_message_size': WS_HEADER.size + MAX_UPLOAD_BYTES,
+                                     'ping_interval': 25}
+
+# WhatsApp from the web app is OFF unless WEB_WHATSAPP_ALERTS=1: the number comes from
+# the browser, and a client can get a fresh session (and cooldown) on every request.
+# When on, sends are also limited app-wide to one per WEB_ALERT_INTERVAL seconds (per
+# process), on top of the per-session cooldown and the outbox's per-number cooldown.
+WEB_WHATSAPP_ALERTS = os.getenv("WEB_WHATSAPP_ALERTS", "0") == "1"
+WEB_ALERT_INTERVAL = float(os.getenv("WEB_ALERT_INTERVAL", "60"))
+_web_alert_lock = threading.Lock()
+_last_web_alert = 0.0
+
+def _claim_web_alert(now):
+    """True if the app-wide WhatsApp rate limit lets one more alert through now."""
+    global _last_web_alert
+    with _web_alert_lock:
+        if now - _last_web_alert < WEB_ALERT_INTERVAL:
+            return False
+        _last_web_alert = now
+        return True
 
-# --- GLOBAL VARIABLES ---
-# In a real SaaS, these would be in a database.
-last_alert_time = 0
+# Phone location push: "device:token,device2:token2". A phone sends its token as
+# "Authorization: Bearer <token>" (or X-Device-Token); without one, a browser session
+# may push, and the fix is stored under that session and used only for its own alerts.
+# A browser that pushes once with a device token binds that device to its session, so
+# its alerts use the phone's fix from then on.
+LOCATION_DEVICE_TOKENS = dict(
+    pair.split(":", 1) for pair in os.getenv("LOCATION_DEVICE_TOKENS", "").split(",") if ":" in pair)
 
-def decode_image(image_data):
-    """Convert raw upload data to OpenCV image"""
-    np_img = np.frombuffer(image_data.read(), np.uint8)
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-    return img
+# Per-session detection cache (TTL / Hamming tolerance: FRAME_CACHE_* in frame_cache.py)
+result_cache = FrameResultCache()
+metrics = MetricsRegistry()
+fuser = get_fuser()
+
+def _release_session(state):
+    """Free everything other modules keep per session once it is evicted."""
+    result_cache.discard(state.sid)
+    metrics.discard(state.sid)
+    fuser.discard(state.sid)
+    for pool in (pose_pool, roi_pose_pool):
+        if pool is not None:
+            pool.discard(state.sid)
+
+sessions = SessionStore(on_evict=_release_session)
+
+def decode_image(image_data, form=None):
+    """Upload -> 480x360 BGR frame (raises IngestError on bad / oversized data)"""
+    return decode_upload(image_data, form, size_hint=request.content_length)
+
+def decode_bytes(data, offset=0):
+    """Decode JPEG/PNG bytes (starting at offset) to a 480x360 BGR frame"""
+    return decode_image_bytes(memoryview(data)[offset:])
 
 @app.route('/')
 def step1_home():
@@ -51,66 +144,255 @@ def step4_emergency():
 def step5_monitor():
     if 'user_name' not in session:
         return redirect(url_for('step1_home'))
+    # Set the per-browser id now so the WebSocket handshake already carries it
+    session.setdefault('sid', uuid.uuid4().hex)
     
     return render_template('5_monitor.html', 
                          name=session.get('user_name'),
                          contact=session.get('emergency_contact'))
 
+def detect(frame, sid):
+    """
+    Weapon + pose detection for one frame -> (weapon_score, weapons, pose_score).
+    Raises EngineBusy / TimeoutError when the inference queue is over capacity.
+    """
+    # Weapon (queued for the next batched YOLO pass)
+    raw_results = None
+    try:
+        w_res = get_engine().infer(frame, timeout=ANALYZE_TIMEOUT)
+    except (EngineBusy, TimeoutError):
+        raise
+    except Exception as e:
+        print(f"Weapon Error: {e}")
+        w_res = None
+    try:
+        if isinstance(w_res, tuple):
+            w_score = w_res[0]     # points are weighted by score_fusion.WEIGHTS
+            weapons_list = [x for x in w_res[1] if x in ["knife", "baseball bat", "scissors"]]
+            raw_results = w_res[2]
+        else:
+            w_score = 0; weapons_list = []
+    except: w_score = 0; weapons_list = []
+
+    # Pose (only on the people YOLO found, with this browser session's own estimator)
+    try:
+        p_score = get_pose_score(frame, raw_results, session_id=sid)
+    except Exception as e:
+        print(f"Pose Error: {e}")
+        p_score = 0
+
+    return w_score, weapons_list, p_score
+
+def analyze(frame, client_audio_level, sid, emergency_contact=None, location_device=None):
+    """
+    Detection + scoring for one 480x360 frame; shared by the POST and WebSocket routes.
+    Raises EngineBusy / TimeoutError when the inference queue is over capacity.
+    """
+    # 3. AI Detection Logic
+    # Same scene as a frame this session sent a moment ago -> reuse its detections
+    frame_hash = dhash(frame)
+    cached = result_cache.get(sid, frame_hash)
+    if cached is not None:
+        w_score, weapons_list, p_score = cached
+    else:
+        w_score, weapons_list, p_score = detect(frame, sid)
+        result_cache.put(sid, frame_hash, (w_score, weapons_list, p_score))
+    
+    # 4. Calculate Total: publish this frame's readings, fuse them with the
+    # session's recent ones (decay + hysteresis, same weights as main_surveillance)
+    now = time.time()
+    fuser.bus.publish(sid, "weapon", level("weapon", w_score), now)
+    fuser.bus.publish(sid, "pose", level("pose", p_score), now)
+    # Audio level comes from the client (0-100); loud (>50) counts as a full audio reading
+    fuser.bus.publish(sid, "audio", 1.0 if client_audio_level > 50 else 0.0, now)
+    fused = fuser.fuse(sid, now)
+    total_score, status, parts = fused["score"], fused["status"], fused["parts"]
+
+    state = sessions.record_score(sid, total_score)
+    metrics.record(sid, total=total_score, **parts)
+    state.detections = {"weapon": w_score, "weapons": weapons_list, "pose": p_score}
+
+    if status == "DANGER":
+        # Send Alert Logic (cooldown is per session, so one user can't silence another)
+        if sessions.claim_alert(sid):
+            reason = f"Score: {total_score}. Weapons: {', '.join(weapons_list) or 'none'}"
+            # in-memory lookup only: the bound device's (or this session's own) pushed fix,
+            # never another session's; without one, the server's GPS / IP location
+            lat, lon = get_live_location(device_id=location_device or sid)
+            if not emergency_contact:
+                skipped = "No emergency contact"
+            elif not WEB_WHATSAPP_ALERTS:
+                skipped = "WhatsApp alerts disabled (WEB_WHATSAPP_ALERTS=0)"
+            elif not _claim_web_alert(time.time()):
+                skipped = "App-wide alert rate limit"
+            else:
+                skipped = None
+                # Trigger WhatsApp (durable outbox; the event id makes a repeated claim a no-op)
+                get_outbox().enqueue(build_alert_message(lat, lon, extra_text=reason), [emergency_contact],
+                                     total_score, reason=reason, lat=lat, lon=lon,
+                                     event_id=f"{sid}:{int(state.last_alert_ts or 0)}")
+            if skipped:
+                get_alert_store().log_alert(total_score, reason=reason, target=emergency_contact, lat=lat,
+                                            lon=lon, delivered=False, delivery_meta=skipped)
+
+    if status != state.status:
+        get_alert_store().log_event("status", score=total_score, source=sid,
+                                    data={"from": state.status, "to": status})
+        state.status = status
+
+    return {
+        "status": status,
+        "score": total_score,
+        "avg_score": round(state.mean_score(), 1),
+        "weapons": weapons_list,
+        "audio_val": client_audio_level
+    }
+
 # --- NEW API: PROCESS FRAME ---
 @app.route('/api/analyze', methods=['POST'])
 def analyze_frame():
-    global last_alert_time
-    
     # 1. Get Data from Browser
     if 'image' not in request.files:
         return jsonify({"error": "No image"}), 400
     
+    # Per-browser id (pose tracking state etc. must not be shared between users)
+    session.setdefault('sid', uuid.uuid4().hex)
+
     # Audio level comes from the browser now (0 to 100)
     client_audio_level = float(request.form.get('audio_level', 0))
     
-    # 2. Decode Image
-    frame = decode_image(request.files['image'])
-    frame = cv2.resize(frame, (480, 360))
+    # 2. Decode Image (straight to 480x360; raw frames send format/width/height fields)
+    try:
+        frame = decode_image(request.files['image'], request.form)
+    except IngestError as e:
+        return jsonify({"error": str(e)}), e.status
 
-    # 3. AI Detection Logic
-    # Weapon
     try:
-        w_res = get_weapon_score(frame)
-        if isinstance(w_res, tuple):
-            w_score = 45 if w_res[0] > 0 else 0
-            weapons_list = [x for x in w_res[1] if x in ["knife", "baseball bat", "scissors"]]
-        else:
-            w_score = 0; weapons_list = []
-    except: w_score = 0; weapons_list = []
+        result = analyze(frame, client_audio_level, session['sid'], session.get('emergency_contact'),
+                         session.get('location_device'))
+    except (EngineBusy, TimeoutError):
+        # Over capacity: tell the client to back off rather than queueing unbounded work
+        return jsonify({"error": "Server busy"}), 503
+    return jsonify(result)
 
-    # Pose
-    p_score = get_pose_score(frame)
-    
-    # Audio (Mapped from client 0-100 to our score system)
-    # If client audio is loud (>50), give it points
-    a_score = 40 if client_audio_level > 50 else 0
+# --- WEBSOCKET: PERSISTENT FRAME CHANNEL ---
+# Same analysis as /api/analyze without per-frame HTTP/multipart overhead.
+# Client sends binary messages (WS_HEADER + JPEG); every reply is a JSON text
+# message carrying the same "seq" so the client can match it up.
+if Sock is not None:
+    sock = Sock(app)
 
-    # 4. Calculate Total
-    total_score = w_score + a_score + p_score
-    
-    status = "SAFE"
-    if total_score >= 60:
-        status = "DANGER"
-        # Send Alert Logic (with cooldown)
-        # (In production, use time.time() to prevent spamming)
-        if session.get('emergency_contact'):
-             # Trigger WhatsApp (Async)
-             # print(f"Sending alert to {session['emergency_contact']}")
-             pass # Enable your wasender here
-    elif total_score >= 35:
-        status = "WARNING"
-
-    return jsonify({
-        "status": status,
-        "score": total_score,
-        "weapons": weapons_list,
-        "audio_val": client_audio_level
-    })
+    @sock.route('/ws/analyze')
+    def ws_analyze(ws):
+        # The handshake carries the Flask session cookie (set on /monitor)
+        sid = session.get('sid') or uuid.uuid4().hex
+        contact = session.get('emergency_contact')
+        location_device = session.get('location_device')
+        try:
+            while True:
+                msg = ws.receive()
+                if msg is None:
+                    continue
+                if isinstance(msg, str):
+                    # text messages are only used as keep-alive
+                    ws.send(json.dumps({"pong": True}))
+                    continue
+                if len(msg) <= WS_HEADER.size:
+                    ws.send(json.dumps({"error": "Bad frame"}))
+                    continue
+
+                seq, client_audio_level = WS_HEADER.unpack_from(msg)
+                try:
+                    frame = decode_bytes(msg, offset=WS_HEADER.size)
+                except IngestError as e:
+                    ws.send(json.dumps({"error": str(e), "seq": seq}))
+                    continue
+
+                try:
+                    result = analyze(frame, client_audio_level, sid, contact, location_device)
+                except (EngineBusy, TimeoutError):
+                    result = {"error": "Server busy"}
+                result["seq"] = seq
+                ws.send(json.dumps(result))
+        except ConnectionClosed:
+            pass
+
+# --- PHONE LOCATION PUSH ---
+def _location_device():
+    """(device id the request may write to, whether it used a device token); (None, False) if unauthorized."""
+    auth = request.headers.get('Authorization', '')
+    token = auth[7:].strip() if auth.lower().startswith('bearer ') else request.headers.get('X-Device-Token')
+    if token:
+        for device, expected in LOCATION_DEVICE_TOKENS.items():
+            if hmac.compare_digest(token.encode(), expected.encode()):
+                return device, True
+        return None, False
+    # no token: a browser pushes for its own session only
+    return session.get('sid'), False
+
+@app.route('/api/location', methods=['POST'])
+def push_location():
+    """JSON {"lat", "lon", optional "ts" (unix seconds or ms), "accuracy" (metres)}."""
+    device, tokened = _location_device()
+    if device is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'lat' not in data or 'lon' not in data:
+        return jsonify({"error": "Expected JSON with lat and lon"}), 400
+    try:
+        # only token devices count as the newest fix for callers without a device
+        stored = push_phone_location(device, data['lat'], data['lon'],
+                                     ts=data.get('ts'), accuracy=data.get('accuracy'), shared=tokened)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    bound = tokened and 'sid' in session
+    if bound:
+        session['location_device'] = device
+    return jsonify({"ok": True, "device": device, "stored": stored, "bound": bound})
+
+@app.route('/api/inference-stats')
+def inference_stats():
+    return jsonify(get_engine().stats())
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/api/alerts')
+def list_alerts():
+    """Newest alerts first. Pass the returned "next" cursor (before_ts / before_id) for older ones."""
+    try:
+        limit = int(request.args.get('limit', 50))
+        before_id = request.args.get('before_id', type=int)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    rows, cursor = get_alert_store().list_alerts(request.args.get('before_ts'), before_id, limit)
+    return jsonify({"alerts": rows, "next": cursor})
+
+@app.route('/api/metrics')
+def get_metrics():
+    """
+    Current scores (weapon/audio/pose/proximity/total) plus min/max/mean windows for the
+    last minute, hour and day. ?stream=<id> picks a stream (default: this browser session,
+    else the most recently active one); ?points=N sets the bins per window.
+    """
+    stream = request.args.get('stream') or session.get('sid')
+    if stream is None or stream not in metrics.streams():
+        stream = metrics.latest_stream()
+    points = min(max(request.args.get('points', 60, type=int), 1), 500)
+    snap = metrics.snapshot(stream, points=points) if stream is not None else None
+    if snap is None:
+        snap = {name: 0 for name in METRIC_FIELDS}
+        snap["windows"] = {}
+    return jsonify(snap)
+
+@app.route('/api/alert-store-stats')
+def alert_store_stats():
+    return jsonify({"store": get_alert_store().stats(), "outbox": get_outbox().stats()})
+
+@app.route('/api/session-stats')
+def session_stats():
+    return jsonify(dict(sessions.stats(), fusion=fuser.stats()))
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
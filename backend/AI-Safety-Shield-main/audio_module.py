@@ -1,13 +1,47 @@
-import speech_recognition as sr
+import time
+
+# Online fallback only (Google Web Speech); the offline path is keyword_spotter.py
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
 
 # --- CONFIGURATION ---
 # The specific words we are looking for
 DISTRESS_KEYWORDS = ["help me", "save me", "police", "emergency", "please help", "danger"]
 
 # Initialize the recognizer
-recognizer = sr.Recognizer()
+recognizer = sr.Recognizer() if sr is not None else None
+
+def available():
+    return sr is not None
+
+def _match(text):
+    return any(keyword in text for keyword in DISTRESS_KEYWORDS)
+
+def check_pcm_for_keywords(pcm, sample_rate=16000):
+    """
+    Same check on audio captured elsewhere (int16 mono PCM bytes), so the caller's one
+    open input stream can feed it instead of a second sr.Microphone on the same device.
+    """
+    if sr is None:
+        return False, ""
+    try:
+        text = recognizer.recognize_google(sr.AudioData(bytes(pcm), sample_rate, 2)).lower()
+        return _match(text), text
+    except sr.UnknownValueError:
+        return False, "" # Speech was unintelligible
+    except sr.RequestError:
+        print("❌ API Error: Check Internet Connection")
+        return False, "API Error"
+    except Exception as e:
+        print(f"❌ Audio Error: {e}")
+        return False, "Error"
 
 def listen_for_keywords():
+    if sr is None:
+        time.sleep(1)    # nothing to listen with; don't spin the caller's loop
+        return False, ""
     try:
         with sr.Microphone() as source:
             # 1. Reduced calibration time to make it snappier
@@ -18,7 +52,7 @@ def listen_for_keywords():
             
             text = recognizer.recognize_google(audio).lower()
             
-            if any(keyword in text for keyword in DISTRESS_KEYWORDS):
+            if _match(text):
                 return True, text
             else:
                 return False, text
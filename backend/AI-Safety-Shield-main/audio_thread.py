@@ -1,56 +1,197 @@
+import queue
 import threading
 import time
 
+import numpy as np
+
 # Robust Import
 try:
     from audio_module import listen_for_keywords as check_audio
+    from audio_module import available as online_available, check_pcm_for_keywords as check_pcm
 except ImportError:
     # Fallback if module is missing
     def check_audio(): return False, ""
+    def online_available(): return False
+    check_pcm = None
+
+# Offline streaming keyword spotter (vosk + sounddevice, see keyword_spotter.py)
+try:
+    import keyword_spotter
+except ImportError:
+    keyword_spotter = None
+
+# Sustained scream / loudness detector on the same audio stream (NumPy only)
+from acoustic_detector import AcousticDetector
+from score_fusion import level
+
+KEYWORD_SCORE = 35
+HOLD_SECONDS = 5.0      # keep the score up this long after the last keyword
+PHRASE_SECONDS = 2.0    # without a vosk model: stream audio sent to the online recognizer in 2 s phrases
+SPEECH_RMS_DB = -45.0   # quieter phrases are not sent at all
 
 class AudioThread(threading.Thread):
-    def __init__(self, thread_id):
+    def __init__(self, thread_id, wav_path=None, bus=None, stream="camera"):
+        """
+        wav_path: read the audio from a WAV file instead of the microphone (tests). The file
+            is read faster than real time, so holds then run on stream time, not wall time.
+        bus: score_fusion.EventBus to publish the audio score on (as `stream`) after every update.
+        """
         threading.Thread.__init__(self)
         self.thread_id = thread_id
+        self.wav_path = wav_path
         self.running = True
+        self._stop_event = threading.Event()
         self.score = 0
         self.cooldown = 0
         self.last_text = ""
+        self.last_hit = None     # _now() of the last keyword
+        self.stream_time = 0.0   # seconds of audio read from the stream so far
+        self.mode = None         # "stream" | "online"
+        self.acoustic = AcousticDetector()
+        self.spotter = None
+        self.bus = bus
+        self.stream = stream
+        self._phrases = None     # queue to the online recognizer when there is no vosk model
 
-    def run(self):
+    def _now(self):
+        # a WAV file is read as fast as possible: only its own timeline means anything
+        return self.stream_time if self.wav_path else time.time()
+
+    def _publish(self):
+        if self.bus is not None:
+            self.bus.publish(self.stream, "audio", level("audio", self.get_score()))
+
+    def _hit(self, text):
+        self.last_hit = self._now()
+        self.last_text = text
+        self.score = KEYWORD_SCORE
+
+    def _can_stream(self):
+        return keyword_spotter is not None and (self.wav_path or keyword_spotter.sd is not None)
+
+    def _run_stream(self):
+        """
+        One open input stream feeds the scream detector and the keyword spotter (or, without
+        a vosk model, the online recognizer in PHRASE_SECONDS phrases).
+        """
+        if self.wav_path:
+            blocks = keyword_spotter.wav_blocks(self.wav_path)
+        else:
+            blocks = keyword_spotter.microphone_blocks(self._stop_event)
+        spotter = self.spotter
+        bytes_per_second = 2 * keyword_spotter.SAMPLE_RATE
+        phrase = bytearray()
+        for pcm in blocks:
+            if not self.running:
+                break
+            self.stream_time += len(pcm) / bytes_per_second
+            now = self._now()
+            self.acoustic.process(pcm, now=now)
+            # each block is BLOCK_SECONDS of audio, so a keyword lands within ~0.1-0.5 s
+            if spotter is not None and spotter.feed(pcm):
+                self._hit(spotter.last_text)
+            elif self._phrases is not None:
+                phrase += pcm
+                if len(phrase) >= PHRASE_SECONDS * bytes_per_second:
+                    self._send_phrase(bytes(phrase))
+                    phrase.clear()
+            # score decays on stream / wall-clock time, not on how often speech is heard
+            if self.last_hit is not None and now - self.last_hit > HOLD_SECONDS:
+                self.score = 0
+                self.last_text = ""
+                self.last_hit = None
+            self._publish()
+
+    def _send_phrase(self, pcm):
+        samples = np.frombuffer(pcm, np.int16).astype(np.float32) * (1.0 / 32768.0)
+        rms_db = 20.0 * np.log10(max(float(np.sqrt(np.mean(samples * samples))), 1e-6))
+        if rms_db < SPEECH_RMS_DB:
+            return
+        if self.wav_path:
+            self._phrases.put(pcm)      # a file can wait for the recognizer; every phrase counts
+            return
+        try:
+            self._phrases.put_nowait(pcm)
+        except queue.Full:
+            pass    # recognizer still busy with the last phrase: skip this one
+
+    def _run_phrases(self):
+        """Online recognizer fed from the stream's phrases (no second microphone handle)."""
+        phrases = self._phrases
+        while self.running and self._phrases is phrases:
+            try:
+                pcm = phrases.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            is_danger, text = check_pcm(pcm, keyword_spotter.SAMPLE_RATE)
+            if is_danger:
+                self._hit(text)
+
+    def _run_online(self):
         while self.running:
             try:
                 # 1. Listen for keywords (This blocks until speech is heard)
                 is_danger, text = check_audio()
-                
+
                 # 2. Logic: If Keyword Found -> IMMEDIATE ALERT (35 Points)
                 if is_danger:
-                    self.score = 35
+                    self.score = KEYWORD_SCORE
                     self.cooldown = 1  # Keep alert active for ~5 seconds
                     self.last_text = text
                     # print(f"🚨 ALERT TRIGGERED: '{text}'")
-                
+
                 # 3. Cooldown Logic (Keep score high for a few seconds)
                 elif self.cooldown > 0:
-                    self.score = 35
+                    self.score = KEYWORD_SCORE
                     self.cooldown -= 1
                 else:
                     self.score = 0
                     self.last_text = ""
-                    
+
             except Exception as e:
                 print(f"Thread Error: {e}")
                 self.score = 0
-            
+            if self.mode == "online":
+                self._publish()     # in stream mode the stream loop publishes
+
             # Small sleep not strictly necessary as listen() blocks, but good for safety
             time.sleep(0.1)
 
+    def run(self):
+        if self._can_stream():
+            self.mode = "stream"
+            if keyword_spotter.available():
+                self.spotter = keyword_spotter.KeywordSpotter()
+            elif check_pcm is not None and online_available():
+                # no offline model: the online recognizer gets phrases of the same stream
+                self._phrases = queue.Queue(maxsize=1)
+                threading.Thread(target=self._run_phrases, name="audio-keywords", daemon=True).start()
+            try:
+                self._run_stream()
+                return
+            except Exception as e:
+                # e.g. no input device: fall back to the online recognizer
+                print(f"[audio] Audio stream stopped: {e}")
+                self.score = 0
+                self._phrases = None
+            if self.wav_path:
+                return
+        self.mode = "online"
+        self._run_online()
+
     def stop(self):
         self.running = False
-        
+        self._stop_event.set()
+
     def get_score(self):
-        return self.score
-    
+        # a hold that ran out while no audio block arrived still counts as expired
+        now = self._now()
+        if self.last_hit is not None and now - self.last_hit > HOLD_SECONDS:
+            keyword = 0
+        else:
+            keyword = self.score
+        return max(keyword, self.acoustic.get_score(now))
+
     def get_last_text(self):
         # Helper to show what word triggered it in your UI
         return self.last_text
@@ -0,0 +1,219 @@
+# batch_inference.py
+"""
+Batched multi-stream inference engine for the weapon detector.
+
+Every camera / browser session calls `submit(frame)` (or the blocking `infer(frame)`)
+from its own thread. A single worker thread gathers the pending frames, runs them
+through the YOLO model in ONE batched call, and hands each caller back its own
+(threat_score, detected_weapons, results) tuple - the same contract as
+weapon_detector.get_weapon_score.
+
+Tail latency is bounded by configuration: a frame waits at most MAX_WAIT_MS for a
+batch to fill, the queue holds at most MAX_QUEUE frames (submit raises EngineBusy
+beyond that), and frames that waited longer than MAX_LATENCY_MS are failed with
+TimeoutError instead of being run late.
+
+Provides:
+- BatchInferenceEngine(infer_fn, max_batch_size, max_wait_ms, max_queue, max_latency_ms)
+- get_engine()  -> process-wide engine backed by weapon_detector.get_weapon_scores
+- get_weapon_score_batched(frame) -> drop-in replacement for get_weapon_score
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# --- CONFIGURATION ---
+MAX_BATCH_SIZE = int(os.getenv("INFER_MAX_BATCH", "8"))        # frames per model call
+MAX_WAIT_MS = float(os.getenv("INFER_MAX_WAIT_MS", "5"))        # how long the first frame may wait for company
+MAX_QUEUE = int(os.getenv("INFER_MAX_QUEUE", "64"))             # frames waiting before submit() refuses more
+MAX_LATENCY_MS = float(os.getenv("INFER_MAX_LATENCY_MS", "2000"))  # queued longer than this -> TimeoutError
+RESULT_TIMEOUT = 10     # seconds a blocking caller waits for its result
+
+_STOP = object()
+
+
+class EngineBusy(Exception):
+    """The inference queue is full; the caller should back off and retry."""
+
+
+class BatchInferenceEngine:
+    def __init__(self, infer_fn=None, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 max_queue=MAX_QUEUE, max_latency_ms=MAX_LATENCY_MS):
+        """
+        infer_fn: callable(list_of_frames) -> list_of_results (same length, same order).
+                  Defaults to weapon_detector.get_weapon_scores (imported lazily).
+        max_queue: 0 = unbounded.  max_latency_ms: None/0 = never expire queued frames.
+        """
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.max_latency = float(max_latency_ms) / 1000.0 if max_latency_ms else None
+
+        self._queue = queue.Queue(maxsize=max(0, int(max_queue)))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        # simple counters (read by anyone, written only by the worker)
+        self.batches_run = 0
+        self.frames_run = 0
+        self.frames_rejected = 0
+        self.frames_expired = 0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return self
+            if self.infer_fn is None:
+                from weapon_detector import get_weapon_scores
+                self.infer_fn = get_weapon_scores
+            self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            # bypass maxsize: the stop marker must always get in
+            with self._queue.mutex:
+                self._queue.queue.append(_STOP)
+                self._queue.not_empty.notify()
+            thread.join(timeout)
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # ---------- client API ----------
+    def submit(self, frame):
+        """
+        Queue one frame; returns a Future resolving to that frame's result tuple.
+        Raises EngineBusy if MAX_QUEUE frames are already waiting.
+        """
+        if not self.is_running():
+            self.start()
+        fut = Future()
+        try:
+            self._queue.put_nowait((frame, fut, time.monotonic()))
+        except queue.Full:
+            self.frames_rejected += 1
+            raise EngineBusy(f"Inference queue full ({self._queue.maxsize} frames waiting)")
+        return fut
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "batches_run": self.batches_run,
+            "frames_run": self.frames_run,
+            "avg_batch": round(self.frames_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "pending": self.pending(),
+            "rejected": self.frames_rejected,
+            "expired": self.frames_expired,
+        }
+
+    def infer(self, frame, timeout=RESULT_TIMEOUT):
+        """Blocking convenience wrapper around submit()."""
+        fut = self.submit(frame)
+        try:
+            return fut.result(timeout=timeout)
+        except TimeoutError:
+            fut.cancel()    # don't spend a batch slot on an answer nobody is waiting for
+            raise
+
+    # ---------- worker ----------
+    def _collect_batch(self, first):
+        """Gather up to max_batch_size items, waiting at most max_wait after the first one."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        self._stopping = False
+        while not self._stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = self._collect_batch(first)
+            now = time.monotonic()
+            live = []
+            for f, fut, queued_at in batch:
+                # Skip frames whose callers already gave up
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                # Running a frame that already blew the latency budget only delays everyone else
+                if self.max_latency and now - queued_at > self.max_latency:
+                    self.frames_expired += 1
+                    fut.set_exception(TimeoutError(f"Frame waited {now - queued_at:.3f}s in the inference queue"))
+                    continue
+                live.append((f, fut))
+            batch = live
+            if not batch:
+                continue
+
+            frames = [f for f, _ in batch]
+            try:
+                results = self.infer_fn(frames)
+                if len(results) != len(frames):
+                    raise RuntimeError(f"infer_fn returned {len(results)} results for {len(frames)} frames")
+            except Exception as e:
+                print(f"[batch] Inference error: {e}")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+            self.batches_run += 1
+            self.frames_run += len(frames)
+
+        # Fail anything still waiting so callers don't hang
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("BatchInferenceEngine stopped"))
+
+
+# --- SHARED ENGINE ---
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the process-wide engine (created and started on first use)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BatchInferenceEngine()
+        return _engine.start()
+
+def get_weapon_score_batched(frame):
+    """Same contract as weapon_detector.get_weapon_score, but shares model calls across threads."""
+    try:
+        return get_engine().infer(frame)
+    except Exception as e:
+        print(f"Weapon Error: {e}")
+        return 0, [], None
@@ -0,0 +1,409 @@
+# camera_supervisor.py
+"""
+Multi-camera capture: one worker PROCESS per source, all feeding one inference stage.
+
+Sources (parse_sources("0,/dev/video2,rtsp://...,clip.mp4")):
+- device : "0", "/dev/video2"       -> V4L2 on Linux, DirectShow on Windows
+- stream : rtsp:// http(s):// udp:// -> FFmpeg (RTSP over TCP unless OPENCV_FFMPEG_CAPTURE_OPTIONS is set)
+- file   : anything else             -> played at its own FPS (pace=True), optionally looped
+
+Each worker opens its source, decodes and resizes frames on its own core and writes
+them into a shared-memory ring (SLOTS frames per source), then puts a small
+(source, slot, seq, ts) notice on ONE bounded queue shared by all workers. Frames never
+get pickled; if the queue is full the notice is dropped (the consumer is behind, so it
+only wants newer frames anyway). Each slot has a sequence header written before and
+after the frame, so a reader that raced the writer detects the torn copy and skips it.
+get_batch drains every pending notice and reads only the newest frame per source (from
+the header's last seq, in case that frame's notice was dropped), so a backlog costs no
+copies; a notice whose slot was already reused counts as "overwritten",
+a copy the worker wrote into meanwhile as "torn".
+
+The supervisor thread restarts a worker that crashed or lost its source, with
+exponential backoff (RESTART_BASE .. RESTART_MAX seconds, reset after STABLE_SECONDS
+of uptime). A file that reached its end without looping is not restarted.
+
+- CameraSupervisor(sources).start()
+- get(timeout)                 -> (source index, FramePacket) or None
+- get_batch(max_batch, timeout) -> newest FramePacket per source, for one batched model call
+- stats() / finished() / stop()
+
+Try it on local files:  python camera_supervisor.py a.mp4 b.mp4 --loop --seconds 10
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from frame_pipeline import FramePacket
+
+# --- CONFIGURATION ---
+SLOTS = 4                   # frames per source in shared memory
+QUEUE_SIZE = int(os.getenv("CAMERA_QUEUE_SIZE", "32"))    # frame notices waiting for the consumer
+RESTART_BASE = 1.0
+RESTART_MAX = 30.0
+STABLE_SECONDS = 60         # uptime after which the restart backoff starts over
+READ_FAILURES = 50          # consecutive failed reads before a live source is reopened (worker exits)
+START_METHOD = os.getenv("CAMERA_START_METHOD", "spawn")   # spawn: no inherited threads/locks from the parent
+
+# exit codes of a worker
+EXIT_EOF = 0                # file finished: do not restart
+EXIT_OPEN_FAILED = 2
+EXIT_READ_FAILED = 3
+
+_STREAM_PREFIXES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+_HEADER = 3                 # per source: [frames written, notices dropped, reserved], then slot seqs, then slot ts (us)
+
+
+def _header_len(slots):
+    return _HEADER + 2 * slots
+
+
+def source_kind(source):
+    s = str(source).strip()
+    if s.isdigit() or s.startswith("/dev/video"):
+        return "device"
+    if s.lower().startswith(_STREAM_PREFIXES):
+        return "stream"
+    return "file"
+
+
+def parse_sources(text):
+    """"0,/dev/video2,rtsp://cam/stream,clip.mp4" -> list of source strings."""
+    return [s.strip() for s in (text or "").split(",") if s.strip()]
+
+
+def open_capture(source):
+    """cv2.VideoCapture for a source string, with the right backend for its kind."""
+    kind = source_kind(source)
+    if kind == "device":
+        s = str(source)
+        index = int(s) if s.isdigit() else s
+        if os.name == "nt":
+            return cv2.VideoCapture(index, cv2.CAP_DSHOW)
+        if sys.platform.startswith("linux"):
+            cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
+        else:
+            cap = cv2.VideoCapture(index)
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+        return cap
+    if kind == "stream":
+        # TCP avoids the smeared frames RTSP over UDP gives on a lossy network
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+        return cv2.VideoCapture(str(source), cv2.CAP_FFMPEG)
+    return cv2.VideoCapture(str(source))
+
+
+# ---------- worker process ----------
+def _capture_worker(index, source, size, slots, shm_name, notices, stop, loop, pace):
+    """Runs in its own process: read -> resize into shared memory -> notify."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    width, height = size
+    header = np.ndarray((_header_len(slots),), np.int64, shm.buf, 0)
+    frames = np.ndarray((slots, height, width, 3), np.uint8, shm.buf, _header_len(slots) * 8)
+    is_file = source_kind(source) == "file"
+    cap = open_capture(source)
+    try:
+        if not cap.isOpened():
+            print(f"[camera {index}] Could not open {source!r}")
+            sys.exit(EXIT_OPEN_FAILED)
+        fps = cap.get(cv2.CAP_PROP_FPS) if is_file and pace else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0
+        next_due = time.monotonic()
+        seq = int(header[0])        # continue the sequence after a restart
+        failures = 0
+        while not stop.is_set():
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                if is_file:
+                    if not loop:
+                        sys.exit(EXIT_EOF)
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                failures += 1
+                if failures > READ_FAILURES:
+                    print(f"[camera {index}] {source!r} stopped delivering frames")
+                    sys.exit(EXIT_READ_FAILED)
+                time.sleep(0.05)
+                continue
+            failures = 0
+
+            seq += 1
+            slot = seq % slots
+            header[_HEADER + slot] = -1                  # mark the slot as being written
+            if frame.shape[1] == width and frame.shape[0] == height:
+                np.copyto(frames[slot], frame)
+            else:
+                cv2.resize(frame, (width, height), dst=frames[slot])
+            ts = time.time()
+            header[_HEADER + slots + slot] = int(ts * 1e6)
+            header[_HEADER + slot] = seq
+            header[0] = seq
+            try:
+                notices.put_nowait((index, slot, seq, ts))
+            except queue.Full:
+                header[1] += 1
+
+            if interval:
+                # play files in real time so they behave like a camera
+                next_due += interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()
+    finally:
+        cap.release()
+        shm.close()
+
+
+# ---------- supervisor ----------
+class _Source:
+    __slots__ = ("index", "source", "shm", "process", "started", "restarts", "backoff",
+                 "restart_at", "finished", "received", "overwritten", "torn")
+
+    def __init__(self, index, source, shm):
+        self.index = index
+        self.source = source
+        self.shm = shm
+        self.process = None
+        self.started = 0.0
+        self.restarts = 0
+        self.backoff = RESTART_BASE
+        self.restart_at = None
+        self.finished = False
+        self.received = 0
+        self.overwritten = 0
+        self.torn = 0
+
+
+class CameraSupervisor:
+    def __init__(self, sources, size=(480, 360), slots=SLOTS, queue_size=QUEUE_SIZE,
+                 loop=False, pace=True, start_method=START_METHOD):
+        self.sources = [str(s) for s in sources]
+        self.size = tuple(size)
+        self.slots = max(2, int(slots))
+        self.loop = loop
+        self.pace = pace
+        self._ctx = mp.get_context(start_method)
+        self._notices = self._ctx.Queue(maxsize=max(1, int(queue_size)))
+        self._pending = {}          # source index -> newest notice not handed out yet
+        self._stop = self._ctx.Event()
+        self._sources = []
+        self._monitor = None
+        self._lock = threading.Lock()
+        self._frame_shape = (self.size[1], self.size[0], 3)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        nbytes = _header_len(self.slots) * 8 + self.slots * int(np.prod(self._frame_shape))
+        for i, source in enumerate(self.sources):
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            np.ndarray((_header_len(self.slots),), np.int64, shm.buf, 0)[:] = 0
+            src = _Source(i, source, shm)
+            self._sources.append(src)
+            self._spawn(src)
+        self._monitor = threading.Thread(target=self._supervise, name="camera-supervisor", daemon=True)
+        self._monitor.start()
+        return self
+
+    def _spawn(self, src):
+        src.process = self._ctx.Process(
+            target=_capture_worker, name=f"camera-{src.index}", daemon=True,
+            args=(src.index, src.source, self.size, self.slots, src.shm.name,
+                  self._notices, self._stop, self.loop, self.pace))
+        src.process.start()
+        src.started = time.monotonic()
+        src.restart_at = None
+
+    def _supervise(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                for src in self._sources:
+                    if src.finished:
+                        continue
+                    if src.restart_at is not None:
+                        if now >= src.restart_at:
+                            src.restarts += 1
+                            print(f"[supervisor] Restarting camera {src.index} ({src.source}), "
+                                  f"restart #{src.restarts}")
+                            self._spawn(src)
+                        continue
+                    if src.process.is_alive():
+                        continue
+                    code = src.process.exitcode
+                    if code == EXIT_EOF:
+                        src.finished = True
+                        print(f"[supervisor] Camera {src.index} ({src.source}) finished")
+                        continue
+                    if now - src.started > STABLE_SECONDS:
+                        src.backoff = RESTART_BASE
+                    print(f"[supervisor] Camera {src.index} ({src.source}) exited with code {code}; "
+                          f"restarting in {src.backoff:.0f}s")
+                    src.restart_at = now + src.backoff
+                    src.backoff = min(RESTART_MAX, src.backoff * 2)
+            self._stop.wait(0.5)
+
+    def stop(self, timeout=3.0):
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout)
+        for src in self._sources:
+            p = src.process
+            if p is not None:
+                p.join(timeout)
+                if p.is_alive():
+                    p.terminate()
+                    p.join(1.0)
+        # drain so the queue's feeder thread can exit
+        self._pending.clear()
+        try:
+            while True:
+                self._notices.get_nowait()
+        except (queue.Empty, OSError, ValueError):
+            pass
+        for src in self._sources:
+            try:
+                src.shm.close()
+                src.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def finished(self):
+        """True once every source is a file that reached its end."""
+        return bool(self._sources) and all(src.finished for src in self._sources)
+
+    # ---------- frames ----------
+    def _header(self, index):
+        return np.ndarray((_header_len(self.slots),), np.int64, self._sources[index].shm.buf, 0)
+
+    def _read(self, index, slot, seq, ts=None):
+        """Copy one slot out of shared memory; ts=None takes the capture time from the slot header."""
+        src = self._sources[index]
+        header = self._header(index)
+        if header[_HEADER + slot] != seq:
+            src.overwritten += 1   # slot already reused for a newer frame
+            return None
+        frame = np.ndarray(self._frame_shape, np.uint8, src.shm.buf,
+                           _header_len(self.slots) * 8 + slot * int(np.prod(self._frame_shape))).copy()
+        if ts is None:
+            ts = header[_HEADER + self.slots + slot] / 1e6
+        if header[_HEADER + slot] != seq:
+            src.torn += 1          # the worker wrote into the slot while we copied it
+            return None
+        src.received += 1
+        return FramePacket(seq, ts, frame)
+
+    def get(self, timeout=None):
+        """Next frame of any source as (source index, FramePacket), or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._pending:
+                # left over by get_batch
+                notice = self._pending.pop(next(iter(self._pending)))
+            else:
+                try:
+                    notice = self._notices.get(timeout=remaining)
+                except queue.Empty:
+                    return None
+            packet = self._read(*notice)
+            if packet is not None:
+                return notice[0], packet
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+    def get_batch(self, max_batch=None, timeout=0.5):
+        """
+        Newest frame of every source that sent one, as [(source index, FramePacket)]
+        (empty on timeout). All queued notices are drained and only the highest seq per
+        source is read: inference always works on the latest picture of each camera.
+        With more sources than max_batch, the ones waiting longest go first and the rest
+        stay pending for the next call.
+        """
+        deadline = time.monotonic() + (timeout or 0)
+        max_batch = max_batch or len(self.sources)
+        pending = self._pending
+        while True:
+            if not pending:
+                try:
+                    notice = self._notices.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    return []
+                pending[notice[0]] = notice
+            while True:
+                try:
+                    notice = self._notices.get_nowait()
+                except queue.Empty:
+                    break
+                old = pending.get(notice[0])
+                if old is None or notice[2] > old[2]:
+                    pending[notice[0]] = notice
+            batch = []
+            for index in sorted(pending, key=lambda i: pending[i][3])[:max_batch]:
+                notice = pending.pop(index)
+                latest = int(self._header(index)[0])
+                if latest > notice[2]:
+                    # the newest frame's notice was dropped (queue full): read it from the header
+                    notice = (index, latest % self.slots, latest, None)
+                packet = self._read(*notice)
+                if packet is not None:
+                    batch.append((index, packet))
+            if batch or time.monotonic() >= deadline:
+                return sorted(batch)
+
+    def stats(self):
+        out = []
+        for src in self._sources:
+            header = self._header(src.index)
+            out.append({
+                "source": src.source,
+                "alive": bool(src.process is not None and src.process.is_alive()),
+                "finished": src.finished,
+                "restarts": src.restarts,
+                "captured": int(header[0]),
+                "received": src.received,
+                "dropped": int(header[1]),
+                "overwritten": src.overwritten,
+                "torn": src.torn,
+            })
+        return out
+
+
+# Run over local files / cameras and report the frame rate each one reaches
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Capture from several sources in worker processes.")
+    parser.add_argument("sources", nargs="+", help="device index, /dev/videoN, rtsp:// URL or video file")
+    parser.add_argument("--loop", action="store_true", help="loop video files")
+    parser.add_argument("--no-pace", action="store_true", help="decode files as fast as possible")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    sup = CameraSupervisor(args.sources, loop=args.loop, pace=not args.no_pace).start()
+    start = time.monotonic()
+    batches = frames = 0
+    try:
+        while time.monotonic() - start < args.seconds and not sup.finished():
+            batch = sup.get_batch(timeout=0.5)
+            if batch:
+                batches += 1
+                frames += len(batch)
+    finally:
+        elapsed = time.monotonic() - start
+        stats = sup.stats()
+        sup.stop()
+    print(f"{frames} frames in {batches} batches over {elapsed:.1f}s ({frames / elapsed:.1f} fps total)")
+    for s in stats:
+        print(s)
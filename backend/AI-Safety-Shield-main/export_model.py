@@ -0,0 +1,233 @@
+# export_model.py
+"""
+Export (and optionally INT8-calibrate) a YOLOv8 model for CPU inference.
+
+Writes into model_registry.EXPORT_DIR using the names weapon_detector looks for:
+    exported_models/yolov8n.onnx                 (ONNX Runtime, FP32)
+    exported_models/yolov8n-int8.onnx            (ONNX Runtime, INT8 static quantization)
+    exported_models/yolov8n_openvino_model/      (OpenVINO, FP32)
+    exported_models/yolov8n-int8_openvino_model/ (OpenVINO, INT8 via NNCF)
+
+Then run the detector with e.g.
+    WEAPON_BACKEND=onnx WEAPON_PRECISION=int8 python main_surveillance.py
+
+Usage:
+    python export_model.py --weights yolov8n.pt --format onnx
+    python export_model.py --weights yolov8n.pt --format onnx --int8 --calib-dir calib_frames/
+    python export_model.py --weights yolov8s.pt --format openvino --int8 --calib-video lobby.mp4
+    python export_model.py --weights yolov8n.pt --format onnx --int8 --calib-dir calib_frames/ --bench 50
+
+Calibration images should look like the real feed (same cameras, lighting, 480x360 frames);
+50-300 frames is plenty. Requires: onnx + onnxruntime (ONNX) or openvino + nncf (OpenVINO).
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import model_registry
+
+# --- CONFIGURATION ---
+DEFAULT_IMGSZ = 640          # keep in sync with WEAPON_IMGSZ in weapon_detector
+MAX_CALIB_FRAMES = 300
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+# YOLOv8 Detect head (box decode + concat) loses too much accuracy in INT8 - keep it FP32
+HEAD_NODE_PREFIX = "/model.22/"
+
+
+def load_calibration_frames(calib_dir=None, calib_video=None, limit=MAX_CALIB_FRAMES):
+    """BGR frames from a folder of images and/or evenly spaced from a video file."""
+    frames = []
+    if calib_dir:
+        paths = sorted(p for p in glob.glob(os.path.join(calib_dir, "*"))
+                       if p.lower().endswith(IMAGE_EXTS))
+        for p in paths[:limit]:
+            img = cv2.imread(p)
+            if img is not None:
+                frames.append(img)
+    if calib_video and len(frames) < limit:
+        cap = cv2.VideoCapture(calib_video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or limit
+        step = max(1, total // (limit - len(frames)))
+        idx = 0
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if idx % step == 0:
+                frames.append(frame)
+            idx += 1
+        cap.release()
+    return frames
+
+
+def letterbox_tensor(frame, imgsz):
+    """Same preprocessing as ultralytics: letterbox to imgsz, BGR->RGB, CHW, float32 0..1."""
+    h, w = frame.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    resized = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    x = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return x[None]
+
+
+def _move(src, dst):
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return dst
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    elif os.path.exists(dst):
+        os.remove(dst)
+    shutil.move(src, dst)
+    return dst
+
+
+def export_onnx(weights, imgsz, int8=False, frames=None, keep_head_fp32=True):
+    from ultralytics import YOLO
+
+    fp32_path = model_registry.exported_path(weights, "onnx", "fp32")
+    # dynamic=True keeps the batch axis free so batch_inference can send several frames at once
+    out = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    _move(str(out), fp32_path)
+    print(f"✅ ONNX FP32 -> {fp32_path}")
+    if not int8:
+        return fp32_path
+
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    class _FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self._it = iter(frames)
+            self.input_name = input_name
+
+        def get_next(self):
+            frame = next(self._it, None)
+            if frame is None:
+                return None
+            return {self.input_name: letterbox_tensor(frame, imgsz)}
+
+    graph = onnx.load(fp32_path).graph
+    input_name = graph.input[0].name
+    exclude = [n.name for n in graph.node if n.name.startswith(HEAD_NODE_PREFIX)] if keep_head_fp32 else []
+
+    int8_path = model_registry.exported_path(weights, "onnx", "int8")
+    quantize_static(
+        fp32_path, int8_path, _FrameReader(input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        nodes_to_exclude=exclude,
+    )
+    # keep ultralytics metadata (class names, stride, imgsz) on the quantized model
+    src, dst = onnx.load(fp32_path), onnx.load(int8_path)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, int8_path)
+    print(f"✅ ONNX INT8 -> {int8_path} ({len(frames)} calibration frames, {len(exclude)} head nodes kept FP32)")
+    return int8_path
+
+
+def export_openvino(weights, imgsz, int8=False, frames=None):
+    from ultralytics import YOLO
+
+    precision = "int8" if int8 else "fp32"
+    target = model_registry.exported_path(weights, "openvino", precision)
+    kwargs = {"format": "openvino", "imgsz": imgsz, "dynamic": True}
+
+    tmp = None
+    if int8:
+        # ultralytics/NNCF calibrate from a dataset yaml - point one at our frames
+        tmp = tempfile.mkdtemp(prefix="calib_")
+        img_dir = os.path.join(tmp, "images")
+        os.makedirs(img_dir)
+        for i, f in enumerate(frames):
+            cv2.imwrite(os.path.join(img_dir, f"{i:05d}.jpg"), f)
+        names = YOLO(weights).names
+        yaml_path = os.path.join(tmp, "calib.yaml")
+        with open(yaml_path, "w") as fh:
+            fh.write(f"path: {tmp}\ntrain: images\nval: images\nnames:\n")
+            for k, v in names.items():
+                fh.write(f"  {k}: {v}\n")
+        kwargs.update(int8=True, data=yaml_path)
+
+    try:
+        out = YOLO(weights).export(**kwargs)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    _move(str(out), target)
+    print(f"✅ OpenVINO {precision.upper()} -> {target}")
+    return target
+
+
+def benchmark(weights, exported, frames, imgsz, runs):
+    """Latency + detection agreement of the exported model vs the original PyTorch weights."""
+    import weapon_detector
+
+    base = model_registry.get_model(weights, device='cpu')
+    test = model_registry.get_model(exported, device='cpu', precision="int8" if "int8" in exported else "fp32")
+    frames = [cv2.resize(f, (480, 360)) for f in frames[:runs]] or [np.zeros((360, 480, 3), np.uint8)]
+
+    def _run(model, kwargs):
+        model(frames[0], verbose=False, **kwargs)     # warmup
+        t0 = time.perf_counter()
+        outs = [model(f, classes=weapon_detector.DETECT_CLASSES, verbose=False, **kwargs)[0] for f in frames]
+        return (time.perf_counter() - t0) / len(frames) * 1000, outs
+
+    base_ms, base_out = _run(base, {})
+    test_ms, test_out = _run(test, {"imgsz": imgsz})
+
+    same = sum(sorted(b.boxes.cls.tolist()) == sorted(t.boxes.cls.tolist()) for b, t in zip(base_out, test_out))
+    print(f"PyTorch : {base_ms:7.1f} ms/frame")
+    print(f"Exported: {test_ms:7.1f} ms/frame ({base_ms / max(test_ms, 1e-6):.2f}x)")
+    print(f"Same detected classes on {same}/{len(frames)} frames")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export YOLOv8 weights to ONNX Runtime / OpenVINO (FP32 or INT8).")
+    ap.add_argument("--weights", default="yolov8n.pt", help="yolov8n.pt / yolov8s.pt")
+    ap.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    ap.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    ap.add_argument("--int8", action="store_true", help="also produce an INT8-quantized model")
+    ap.add_argument("--calib-dir", help="folder of calibration images (jpg/png)")
+    ap.add_argument("--calib-video", help="video file to sample calibration frames from")
+    ap.add_argument("--calib-frames", type=int, default=MAX_CALIB_FRAMES)
+    ap.add_argument("--quantize-head", action="store_true", help="ONNX only: quantize the Detect head too")
+    ap.add_argument("--bench", type=int, default=0, help="compare N frames against the PyTorch model")
+    args = ap.parse_args(argv)
+
+    frames = load_calibration_frames(args.calib_dir, args.calib_video, args.calib_frames)
+    if args.int8 and not frames:
+        print("❌ --int8 needs calibration data: pass --calib-dir and/or --calib-video")
+        return 1
+
+    os.makedirs(model_registry.EXPORT_DIR, exist_ok=True)
+    try:
+        if args.format == "onnx":
+            path = export_onnx(args.weights, args.imgsz, args.int8, frames, not args.quantize_head)
+        else:
+            path = export_openvino(args.weights, args.imgsz, args.int8, frames)
+    except ImportError as e:
+        print(f"❌ Missing dependency for {args.format} export: {e}")
+        return 1
+
+    if args.bench:
+        benchmark(args.weights, path, frames, args.imgsz, args.bench)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
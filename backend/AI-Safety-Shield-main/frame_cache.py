@@ -0,0 +1,133 @@
+# frame_cache.py
+"""
+Per-session cache of detection results for near-duplicate frames.
+
+A static camera keeps sending almost the same picture. Each frame is reduced to a
+64-bit difference hash (dHash of a 9x8 grayscale thumbnail, ~50 us); if the same
+session saw a frame within MAX_DISTANCE bits of it less than TTL seconds ago, the
+cached detection result is returned instead of running YOLO and pose again.
+
+- dhash(frame)                  -> 64-bit int
+- hamming(a, b)                 -> number of differing bits
+- FrameResultCache.get(session, h) / put(session, h, result) / stats()
+
+Sessions are kept in LRU order (at most MAX_SESSIONS), and each session keeps its
+ENTRIES_PER_SESSION most recently used hashes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# --- CONFIGURATION ---
+TTL = float(os.getenv("FRAME_CACHE_TTL", "2.0"))                # seconds a cached result stays valid
+MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", "3"))  # bits (of 64) that may differ
+MAX_SESSIONS = int(os.getenv("FRAME_CACHE_SESSIONS", "256"))
+ENTRIES_PER_SESSION = 8
+HASH_SIZE = 8                                                   # 8x8 = 64-bit hash
+SAMPLE_WIDTH = 64       # the frame is pixel-skipped down to ~this width before area-averaging
+
+_BIT_WEIGHTS = np.uint64(1) << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64)
+
+
+def dhash(frame):
+    """Difference hash: 1 bit per horizontally adjacent pixel pair of a 9x8 gray thumbnail."""
+    # INTER_AREA over a full 480x360 frame costs ~0.5 ms; averaging a pixel-skipped
+    # copy gives the same hash for the same scene at a tenth of the cost
+    step = max(1, frame.shape[1] // SAMPLE_WIDTH)
+    small = np.ascontiguousarray(frame[::step, ::step])
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(small, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(_BIT_WEIGHTS[bits].sum())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class FrameResultCache:
+    def __init__(self, ttl=TTL, max_distance=MAX_DISTANCE, max_sessions=MAX_SESSIONS,
+                 entries_per_session=ENTRIES_PER_SESSION):
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_sessions = max(1, int(max_sessions))
+        self.entries_per_session = max(1, int(entries_per_session))
+        self._sessions = OrderedDict()   # session -> OrderedDict(hash -> (stored_at, result))
+        self._lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, session, h, now=None):
+        """Cached result for a frame hashing close to `h`, or None."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._sessions.get(session)
+            if entries is None:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session)
+
+            best_key, best_dist = None, self.max_distance + 1
+            for key, (stored_at, _) in list(entries.items()):
+                if now - stored_at > self.ttl:
+                    del entries[key]
+                    self.expired += 1
+                    continue
+                dist = hamming(key, h)
+                if dist < best_dist:
+                    best_key, best_dist = key, dist
+                    if dist == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best_key)
+            self.hits += 1
+            return entries[best_key][1]
+
+    def put(self, session, h, result, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._sessions.get(session)
+            if entries is None:
+                entries = self._sessions[session] = OrderedDict()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            entries[h] = (now, result)
+            entries.move_to_end(h)
+            while len(entries) > self.entries_per_session:
+                entries.popitem(last=False)
+
+    def discard(self, session):
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "expired": self.expired,
+                "sessions": len(self._sessions),
+                "entries": sum(len(e) for e in self._sessions.values()),
+                "ttl": self.ttl,
+                "max_distance": self.max_distance,
+            }
@@ -0,0 +1,228 @@
+# frame_ingest.py
+"""
+Fast frame-ingest stage for uploaded frames (/api/analyze and the WebSocket channel).
+
+- Size guards   : payloads over MAX_UPLOAD_BYTES are rejected before decoding, and the
+                  JPEG/PNG header is parsed (no decode) to reject images over MAX_SOURCE_PIXELS.
+- Reduced decode: if the source is 2x/4x/8x larger than the target, libjpeg decodes straight
+                  at 1/2, 1/4 or 1/8 size (IMREAD_REDUCED_COLOR_*), which is far cheaper than a
+                  full decode followed by a resize.
+- Buffers      : the upload is read into a buffer sized from the request's content length
+                  (not MAX_UPLOAD_BYTES), so peak memory per request follows the real payload.
+                  The resized output frame is a per-thread buffer; it is only valid until
+                  the next call on the same thread - copy it if you keep it.
+- Raw frames    : bgr24 / rgb24 / gray / i420 / nv12 / yuyv buffers with explicit width/height.
+
+Errors are raised as IngestError(message, status) with an HTTP status code
+(400 bad data, 413 too large, 415 unsupported format).
+"""
+
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+# --- CONFIGURATION ---
+TARGET_SIZE = (480, 360)            # (w, h) every frame is delivered at
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024  # a 480x360 JPEG is ~30-60 KB; 2 MB leaves room for 1080p
+MAX_SOURCE_PIXELS = 4096 * 4096     # refuse decompression bombs before decoding
+RAW_FORMATS = ("bgr24", "rgb24", "gray", "i420", "nv12", "yuyv")
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_local = threading.local()
+
+
+class IngestError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- header parsing (no decode) ----------
+def jpeg_dimensions(data):
+    """(width, height) from the JPEG SOF segment, or None if not a parseable JPEG."""
+    mv = memoryview(data)
+    n = len(mv)
+    if n < 4 or mv[0] != 0xFF or mv[1] != 0xD8:
+        return None
+    i = 2
+    while i + 4 <= n:
+        if mv[i] != 0xFF:
+            return None
+        marker = mv[i + 1]
+        if marker == 0xFF:          # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:   # stand-alone markers
+            i += 2
+            continue
+        seg_len = (mv[i + 2] << 8) | mv[i + 3]
+        if marker in _SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack(">HH", mv[i + 5:i + 9])
+            return w, h
+        if marker == 0xDA:          # start of scan before any SOF -> broken file
+            return None
+        i += 2 + seg_len
+    return None
+
+
+def image_dimensions(data):
+    """(width, height) for JPEG or PNG from the header only, else None."""
+    dims = jpeg_dimensions(data)
+    if dims is None and len(data) >= 24 and bytes(data[:8]) == _PNG_SIGNATURE:
+        dims = struct.unpack(">II", bytes(data[16:24]))
+    return dims
+
+
+def _reduced_flag(src_w, src_h, target):
+    """Largest libjpeg scale (8/4/2) that still leaves the image >= target."""
+    scale = min(src_w / target[0], src_h / target[1])
+    if scale >= 8:
+        return cv2.IMREAD_REDUCED_COLOR_8
+    if scale >= 4:
+        return cv2.IMREAD_REDUCED_COLOR_4
+    if scale >= 2:
+        return cv2.IMREAD_REDUCED_COLOR_2
+    return cv2.IMREAD_COLOR
+
+
+# ---------- reusable buffers ----------
+def _buffer(name, shape, dtype=np.uint8):
+    bufs = getattr(_local, "bufs", None)
+    if bufs is None:
+        bufs = _local.bufs = {}
+    buf = bufs.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = bufs[name] = np.empty(shape, dtype)
+    return buf
+
+
+def _to_target(img, target):
+    """Resize into this thread's reusable output frame (no-op if already the right size)."""
+    if img.shape[1] == target[0] and img.shape[0] == target[1]:
+        return img
+    out = _buffer("frame", (target[1], target[0], 3))
+    # INTER_AREA is the right filter for shrinking; it's also what keeps reduced decode sharp
+    return cv2.resize(img, target, dst=out, interpolation=cv2.INTER_AREA)
+
+
+def read_stream(stream, max_bytes=MAX_UPLOAD_BYTES, size_hint=None):
+    """
+    Read an upload stream; raises IngestError(413) if it's bigger than max_bytes.
+    size_hint: upper bound on the payload (e.g. request.content_length). The buffer is
+    sized from it, so a 50 KB frame allocates ~50 KB, not max_bytes. Without a hint
+    the stream is read in one call and only the bytes actually sent are allocated.
+    Returns a bytes-like object with the payload.
+    """
+    readinto = getattr(stream, "readinto", None)
+    if size_hint is None or readinto is None:
+        data = stream.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise IngestError(f"Upload larger than {max_bytes} bytes", 413)
+        return data
+
+    buf = bytearray(min(int(size_hint), max_bytes) + 1)
+    mv = memoryview(buf)
+    n = 0
+    while n < len(buf):
+        got = readinto(mv[n:])
+        if not got:
+            break
+        n += got
+    if n > max_bytes:
+        raise IngestError(f"Upload larger than {max_bytes} bytes", 413)
+    return mv[:n]
+
+
+# ---------- decoders ----------
+def decode_image_bytes(data, target=TARGET_SIZE, max_bytes=MAX_UPLOAD_BYTES,
+                       max_pixels=MAX_SOURCE_PIXELS):
+    """Encoded JPEG/PNG bytes -> BGR frame at `target` size."""
+    n = len(data)
+    if n == 0:
+        raise IngestError("Empty image")
+    if n > max_bytes:
+        raise IngestError(f"Upload larger than {max_bytes} bytes", 413)
+
+    dims = image_dimensions(data)
+    flag = cv2.IMREAD_COLOR
+    if dims is not None:
+        w, h = dims
+        if w == 0 or h == 0:
+            raise IngestError("Image has zero size")
+        if w * h > max_pixels:
+            raise IngestError(f"Image {w}x{h} exceeds {max_pixels} pixels", 413)
+        if jpeg_dimensions(data) is not None:
+            flag = _reduced_flag(w, h, target)
+
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if img is None:
+        raise IngestError("Could not decode image")
+    if dims is None and img.shape[0] * img.shape[1] > max_pixels:
+        raise IngestError("Image too large", 413)
+    return _to_target(img, target)
+
+
+def decode_raw(data, width, height, fmt="bgr24", target=TARGET_SIZE, max_pixels=MAX_SOURCE_PIXELS):
+    """Uncompressed frame bytes (bgr24/rgb24/gray/i420/nv12/yuyv) -> BGR frame at `target` size."""
+    fmt = (fmt or "").lower()
+    if fmt not in RAW_FORMATS:
+        raise IngestError(f"Unsupported raw format {fmt!r} (use one of {', '.join(RAW_FORMATS)})", 415)
+    try:
+        width, height = int(width), int(height)
+    except (TypeError, ValueError):
+        raise IngestError("Raw frames need integer width and height")
+    if width <= 0 or height <= 0:
+        raise IngestError("Raw frames need positive width and height")
+    if width * height > max_pixels:
+        raise IngestError(f"Frame {width}x{height} exceeds {max_pixels} pixels", 413)
+    if fmt in ("i420", "nv12") and (width % 2 or height % 2):
+        raise IngestError(f"{fmt} frames need even width and height")
+
+    expected = {
+        "bgr24": width * height * 3,
+        "rgb24": width * height * 3,
+        "gray": width * height,
+        "i420": width * height * 3 // 2,
+        "nv12": width * height * 3 // 2,
+        "yuyv": width * height * 2,
+    }[fmt]
+    if len(data) != expected:
+        raise IngestError(f"{fmt} {width}x{height} needs {expected} bytes, got {len(data)}")
+
+    src = np.frombuffer(data, np.uint8)
+    if fmt == "bgr24":
+        return _to_target(src.reshape(height, width, 3), target)
+
+    bgr = _buffer("raw_bgr", (height, width, 3))
+    if fmt == "rgb24":
+        cv2.cvtColor(src.reshape(height, width, 3), cv2.COLOR_RGB2BGR, dst=bgr)
+    elif fmt == "gray":
+        cv2.cvtColor(src.reshape(height, width), cv2.COLOR_GRAY2BGR, dst=bgr)
+    elif fmt == "i420":
+        cv2.cvtColor(src.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420, dst=bgr)
+    elif fmt == "nv12":
+        cv2.cvtColor(src.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_NV12, dst=bgr)
+    else:  # yuyv
+        cv2.cvtColor(src.reshape(height, width, 2), cv2.COLOR_YUV2BGR_YUYV, dst=bgr)
+    return _to_target(bgr, target)
+
+
+def decode_upload(file_storage, form=None, target=TARGET_SIZE, size_hint=None):
+    """
+    Flask upload -> BGR frame. `form` may carry format=<raw format>, width, height
+    for uncompressed frames; otherwise the upload is treated as JPEG/PNG.
+    size_hint: request.content_length (the file part can't be bigger than the whole body).
+    """
+    form = form or {}
+    data = read_stream(file_storage.stream if hasattr(file_storage, "stream") else file_storage,
+                       size_hint=size_hint)
+    fmt = (form.get("format") or "jpeg").lower()
+    if fmt in ("jpeg", "jpg", "png"):
+        return decode_image_bytes(data, target)
+    return decode_raw(data, form.get("width"), form.get("height"), fmt, target)
@@ -0,0 +1,216 @@
+# frame_pipeline.py
+"""
+Staged capture / inference / render pipeline used by main_surveillance.
+
+    [CaptureThread] --(DropStaleQueue)--> [InferenceWorker] --(DropStaleQueue)--> render stage
+          \\---------------(DropStaleQueue)------------------------------------>/
+
+- CaptureThread reads the camera as fast as it delivers frames and never waits on
+  anything downstream, so the camera buffer never backs up.
+- InferenceWorker always takes the NEWEST captured frame (older ones are dropped),
+  runs the heavy detectors on it, and publishes the result.
+- The render/alert stage (the caller's thread) shows every captured frame at camera
+  FPS and merges in whatever detection result is newest.
+
+All queues are bounded; when one is full the OLDEST item is thrown away.
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class DropStaleQueue:
+    """Bounded FIFO where put() never blocks: a full queue discards its oldest item."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = max(1, int(maxsize))
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest item still queued, or None on timeout."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def get_latest(self, timeout=None):
+        """Newest item (everything older is discarded), or None on timeout."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class FramePacket:
+    """One captured frame plus its sequence number and capture time."""
+    __slots__ = ("seq", "ts", "frame")
+
+    def __init__(self, seq, ts, frame):
+        self.seq = seq
+        self.ts = ts
+        self.frame = frame
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames from a cv2.VideoCapture source, resizes them and pushes them to
+    every output queue. Reopens the camera if it drops out.
+    """
+
+    def __init__(self, source=0, api_preference=cv2.CAP_ANY, size=None,
+                 outputs=(), open_retries=5, name="capture"):
+        super().__init__(name=name, daemon=True)
+        self.source = source
+        self.api_preference = api_preference
+        self.size = size                      # (width, height) or None to keep native size
+        self.outputs = list(outputs)
+        self.open_retries = open_retries
+        self.cap = None
+        self.running = True
+        self.seq = 0
+        self.opened = threading.Event()
+        self.failed = threading.Event()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source, self.api_preference)
+        if not cap.isOpened():
+            print(f"[capture] Could not open source {self.source!r} — retrying...")
+        retries = 0
+        while not cap.isOpened() and retries < self.open_retries and self.running:
+            time.sleep(1)
+            try:
+                cap.open(self.source, self.api_preference)
+            except Exception:
+                pass
+            retries += 1
+            print(f"[capture] Retry {retries}, opened: {cap.isOpened()}")
+        return cap
+
+    def open(self):
+        """Open the source synchronously. Returns True on success."""
+        self.cap = self._open()
+        if self.cap.isOpened():
+            # we only ever want the newest frame - keep the driver buffer tiny
+            try:
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            except Exception:
+                pass
+            self.opened.set()
+            return True
+        self.failed.set()
+        return False
+
+    def run(self):
+        if self.cap is None and not self.open():
+            return
+        while self.running:
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                print(f"[capture] Camera read error: {e}")
+                ret, frame = False, None
+
+            if not ret or frame is None:
+                time.sleep(0.2)
+                if not self.cap.isOpened():
+                    try:
+                        self.cap.open(self.source, self.api_preference)
+                    except Exception:
+                        pass
+                continue
+
+            if self.size:
+                try:
+                    frame = cv2.resize(frame, self.size)
+                except Exception as e:
+                    print(f"[capture] Frame resize error: {e}")
+                    continue
+
+            self.seq += 1
+            packet = FramePacket(self.seq, time.time(), frame)
+            for q in self.outputs:
+                q.put(packet)
+
+    def stop(self):
+        self.running = False
+
+    def release(self):
+        try:
+            if self.cap is not None and self.cap.isOpened():
+                self.cap.release()
+        except Exception:
+            pass
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Pulls the newest frame from `source_queue`, runs `detect_fn(frame)` on a copy
+    and pushes (packet_seq, packet_ts, result) to `result_queue`.
+
+    min_frame_gap: only run when at least this many frames were captured since the
+    last inference (1 = run as often as the detectors can keep up).
+    gate: optional callable(frame) -> bool (e.g. MotionScheduler.should_run); frames
+    it rejects are skipped without running the detectors.
+    """
+
+    def __init__(self, detect_fn, source_queue, result_queue, min_frame_gap=1, gate=None,
+                 name="inference"):
+        super().__init__(name=name, daemon=True)
+        self.detect_fn = detect_fn
+        self.source_queue = source_queue
+        self.result_queue = result_queue
+        self.min_frame_gap = max(1, int(min_frame_gap))
+        self.gate = gate
+        self.running = True
+        self.last_seq = 0
+        self.runs = 0
+
+    def run(self):
+        while self.running:
+            packet = self.source_queue.get_latest(timeout=0.5)
+            if packet is None:
+                continue
+            if packet.seq - self.last_seq < self.min_frame_gap:
+                continue
+            if self.gate is not None:
+                try:
+                    if not self.gate(packet.frame):
+                        continue
+                except Exception as e:
+                    print(f"[inference] Gate error: {e}")
+            self.last_seq = packet.seq
+            try:
+                # detectors may draw on the frame; keep the render stage's copy clean
+                result = self.detect_fn(packet.frame.copy())
+            except Exception as e:
+                print(f"[inference] Detector error: {e}")
+                continue
+            self.runs += 1
+            self.result_queue.put((packet.seq, packet.ts, result))
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,173 @@
+# keyword_spotter.py
+"""
+Offline, streaming distress keyword spotting (no internet, runs on the CPU).
+
+The microphone is opened once and streams 16 kHz mono int16 blocks of BLOCK_SECONDS
+into a small queue (sounddevice callback, never blocks the audio driver). Every block
+goes straight into a Vosk recognizer restricted to a grammar of DISTRESS_KEYWORDS plus
+"[unk]", so the decoder only has to tell those phrases from "anything else". Partial
+results are checked after every block, which reports a keyword a few hundred ms after
+it is spoken instead of after the end of the phrase.
+
+- KeywordSpotter(keywords, model_path)   : feed(pcm_bytes) -> matched keyword or None
+- microphone_blocks(stop_event)          : live blocks from the default input device
+- wav_blocks(path)                       : the same blocks read from a WAV file (tests)
+- spot(blocks, spotter)                  : yields (seconds into the stream, keyword, text)
+
+Needs `pip install vosk sounddevice` and a Vosk model (e.g. vosk-model-small-en-us-0.15,
+~40 MB) unpacked at VOSK_MODEL_PATH. WAV mode only needs vosk.
+
+Run on a file:  python keyword_spotter.py recording.wav
+"""
+
+import json
+import os
+import queue
+import sys
+import time
+import wave
+
+import numpy as np
+
+# Optional dependencies
+try:
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    SetLogLevel(-1)
+except ImportError:
+    KaldiRecognizer = Model = None
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):    # OSError: PortAudio library missing
+    sd = None
+
+from audio_module import DISTRESS_KEYWORDS
+
+# --- CONFIGURATION ---
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             "models", "vosk-model-small-en-us-0.15"))
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 0.1          # audio per recognizer step; lower = faster detection, more CPU
+MAX_QUEUED_BLOCKS = 50       # 5 s of audio; older blocks are dropped if the decoder falls behind
+INPUT_DEVICE = os.getenv("KWS_DEVICE")   # sounddevice device name/index, default input if unset
+
+
+def available():
+    """True if the offline spotter can run (vosk installed and the model present)."""
+    return Model is not None and os.path.isdir(VOSK_MODEL_PATH)
+
+
+_models = {}
+
+def _load_model(path):
+    # the model is ~40 MB in memory: load it once per process
+    model = _models.get(path)
+    if model is None:
+        model = _models[path] = Model(path)
+    return model
+
+
+class KeywordSpotter:
+    def __init__(self, keywords=DISTRESS_KEYWORDS, model_path=VOSK_MODEL_PATH, sample_rate=SAMPLE_RATE):
+        if Model is None:
+            raise RuntimeError("vosk is not installed (pip install vosk)")
+        self.keywords = [k.lower() for k in keywords]
+        self.sample_rate = sample_rate
+        grammar = json.dumps(self.keywords + ["[unk]"])
+        self._rec = KaldiRecognizer(_load_model(model_path), sample_rate, grammar)
+        self._fired = False      # one detection per utterance, however many partials repeat it
+        self.last_text = ""
+
+    def _match(self, text):
+        for keyword in self.keywords:
+            if keyword in text:
+                return keyword
+        return None
+
+    def feed(self, pcm):
+        """Decode one block of int16 mono PCM; returns the keyword heard, or None."""
+        if self._rec.AcceptWaveform(pcm):
+            # end of utterance: the final result may contain a keyword no partial showed
+            text = json.loads(self._rec.Result()).get("text", "")
+            fired, self._fired = self._fired, False
+            keyword = None if fired else self._match(text)
+        else:
+            text = json.loads(self._rec.PartialResult()).get("partial", "")
+            keyword = None if self._fired else self._match(text)
+            if keyword:
+                self._fired = True
+        if keyword:
+            self.last_text = text
+        return keyword
+
+    def reset(self):
+        self._rec.Reset()
+        self._fired = False
+
+
+# ---------- audio sources ----------
+def microphone_blocks(stop_event=None, device=INPUT_DEVICE, block_seconds=BLOCK_SECONDS):
+    """Yield int16 PCM blocks from one continuously open input stream until stop_event is set."""
+    if sd is None:
+        raise RuntimeError("sounddevice is not installed (pip install sounddevice)")
+    blocks = queue.Queue(maxsize=MAX_QUEUED_BLOCKS)
+
+    def callback(indata, frames, time_info, status):
+        try:
+            blocks.put_nowait(bytes(indata))
+        except queue.Full:
+            # decoder is behind: drop the oldest block, keep the newest audio
+            try:
+                blocks.get_nowait()
+            except queue.Empty:
+                pass
+            blocks.put_nowait(bytes(indata))
+
+    with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=int(SAMPLE_RATE * block_seconds),
+                           dtype="int16", channels=1, device=device, callback=callback):
+        while stop_event is None or not stop_event.is_set():
+            try:
+                yield blocks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+
+def wav_blocks(path, block_seconds=BLOCK_SECONDS):
+    """Yield the same 16 kHz mono int16 blocks from a WAV file (downmixed / resampled if needed)."""
+    with wave.open(path, "rb") as wf:
+        rate, channels, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        if width != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != SAMPLE_RATE and len(samples):
+        n = int(len(samples) * SAMPLE_RATE / rate)
+        samples = np.interp(np.arange(n) * (rate / SAMPLE_RATE), np.arange(len(samples)),
+                            samples).astype(np.int16)
+    step = int(SAMPLE_RATE * block_seconds)
+    for i in range(0, len(samples), step):
+        yield samples[i:i + step].tobytes()
+
+
+def spot(blocks, spotter=None):
+    """Yield (stream_seconds, keyword, text) for every keyword heard in `blocks`."""
+    spotter = spotter or KeywordSpotter()
+    seconds = 0.0
+    for pcm in blocks:
+        seconds += len(pcm) / (2 * spotter.sample_rate)
+        keyword = spotter.feed(pcm)
+        if keyword:
+            yield seconds, keyword, spotter.last_text
+
+
+# Run on a WAV file (or the microphone without arguments)
+if __name__ == "__main__":
+    if not available():
+        print(f"❌ Need vosk and a model at {VOSK_MODEL_PATH} (set VOSK_MODEL_PATH)")
+        sys.exit(1)
+    source = wav_blocks(sys.argv[1]) if len(sys.argv) > 1 else microphone_blocks()
+    start = time.perf_counter()
+    for at, keyword, text in spot(source):
+        print(f"🚨 {at:7.2f}s  '{keyword}'  (heard: '{text}')")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
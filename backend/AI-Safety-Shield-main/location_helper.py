@@ -5,34 +5,68 @@ Location helper for laptop + phone integration.
 Provides:
 - get_gps_coordinates(timeout_seconds=5) -> (lat, lon)
     * tries gpsd/serial (if available), then multiple IP providers (ipapi/ipinfo/ipgeolocation)
-- _read_latest_from_file(max_age=30) -> (lat, lon)
-    * reads latest_location.json written by a phone POST server (if you use phone_receiver)
-- get_live_location(fixed_lat, fixed_lon) -> (lat, lon)
+    * gpsd is one persistent streaming subscription (GpsdStream); serial ports that don't
+      answer are skipped for SERIAL_RETRY_TTL; IP providers are raced, first valid answer wins
+- push_phone_location(device_id, lat, lon, ts, accuracy) / get_phone_location(device_id)
+    * in-memory, lock-protected slot per device, filled by app.py's POST /api/location;
+      only shared (token) devices count as "the newest fix" for callers without a device
+- _read_latest_from_file(max_age=30) -> (lat, lon, ts)
+    * reads latest_location.json written by a phone POST server (optional fallback,
+      polled in the background only when PHONE_FILE_FALLBACK=1)
+- LocationService / get_location_service()
+    * background threads keep a timestamped fix per source (file / gps / ip) fresh;
+      a fix older than its source's SOURCE_MAX_AGE is ignored
+- get_live_location(fixed_lat, fixed_lon, device_id=None) -> (lat, lon)
+    * returns the cached best fix immediately (never does I/O); starts the service on first use
     * Priority:
-       1) latest_location.json (phone push) if recent
-       2) gpsd / serial NMEA
-       3) multi-provider IP geolocation
-       4) fixed_lat/fixed_lon (if provided)
-       5) (None, None)
+       1) phone push (that device's only; without device_id, the newest shared one) if recent
+       2) latest_location.json (if PHONE_FILE_FALLBACK=1) if recent
+       3) gpsd / serial NMEA
+       4) multi-provider IP geolocation
+       5) fixed_lat/fixed_lon (if provided)
+       6) (None, None)
 Notes:
 - Requires `requests` for IP lookups (pip install requests).
 - Optional libs for gps/serial: gps3, pyserial, pynmea2 (only used if installed).
 """
 
+import math
 import os
+import threading
 import time
+from collections import OrderedDict
 from typing import Tuple
 
 # ---------- configurable ----------
 LATEST_LOCATION_FILE = "latest_location.json"   # file written by phone_receiver.py (optional)
 LATEST_MAX_AGE = 30     # seconds: consider phone location recent if written within this many seconds
+PHONE_FILE_FALLBACK = os.getenv("PHONE_FILE_FALLBACK", "0") == "1"   # also poll LATEST_LOCATION_FILE
+MAX_PHONE_DEVICES = 1000
+
+# Background refresh: source -> seconds between refreshes after a success / after a failure
+SOURCE_REFRESH = {
+    "file": (1, 1),
+    "gps": (5, 60),
+    "ip": (300, 30),
+}
+# A cached fix older than this (seconds) is not used
+SOURCE_MAX_AGE = {
+    "phone": LATEST_MAX_AGE,
+    "file": LATEST_MAX_AGE,
+    "gps": 30,
+    "ip": 3600,
+}
+SOURCE_PRIORITY = ("file", "gps", "ip")     # pushed phone fixes always come first
 # ----------------------------------
 
-def _read_latest_from_file(max_age: int = LATEST_MAX_AGE) -> Tuple[float, float]:
-    """Return (lat, lon) from latest_location.json if present and recent, else (None, None)."""
+def _read_latest_from_file(max_age: int = LATEST_MAX_AGE) -> Tuple[float, float, float]:
+    """
+    Return (lat, lon, ts) from latest_location.json if present and recent, else
+    (None, None, None). ts is the time written in the file, not when it was read.
+    """
     fn = LATEST_LOCATION_FILE
     if not os.path.exists(fn):
-        return (None, None)
+        return (None, None, None)
     try:
         import json
         with open(fn, "r") as f:
@@ -42,171 +76,489 @@ def _read_latest_from_file(max_age: int = LATEST_MAX_AGE) -> Tuple[float, float]
             lat = j.get("lat")
             lon = j.get("lon")
             if lat is not None and lon is not None:
-                return float(lat), float(lon)
+                return float(lat), float(lon), float(ts)
     except Exception:
         # any error -> treat as not available
-        return (None, None)
-    return (None, None)
+        return (None, None, None)
+    return (None, None, None)
 
 
-def _query_ipapi() -> Tuple[float, float]:
+# ---------- phone push (in memory; written by POST /api/location) ----------
+_phone_fixes = OrderedDict()    # device id -> (lat, lon, ts, accuracy), least recently pushed first
+_phone_latest = None            # (device id, lat, lon, ts, accuracy) of the newest shared push
+_phone_lock = threading.Lock()
+
+
+def validate_fix(lat, lon, ts=None, accuracy=None):
+    """Return (lat, lon, ts, accuracy) as floats or raise ValueError with a readable reason."""
     try:
-        import requests
-        r = requests.get("https://ipapi.co/json/", timeout=4)
-        if r.status_code == 200:
-            j = r.json()
-            lat = j.get("latitude") or j.get("lat")
-            lon = j.get("longitude") or j.get("lon")
-            if lat is not None and lon is not None:
-                return float(lat), float(lon)
-    except Exception:
-        pass
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("lat and lon must be numbers")
+    if not (math.isfinite(lat) and math.isfinite(lon)) or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("lat must be in [-90, 90] and lon in [-180, 180]")
+    now = time.time()
+    if ts is None:
+        ts = now
+    else:
+        try:
+            ts = float(ts)
+        except (TypeError, ValueError):
+            raise ValueError("ts must be a unix timestamp in seconds")
+        if ts > 1e11:           # JavaScript Date.now() sends milliseconds
+            ts /= 1000.0
+        if not math.isfinite(ts) or ts > now + 60:
+            raise ValueError("ts is in the future")
+    if accuracy is not None:
+        try:
+            accuracy = float(accuracy)
+        except (TypeError, ValueError):
+            raise ValueError("accuracy must be a number (metres)")
+        if not math.isfinite(accuracy) or accuracy < 0:
+            raise ValueError("accuracy must be >= 0")
+    return lat, lon, ts, accuracy
+
+
+def push_phone_location(device_id, lat, lon, ts=None, accuracy=None, shared=False):
+    """
+    Store a phone fix for `device_id` (validated; raises ValueError on bad data).
+    shared: also offer it to lookups without a device id (trusted devices only).
+    """
+    global _phone_latest
+    lat, lon, ts, accuracy = validate_fix(lat, lon, ts, accuracy)
+    with _phone_lock:
+        old = _phone_fixes.get(device_id)
+        if old is not None and old[2] > ts:
+            return False            # out-of-order delivery: keep the newer fix
+        _phone_fixes[device_id] = (lat, lon, ts, accuracy)
+        _phone_fixes.move_to_end(device_id)
+        while len(_phone_fixes) > MAX_PHONE_DEVICES:
+            _phone_fixes.popitem(last=False)
+        if shared and (_phone_latest is None or ts >= _phone_latest[3]):
+            _phone_latest = (device_id, lat, lon, ts, accuracy)
+    return True
+
+
+def get_phone_fix(device_id=None, max_age=LATEST_MAX_AGE):
+    """(lat, lon, ts) of that device (or the newest shared one) if recent, else None."""
+    if device_id is not None:
+        fix = _phone_fixes.get(device_id)
+    else:
+        latest = _phone_latest
+        fix = latest[1:] if latest is not None else None
+    if fix is not None and time.time() - fix[2] <= max_age:
+        return fix[0], fix[1], fix[2]
+    return None
+
+
+def get_phone_location(device_id=None, max_age=LATEST_MAX_AGE) -> Tuple[float, float]:
+    fix = get_phone_fix(device_id, max_age)
+    return (fix[0], fix[1]) if fix is not None else (None, None)
+
+
+# ---------- IP geolocation (providers raced concurrently) ----------
+def _parse_latlon_fields(j):
+    lat = j.get("latitude") or j.get("lat")
+    lon = j.get("longitude") or j.get("lon")
+    if lat is not None and lon is not None:
+        return float(lat), float(lon)
     return (None, None)
 
 
-def _query_ipinfo() -> Tuple[float, float]:
-    try:
-        import requests
-        r = requests.get("https://ipinfo.io/json", timeout=4)
-        if r.status_code == 200:
-            j = r.json()
-            loc = j.get("loc")
-            if loc:
-                lat_str, lon_str = loc.split(",")
-                return float(lat_str), float(lon_str)
-    except Exception:
-        pass
+def _parse_ipinfo(j):
+    loc = j.get("loc")
+    if loc:
+        lat_str, lon_str = loc.split(",")
+        return float(lat_str), float(lon_str)
     return (None, None)
 
 
-def _query_ipgeolocation() -> Tuple[float, float]:
+# name -> (url, parser). IP_PROVIDERS (env, CSV of names) picks which ones are raced.
+IP_PROVIDER_REGISTRY = {
+    "ipapi": ("https://ipapi.co/json/", _parse_latlon_fields),
+    "ipinfo": ("https://ipinfo.io/json", _parse_ipinfo),
+    # free endpoint may exist without key; if you have a key you can modify the URL/params
+    "ipgeolocation": ("https://api.ipgeolocation.io/ipgeo", _parse_latlon_fields),
+}
+IP_PROVIDERS = [n.strip() for n in os.getenv("IP_PROVIDERS", "ipapi,ipinfo,ipgeolocation").split(",")
+                if n.strip() in IP_PROVIDER_REGISTRY]
+IP_TIMEOUT = float(os.getenv("IP_TIMEOUT", "4"))
+
+_http = None
+_ip_pool = None
+_ip_lock = threading.Lock()
+
+
+def _ip_clients():
+    """Shared keep-alive session + small thread pool for the provider race."""
+    global _http, _ip_pool
+    with _ip_lock:
+        if _http is None:
+            import requests
+            from concurrent.futures import ThreadPoolExecutor
+            _http = requests.Session()
+            _ip_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ip-geo")
+        return _http, _ip_pool
+
+
+def _query_provider(url, parser, timeout=IP_TIMEOUT) -> Tuple[float, float]:
     try:
-        import requests
-        # free endpoint may exist without key; if you have a key you can modify the URL/params
-        r = requests.get("https://api.ipgeolocation.io/ipgeo", timeout=4)
+        http, _ = _ip_clients()
+        r = http.get(url, timeout=timeout)
         if r.status_code == 200:
-            j = r.json()
-            lat = j.get("latitude")
-            lon = j.get("longitude")
-            if lat is not None and lon is not None:
-                return float(lat), float(lon)
+            return parser(r.json())
     except Exception:
         pass
     return (None, None)
 
 
-def get_gps_coordinates(timeout_seconds: int = 5) -> Tuple[float, float]:
+def _query_ipapi() -> Tuple[float, float]:
+    return _query_provider(*IP_PROVIDER_REGISTRY["ipapi"])
+
+
+def _query_ipinfo() -> Tuple[float, float]:
+    return _query_provider(*IP_PROVIDER_REGISTRY["ipinfo"])
+
+
+def _query_ipgeolocation() -> Tuple[float, float]:
+    return _query_provider(*IP_PROVIDER_REGISTRY["ipgeolocation"])
+
+
+def _query_ip(providers=None, timeout=IP_TIMEOUT) -> Tuple[float, float]:
     """
-    Try to obtain live coordinates. Order:
-      - gpsd via gps3 (if available)
-      - serial NMEA via pyserial + pynmea2 (if available)
-      - multi-provider IP geolocation (ipapi > ipinfo > ipgeolocation)
-    Returns (lat, lon) or (None, None).
+    Race the IP providers: all are queried at once and the first valid answer wins,
+    so the worst case is one provider timeout instead of the sum of them.
+    providers: list of (url, parser); default IP_PROVIDERS from IP_PROVIDER_REGISTRY.
     """
-    # 1) gpsd via gps3
-    try:
-        from gps3 import gps3
-        start = time.time()
-        gps_socket = gps3.GPSDSocket()
-        data_stream = gps3.DataStream()
-        gps_socket.connect()
-        gps_socket.watch()
-        for new_data in gps_socket:
-            if new_data:
-                data_stream.unpack(new_data)
-                lat = getattr(data_stream.TPV, "lat", None)
-                lon = getattr(data_stream.TPV, "lon", None)
-                if lat is not None and lon is not None:
+    from concurrent.futures import FIRST_COMPLETED, wait
+    if providers is None:
+        providers = [IP_PROVIDER_REGISTRY[n] for n in IP_PROVIDERS]
+    if not providers:
+        return (None, None)
+    _, pool = _ip_clients()
+    pending = {pool.submit(_query_provider, url, parser, timeout) for url, parser in providers}
+    deadline = time.time() + timeout + 1
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            lat, lon = fut.result()
+            if lat is not None and lon is not None:
+                for other in pending:
+                    other.cancel()   # not started yet -> never runs; running ones finish in the background
+                return lat, lon
+    return (None, None)
+
+
+# ---------- gpsd (one persistent streaming subscription) ----------
+GPSD_RETRY = 30         # seconds before reconnecting after gpsd is missing / drops
+
+
+class GpsdStream:
+    """Background reader of gpsd's WATCH stream; latest() is a cached lookup."""
+
+    def __init__(self, retry=GPSD_RETRY):
+        self.retry = retry
+        self._fix = None            # (lat, lon, ts)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._first_fix = threading.Event()     # set on the first TPV with a position
+        self.available = None       # None = not tried yet, False = gpsd / gps3 missing
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="gpsd-stream", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self, max_age=SOURCE_MAX_AGE["gps"]):
+        fix = self._fix
+        if fix is not None and time.time() - fix[2] <= max_age:
+            return fix[0], fix[1]
+        return (None, None)
+
+    def wait_fix(self, timeout):
+        """Block up to `timeout` seconds for the first fix; returns early if gpsd is unavailable."""
+        deadline = time.time() + timeout
+        while not self._first_fix.is_set():
+            left = deadline - time.time()
+            if left <= 0 or self.available is False:
+                break
+            self._first_fix.wait(min(0.1, left))
+        return self._first_fix.is_set()
+
+    def _run(self):
+        try:
+            from gps3 import gps3
+        except ImportError:
+            self.available = False
+            return
+        while not self._stop.is_set():
+            gps_socket = None
+            try:
+                gps_socket = gps3.GPSDSocket()
+                data_stream = gps3.DataStream()
+                gps_socket.connect()
+                gps_socket.watch()
+                self.available = True
+                for new_data in gps_socket:
+                    if self._stop.is_set():
+                        break
+                    if not new_data:
+                        continue
+                    data_stream.unpack(new_data)
+                    lat = getattr(data_stream.TPV, "lat", None)
+                    lon = getattr(data_stream.TPV, "lon", None)
                     try:
-                        return float(lat), float(lon)
+                        self._fix = (float(lat), float(lon), time.time())
+                        self._first_fix.set()
+                    except (TypeError, ValueError):
+                        pass    # "n/a" until the receiver has a fix
+            except Exception as e:
+                self.available = False
+                print(f"[location] gpsd unavailable ({e}); retrying in {self.retry}s")
+            finally:
+                if gps_socket is not None:
+                    try:
+                        gps_socket.close()
                     except Exception:
                         pass
-            if time.time() - start > timeout_seconds:
-                break
-    except Exception:
-        pass
+            self._stop.wait(self.retry)
+
+
+_gpsd = GpsdStream()
+
+
+def _query_gpsd(timeout_seconds: int = 5) -> Tuple[float, float]:
+    """
+    Latest fix from the persistent gpsd subscription (started on first use). Until the
+    stream has had its first fix this waits up to timeout_seconds for it; after that it
+    is a cached lookup.
+    """
+    _gpsd.start().wait_fix(timeout_seconds)
+    return _gpsd.latest()
+
+
+# ---------- serial NMEA (probe results memoized) ----------
+GPS_SERIAL_PORTS = [p.strip() for p in os.getenv(
+    "GPS_SERIAL_PORTS",
+    "/dev/ttyUSB0,/dev/ttyUSB1,/dev/ttyACM0,/dev/ttyAMA0,/dev/ttyS0,COM3,COM4,COM5").split(",") if p.strip()]
+SERIAL_RETRY_TTL = 120  # seconds before a port that failed to open / gave no NMEA is probed again
+SERIAL_READ_WINDOW = 2  # seconds to wait for a usable sentence per port
+
+_serial_probe = {}      # port -> (works: bool, checked_at)
+_serial_lock = threading.Lock()
 
-    # 2) Serial NMEA (pyserial + pynmea2)
+
+def _read_nmea(port, timeout_seconds):
+    """Open one port and return (lat, lon) from the first GGA/RMC sentence, or (None, None)."""
+    import serial
+    import pynmea2
+    ser = serial.Serial(port, baudrate=9600, timeout=1)
+    start = time.time()
     try:
-        import serial
-        import pynmea2
-        candidates = [
-            '/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyAMA0',
-            '/dev/ttyS0', 'COM3', 'COM4', 'COM5'
-        ]
-        start_all = time.time()
-        for port in candidates:
-            try:
-                ser = serial.Serial(port, baudrate=9600, timeout=1)
-            except Exception:
+        while time.time() - start < timeout_seconds:
+            line = ser.readline().decode('ascii', errors='ignore').strip()
+            if not line:
                 continue
-            start = time.time()
-            try:
-                while time.time() - start < min(2, timeout_seconds):
-                    line = ser.readline().decode('ascii', errors='ignore').strip()
-                    if not line:
-                        continue
-                    if line.startswith('$GPGGA') or line.startswith('$GNGGA') or line.startswith('$GPRMC') or line.startswith('$GNRMC'):
-                        try:
-                            msg = pynmea2.parse(line)
-                            if hasattr(msg, 'latitude') and hasattr(msg, 'longitude'):
-                                latf = msg.latitude
-                                lonf = msg.longitude
-                                if latf is not None and lonf is not None:
-                                    return float(latf), float(lonf)
-                        except Exception:
-                            continue
-            finally:
+            if line.startswith('$GPGGA') or line.startswith('$GNGGA') or line.startswith('$GPRMC') or line.startswith('$GNRMC'):
                 try:
-                    ser.close()
+                    msg = pynmea2.parse(line)
+                    if hasattr(msg, 'latitude') and hasattr(msg, 'longitude'):
+                        latf = msg.latitude
+                        lonf = msg.longitude
+                        if latf is not None and lonf is not None:
+                            return float(latf), float(lonf)
                 except Exception:
-                    pass
-            if time.time() - start_all > timeout_seconds * 2:
-                break
-    except Exception:
-        pass
+                    continue
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+    return (None, None)
 
-    # 3) IP geolocation multi-provider (best-effort)
-    lat, lon = _query_ipapi()
-    if lat is not None and lon is not None:
-        return lat, lon
-    lat, lon = _query_ipinfo()
+
+def _query_serial(timeout_seconds: int = 5, ports=None) -> Tuple[float, float]:
+    """
+    Serial NMEA (pyserial + pynmea2). The port that last worked is tried first; ports
+    that failed are skipped until SERIAL_RETRY_TTL has passed.
+    """
+    try:
+        import serial  # noqa: F401  (only probe if the libraries exist)
+        import pynmea2  # noqa: F401
+    except ImportError:
+        return (None, None)
+    ports = GPS_SERIAL_PORTS if ports is None else ports
+    now = time.time()
+    with _serial_lock:
+        known_good = [p for p in ports if _serial_probe.get(p, (False, 0))[0]]
+        due = [p for p in ports if p not in known_good
+               and now - _serial_probe.get(p, (False, -SERIAL_RETRY_TTL))[1] >= SERIAL_RETRY_TTL]
+    for port in known_good + due:
+        try:
+            lat, lon = _read_nmea(port, min(SERIAL_READ_WINDOW, timeout_seconds))
+        except Exception:
+            lat, lon = None, None
+        works = lat is not None and lon is not None
+        with _serial_lock:
+            _serial_probe[port] = (works, time.time())
+        if works:
+            return lat, lon
+    return (None, None)
+
+
+def _query_gps(timeout_seconds: int = 5) -> Tuple[float, float]:
+    """gpsd first, then serial NMEA."""
+    lat, lon = _query_gpsd(timeout_seconds)
     if lat is not None and lon is not None:
         return lat, lon
-    lat, lon = _query_ipgeolocation()
+    return _query_serial(timeout_seconds)
+
+
+def get_gps_coordinates(timeout_seconds: int = 5) -> Tuple[float, float]:
+    """
+    Try to obtain live coordinates. Order:
+      - gpsd via gps3 (if available)
+      - serial NMEA via pyserial + pynmea2 (if available)
+      - multi-provider IP geolocation (all providers raced concurrently)
+    Returns (lat, lon) or (None, None). Blocking - worst case is one serial read
+    window per due port plus one IP provider timeout.
+    """
+    lat, lon = _query_gps(timeout_seconds)
     if lat is not None and lon is not None:
         return lat, lon
+    return _query_ip()
 
-    return (None, None)
 
+class LocationService:
+    """
+    Keeps the latest fix of every source fresh from background threads, so reading
+    the location is a dict lookup instead of seconds of gpsd / serial / HTTP I/O.
+    """
+
+    def __init__(self, sources=None, refresh=SOURCE_REFRESH, max_age=SOURCE_MAX_AGE,
+                 priority=SOURCE_PRIORITY):
+        """
+        sources: name -> zero-argument callable returning (lat, lon) or (None, None); a
+        source that knows when its fix was taken returns (lat, lon, ts) instead.
+        """
+        if sources is None:
+            sources = {"gps": _query_gps, "ip": _query_ip}
+            if PHONE_FILE_FALLBACK:
+                sources["file"] = _read_latest_from_file
+        self.sources = sources
+        self.refresh = refresh
+        self.max_age = max_age
+        self.priority = [p for p in priority if p in self.sources]
+        self._fixes = {}            # source -> (lat, lon, ts); replaced whole, never mutated
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            self._stop.clear()
+            for name in self.sources:
+                t = threading.Thread(target=self._run, args=(name,), name=f"location-{name}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
 
-def get_live_location(fixed_lat: float = None, fixed_lon: float = None) -> Tuple[float, float]:
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout=1)
+
+    def is_running(self):
+        return bool(self._threads)
+
+    def update(self, source, lat, lon, ts=None):
+        """Store a fix for `source` (also used by push-style sources)."""
+        self._fixes[source] = (float(lat), float(lon), time.time() if ts is None else ts)
+
+    def _run(self, name):
+        query = self.sources[name]
+        ok_interval, fail_interval = self.refresh.get(name, (10, 30))
+        while not self._stop.is_set():
+            try:
+                fix = query()
+                lat, lon = fix[0], fix[1]
+                ts = fix[2] if len(fix) > 2 else None
+            except Exception as e:
+                print(f"[location] {name} refresh failed: {e}")
+                lat, lon = None, None
+            if lat is not None and lon is not None:
+                # a file fix keeps the time it was written, so it expires SOURCE_MAX_AGE after that
+                self.update(name, lat, lon, ts)
+                wait = ok_interval
+            else:
+                wait = fail_interval
+            self._stop.wait(wait)
+
+    def estimate(self, now=None, device_id=None):
+        """
+        Best fresh fix as {"lat", "lon", "source", "ts", "age"}, or None.
+        A pushed phone fix wins over every polled source: `device_id`'s own only (never
+        another device's), or without a device id the newest shared one.
+        """
+        now = time.time() if now is None else now
+        phone = get_phone_fix(device_id, self.max_age.get("phone", LATEST_MAX_AGE))
+        if phone is not None:
+            return {"lat": phone[0], "lon": phone[1], "source": "phone", "ts": phone[2], "age": now - phone[2]}
+        fixes = self._fixes
+        for name in self.priority:
+            fix = fixes.get(name)
+            if fix is not None and now - fix[2] <= self.max_age.get(name, 60):
+                return {"lat": fix[0], "lon": fix[1], "source": name, "ts": fix[2], "age": now - fix[2]}
+        return None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_location_service() -> LocationService:
+    """Process-wide service (created and started on first use)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LocationService()
+        return _service.start()
+
+
+def get_live_location(fixed_lat: float = None, fixed_lon: float = None,
+                      device_id: str = None) -> Tuple[float, float]:
     """
     Return the best available live coordinates, prioritizing:
-     1) latest_location.json (phone push) if recent
-     2) gpsd / serial NMEA
-     3) multi-provider IP geolocation
-     4) fixed_lat/fixed_lon (if provided)
-     5) (None, None)
+     1) phone push (device_id's own; without device_id, the newest shared one) if recent
+     2) latest_location.json (only with PHONE_FILE_FALLBACK=1) if recent
+     3) gpsd / serial NMEA
+     4) multi-provider IP geolocation
+     5) fixed_lat/fixed_lon (if provided)
+     6) (None, None)
+    Reads the LocationService cache, so it returns immediately; the first call starts
+    the service (call get_location_service() at startup so the cache is warm early).
     This function signature matches main_surveillance.py expectations.
     """
     try:
-        # 1) phone pushed file
-        lat, lon = _read_latest_from_file()
-        if lat is not None and lon is not None:
-            return lat, lon
-    except Exception:
-        pass
-
-    try:
-        # 2/3) GPS or IP
-        lat, lon = get_gps_coordinates()
-        if lat is not None and lon is not None:
-            return lat, lon
+        fix = get_location_service().estimate(device_id=device_id)
+        if fix is not None:
+            return fix["lat"], fix["lon"]
     except Exception:
         pass
 
-    # 4) fixed coordinates if user provided at startup
+    # 5) fixed coordinates if user provided at startup
     if fixed_lat is not None and fixed_lon is not None:
         try:
             return float(fixed_lat), float(fixed_lon)
@@ -221,3 +573,5 @@ if __name__ == "__main__":
     print("Reading latest file:", _read_latest_from_file())
     print("GPS/IP attempt (may be slow):", get_gps_coordinates())
     print("get_live_location(None,None):", get_live_location(None, None))
+    time.sleep(6)
+    print("Cached estimate after 6 s:", get_location_service().estimate())
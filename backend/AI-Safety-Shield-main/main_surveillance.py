@@ -25,31 +25,44 @@ import cv2
 
 # local helpers & modules
 from audio_thread import AudioThread
+import weapon_detector
 from weapon_detector import get_weapon_score
-from proximity_logic import get_proximity_score
-from location_helper import get_live_location
-from whatsapp_wasender import send_wasender_alert_async
-
-# Wasender sender
+from proximity_logic import get_proximity_score, get_proximity_pairs_from_boxes
+from location_helper import get_live_location, get_location_service
+from frame_pipeline import CaptureThread, DropStaleQueue, InferenceWorker
+from motion_scheduler import MotionScheduler
+from tracker import ObjectTracker, detections_from_results
+from alert_store import get_alert_store
+from score_fusion import get_fuser, level
+from camera_supervisor import CameraSupervisor, parse_sources
+# Alerts go through the durable outbox; its background thread does the Wasender sends
+from alert_outbox import get_outbox
+
+# Wasender message format
 try:
-    from whatsapp_wasender import send_wasender_alert_async
+    from whatsapp_wasender import build_alert_message
 except Exception as e:
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] WARNING: whatsapp_wasender import failed: {e}")
-    def send_wasender_alert_async(*args, **kwargs):
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] [wasender_stub] called")
-        return False, "wasender missing"
+    def build_alert_message(lat=None, lon=None, event_label="DANGER DETECTED", extra_text=None):
+        return f"{event_label}\n{extra_text or ''}\nLocation: {lat},{lon}"
 
 try:
     from pose_module import get_pose_score
 except ImportError:
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] WARNING: pose_module not found; pose scoring disabled.")
-    def get_pose_score(f): return 0
+    def get_pose_score(f, results=None): return 0
 
 # CONFIG
-ALERT_THRESHOLD = 60
+ALERT_THRESHOLD = 60    # display only; statuses come from score_fusion (DANGER_AT / WARNING_AT)
+STREAM = "camera"       # fusion stream id of this camera
+STATS_INTERVAL = 10     # seconds between per-source frame stats in multi-camera mode
 TARGET_WIDTH = 480
 TARGET_HEIGHT = 360
-SKIP_RATE = 5
+CAMERA_INDEX = 0
+CAMERA_API = cv2.CAP_DSHOW if os.name == "nt" else cv2.CAP_ANY
+RENDER_QUEUE_SIZE = 2   # frames the display may lag behind capture before old ones are dropped
+PERSON_CLASS = 0
+TRACK_CLASSES = [0, 34, 43, 76]   # person + weapons (same as weapon_detector.DETECT_CLASSES)
 
 def safe_print(*args, **kwargs):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ", *args, **kwargs)
@@ -70,6 +83,18 @@ def get_emergency_number_from_sources() -> str:
         return env_val
     return ""
 
+def get_camera_sources() -> list:
+    """
+    Several cameras: --sources 0,/dev/video2,rtsp://...,clip.mp4 (or ENV CAMERA_SOURCES).
+    Empty list = the single default camera.
+    """
+    for i, a in enumerate(sys.argv):
+        if a.startswith("--sources="):
+            return parse_sources(a.split("=", 1)[1])
+        if a == "--sources" and i+1 < len(sys.argv):
+            return parse_sources(sys.argv[i+1])
+    return parse_sources(os.getenv("CAMERA_SOURCES", ""))
+
 def prompt_emergency_contact_interactive() -> str:
     if not sys.stdin or not sys.stdin.isatty():
         safe_print("Non-interactive; skipping emergency prompt.")
@@ -157,6 +182,202 @@ def _parse_coords_string(s: str):
 
     return (None, None)
 
+def run_detectors(frame):
+    """
+    Heavy stage: weapon (YOLO), proximity and pose on one frame.
+    Runs on the inference worker thread, never on the display thread.
+    """
+    try:
+        result_data = get_weapon_score(frame)
+    except Exception as e:
+        safe_print("Weapon detection error:", e)
+        result_data = None
+    return _finish_detection(frame, result_data)
+
+def run_detectors_batch(frames):
+    """run_detectors for several cameras at once: ONE YOLO call for all frames."""
+    try:
+        results = weapon_detector.get_weapon_scores(frames)
+    except Exception as e:
+        safe_print("Weapon detection error:", e)
+        results = [None] * len(frames)
+    return [_finish_detection(f, r) for f, r in zip(frames, results)]
+
+def _finish_detection(frame, result_data):
+    """Proximity + pose on the YOLO result of one frame -> detection dict."""
+    weapons_detected = []
+    if isinstance(result_data, tuple):
+        try:
+            w_score = result_data[0]
+            raw_list = result_data[1]
+            raw_results = result_data[2]
+        except Exception:
+            w_score = 0; raw_list = []; raw_results = None
+        weapon_score = 45 if w_score > 0 else 0
+        for item in raw_list:
+            try:
+                if item in ["baseball bat", "scissors", "knife"]:
+                    weapons_detected.append("WEAPON")
+                else:
+                    weapons_detected.append(item)
+            except Exception:
+                continue
+    else:
+        weapon_score = 0
+        raw_results = None
+
+    try:
+        proximity_score = get_proximity_score(raw_results)
+    except Exception as e:
+        safe_print("Proximity error:", e)
+        proximity_score = 0
+
+    try:
+        # pose only on the people YOLO found (full frame if detection failed)
+        pose_score = get_pose_score(frame, raw_results)
+    except Exception as e:
+        safe_print("Pose error:", e)
+        pose_score = 0
+
+    return {
+        "weapon_score": weapon_score,
+        "weapons": weapons_detected,
+        "proximity_score": proximity_score,
+        "pose_score": pose_score,
+        "raw_results": raw_results,
+        # numpy (xyxy, cls, conf) for the tracker - extracted here, off the display thread
+        "detections": detections_from_results(raw_results, TRACK_CLASSES),
+    }
+
+def queue_alert(total_score, status, extra, emergency_number, lat, lon):
+    """Log the alert, and queue the WhatsApp message if there is a number to send it to."""
+    if not emergency_number:
+        safe_print("No emergency number; skipping WhatsApp alert.")
+        get_alert_store().log_alert(total_score, reason=extra, delivered=False,
+                                    delivery_meta="No emergency number", lat=lat, lon=lon)
+        return
+    # one local SQLite transaction; sending + retries happen on the outbox thread
+    message = build_alert_message(lat, lon, status, extra)
+    event_id, _ = get_outbox().enqueue(message, [emergency_number], total_score,
+                                       reason=extra, lat=lat, lon=lon)
+    safe_print(f"[ALERT] Queued WhatsApp alert for {emergency_number} (event {event_id})")
+
+def draw_tracks(frame, tracks, close_pairs=()):
+    """Overlay tracked boxes with their persistent IDs, and link people who are too close."""
+    for a, b in close_pairs:
+        ca = (int((a[0] + a[2]) / 2), int((a[1] + a[3]) / 2))
+        cb = (int((b[0] + b[2]) / 2), int((b[1] + b[3]) / 2))
+        cv2.line(frame, ca, cb, (0, 165, 255), 2)
+    for t in tracks:
+        x1, y1, x2, y2 = (int(v) for v in t.box)
+        color = (0, 255, 0) if t.cls == PERSON_CLASS else (0, 0, 255)
+        label = f"#{t.id} person" if t.cls == PERSON_CLASS else f"#{t.id} WEAPON"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 1)
+        cv2.putText(frame, label, (max(0, x1), max(12, y1 - 4)), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+def run_multi(sources, emergency_number, fixed_lat, fixed_lon):
+    """
+    Several cameras (--sources): capture + decoding run in one worker process per source
+    (camera_supervisor.py, restarted if they crash); this thread runs ONE batched YOLO
+    call on the newest frame of every camera and scores each camera as its own stream.
+    --headless: no windows.  --loop: replay video files.
+    """
+    headless = "--headless" in sys.argv
+    supervisor = CameraSupervisor(sources, size=(TARGET_WIDTH, TARGET_HEIGHT), loop="--loop" in sys.argv)
+    fuser = get_fuser()
+    bus = fuser.bus
+    streams = [f"camera{i}" for i in range(len(sources))]
+
+    # the microphone counts for the first camera
+    audio_checker = AudioThread(1, bus=bus, stream=streams[0])
+    audio_checker.daemon = True
+    try:
+        audio_checker.start()
+    except Exception as e:
+        safe_print("Audio thread start warning:", e)
+
+    try:
+        weapon_detector.warmup()
+    except Exception as e:
+        safe_print("Model warmup warning:", e)
+
+    supervisor.start()
+    safe_print(f"System Armed on {len(sources)} sources. Threshold: {ALERT_THRESHOLD}")
+
+    last_status = {stream: "SAFE" for stream in streams}
+    last_stats = time.monotonic()
+    running = True
+    try:
+        while running and not supervisor.finished():
+            batch = supervisor.get_batch(timeout=0.5)
+            if not batch:
+                continue
+            detections = run_detectors_batch([packet.frame for _, packet in batch])
+            for (i, packet), det in zip(batch, detections):
+                for sensor in ("weapon", "pose", "proximity"):
+                    bus.publish(streams[i], sensor, level(sensor, det[f"{sensor}_score"]), packet.ts)
+
+            # every camera scored in one vectorized pass
+            ids, scores, statuses = fuser.evaluate()
+            fused = dict(zip(ids, zip(scores.tolist(), statuses)))
+
+            for (i, packet), det in zip(batch, detections):
+                stream = streams[i]
+                total_score, fused_status = fused.get(stream, (0, "SAFE"))
+                status = "DANGER DETECTED" if fused_status == "DANGER" else fused_status
+
+                if status == "DANGER DETECTED" and last_status[stream] != "DANGER DETECTED":
+                    weapons_txt = ", ".join(det["weapons"])
+                    extra = f"Camera: {sources[i]}\nScore: {total_score}"
+                    if weapons_txt:
+                        extra += f"\nWeapons: {weapons_txt}"
+                    try:
+                        lat, lon = get_live_location(fixed_lat, fixed_lon)   # cached, never blocks
+                        queue_alert(total_score, status, extra, emergency_number, lat, lon)
+                    except Exception as e:
+                        safe_print("Error in alert trigger:", e)
+
+                if status != last_status[stream]:
+                    try:
+                        get_alert_store().log_event("status", score=total_score, source=stream,
+                                                    data={"from": last_status[stream], "to": status,
+                                                          "camera": sources[i]})
+                    except Exception as e:
+                        safe_print("Event log error:", e)
+                    last_status[stream] = status
+
+                if not headless:
+                    color = {"SAFE": (0,255,0), "WARNING": (0,255,255)}.get(status, (0,0,255))
+                    frame = packet.frame
+                    cv2.putText(frame, f"STATUS: {status}", (10,25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                    cv2.putText(frame, f"SCORE: {total_score}/{ALERT_THRESHOLD}", (10,50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                    cv2.imshow(f"Camera {i}: {sources[i]}", frame)
+
+            if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                safe_print("Quit pressed; exiting.")
+                running = False
+
+            if time.monotonic() - last_stats > STATS_INTERVAL:
+                last_stats = time.monotonic()
+                for st in supervisor.stats():
+                    safe_print(f"[sources] {st}")
+
+    except Exception as e:
+        safe_print("Unhandled exception:", e)
+        traceback.print_exc()
+    finally:
+        safe_print("Shutting down...")
+        try:
+            audio_checker.stop()
+        except Exception:
+            pass
+        supervisor.stop()
+        try:
+            cv2.destroyAllWindows()
+        except Exception:
+            pass
+        safe_print("Exited cleanly.")
+
 def main():
     # emergency number from CLI/env first
     emergency_number = get_emergency_number_from_sources()
@@ -168,127 +389,110 @@ def main():
     if not emergency_number:
         emergency_number = prompt_emergency_contact_interactive()
 
-    # camera
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    if not cap.isOpened():
-        safe_print("Could not open webcam — retrying...")
-        retries = 0
-        while retries < 5 and not cap.isOpened():
-            time.sleep(1)
-            try:
-                cap.open(0, cv2.CAP_DSHOW)
-            except Exception:
-                pass
-            retries += 1
-            safe_print(f"Retry {retries}, opened: {cap.isOpened()}")
-        if not cap.isOpened():
-            safe_print("Fatal: camera not available. Exiting.")
-            return
+    # Start refreshing the location in the background now, so an alert only reads the cache
+    get_location_service()
+
+    sources = get_camera_sources()
+    if sources:
+        run_multi(sources, emergency_number, fixed_lat, fixed_lon)
+        return
+
+    # pipeline: capture thread -> (newest frame) -> inference worker -> render stage (this thread)
+    render_queue = DropStaleQueue(maxsize=RENDER_QUEUE_SIZE)
+    inference_queue = DropStaleQueue(maxsize=1)
+    result_queue = DropStaleQueue(maxsize=1)
+
+    capture = CaptureThread(CAMERA_INDEX, CAMERA_API, size=(TARGET_WIDTH, TARGET_HEIGHT),
+                            outputs=(render_queue, inference_queue))
+    if not capture.open():
+        safe_print("Fatal: camera not available. Exiting.")
+        return
+    # detectors run on motion (immediately on a spike) plus a periodic refresh on idle scenes
+    scheduler = MotionScheduler()
+    inference = InferenceWorker(run_detectors, inference_queue, result_queue, gate=scheduler.should_run)
 
     # state
-    frame_count = 0
     current_weapon_score = 0
     current_proximity_score = 0
     current_pose_score = 0
     current_weapons_detected = []
     last_status = "SAFE"
+    # carries boxes across frames where the detectors don't run
+    tracker = ObjectTracker()
+
+    # every detector publishes timestamped readings; the fuser aligns and scores them
+    fuser = get_fuser()
+    bus = fuser.bus
 
-    # audio thread
-    audio_checker = AudioThread(1)
+    # audio thread (publishes its own score onto the bus)
+    audio_checker = AudioThread(1, bus=bus, stream=STREAM)
     audio_checker.daemon = True
     try:
         audio_checker.start()
     except Exception as e:
         safe_print("Audio thread start warning:", e)
 
+    # load the weapon model up-front so the first inference frame doesn't stall the feed
+    try:
+        weapon_detector.warmup()
+    except Exception as e:
+        safe_print("Model warmup warning:", e)
+
+    capture.start()
+    inference.start()
+
     safe_print(f"System Armed. Threshold: {ALERT_THRESHOLD}")
 
     running = True
     try:
         while running:
-            try:
-                ret, frame = cap.read()
-            except Exception as e:
-                safe_print("Camera read error:", e)
-                ret = False
-                frame = None
-
-            if not ret or frame is None:
-                time.sleep(0.2)
-                if not cap.isOpened():
-                    try:
-                        cap.open(0, cv2.CAP_DSHOW)
-                    except Exception:
-                        pass
-                continue
-
-            frame_count += 1
-            try:
-                frame = cv2.resize(frame, (TARGET_WIDTH, TARGET_HEIGHT))
-            except Exception as e:
-                safe_print("Frame resize error:", e)
+            packet = render_queue.get(timeout=0.5)
+            if packet is None:
                 continue
-
-            # processing every SKIP_RATE frames
-            if frame_count % SKIP_RATE == 0:
-                try:
-                    result_data = get_weapon_score(frame)
-                except Exception as e:
-                    safe_print("Weapon detection error:", e)
-                    result_data = None
-
-                if isinstance(result_data, tuple):
-                    try:
-                        w_score = result_data[0]
-                        raw_list = result_data[1]
-                        raw_results = result_data[2]
-                    except Exception:
-                        w_score = 0; raw_list = []; raw_results = None
-                    current_weapon_score = 45 if w_score > 0 else 0
-                    current_weapons_detected = []
-                    for item in raw_list:
-                        try:
-                            if item in ["baseball bat", "scissors", "knife"]:
-                                current_weapons_detected.append("WEAPON")
-                            else:
-                                current_weapons_detected.append(item)
-                        except Exception:
-                            continue
-                else:
-                    current_weapon_score = 0
-                    current_weapons_detected = []
-                    raw_results = None
-
-                try:
-                    current_proximity_score = get_proximity_score(raw_results)
-                except Exception as e:
-                    safe_print("Proximity error:", e)
-                    current_proximity_score = 0
-
+            frame = packet.frame
+
+            # newest detection result (if the worker finished one since the last frame)
+            detection = result_queue.get_latest(timeout=0)
+            if detection is not None:
+                _, det_ts, det = detection
+                current_weapon_score = det["weapon_score"]
+                current_weapons_detected = det["weapons"]
+                current_pose_score = det["pose_score"]
+                # stamped with the capture time of the frame they were computed on
+                bus.publish(STREAM, "weapon", level("weapon", current_weapon_score), det_ts)
+                bus.publish(STREAM, "pose", level("pose", current_pose_score), det_ts)
                 try:
-                    current_pose_score = get_pose_score(frame)
+                    tracker.update(*det["detections"], now=det_ts)
                 except Exception as e:
-                    safe_print("Pose error:", e)
-                    current_pose_score = 0
+                    safe_print("Tracker update error:", e)
 
+            # predicted boxes for THIS frame -> proximity + overlays stay current between YOLO runs
             try:
-                last_audio_pts = audio_checker.get_score()
+                tracks = tracker.predict(packet.ts)
+                person_boxes = [t.box for t in tracks if t.cls == PERSON_CLASS]
+                current_proximity_score, close_pairs = get_proximity_pairs_from_boxes(person_boxes)
+                draw_tracks(frame, tracks, close_pairs)
             except Exception as e:
-                safe_print("Audio error:", e)
-                last_audio_pts = 0
+                safe_print("Tracker error:", e)
+                if detection is not None:
+                    current_proximity_score = detection[2]["proximity_score"]
+
+            bus.publish(STREAM, "proximity", level("proximity", current_proximity_score), packet.ts)
 
-            total_score = (int(current_pose_score) + int(last_audio_pts) +
-                           int(current_weapon_score) + int(current_proximity_score))
+            # readings of the last few seconds, decayed to this frame's capture time
+            fused = fuser.fuse(STREAM, packet.ts)
+            total_score, parts = fused["score"], fused["parts"]
 
             # visualization
             color = (0,255,0)
             status = "SAFE"
-            if total_score >= ALERT_THRESHOLD:
+            if fused["status"] == "DANGER":
                 color = (0,0,255); status = "DANGER DETECTED"
-            elif total_score >= 35:
+            elif fused["status"] == "WARNING":
                 color = (0,255,255); status = "WARNING"
 
-            info_text = f"Aud:{last_audio_pts} Wpn:{current_weapon_score} Pose:{current_pose_score} Prox:{current_proximity_score} = {total_score}"
+            info_text = (f"Aud:{parts['audio']} Wpn:{parts['weapon']} Pose:{parts['pose']} "
+                         f"Prox:{parts['proximity']} = {total_score}")
             try:
                 cv2.putText(frame, f"STATUS: {status}", (10,25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
                 cv2.putText(frame, f"SCORE: {total_score}/{ALERT_THRESHOLD}", (10,50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
@@ -309,28 +513,22 @@ def main():
                     weapons_txt = ", ".join(current_weapons_detected) if current_weapons_detected else ""
                     extra = f"Weapons: {weapons_txt}\n{info_text}" if weapons_txt else info_text
 
-                    lat, lon = get_live_location(fixed_lat, fixed_lon)
+                    lat, lon = get_live_location(fixed_lat, fixed_lon)   # cached, never blocks
 
                     if not emergency_number and sys.stdin and sys.stdin.isatty():
                         emergency_number = prompt_emergency_contact_interactive()
 
-                    if not emergency_number:
-                        safe_print("No emergency number; skipping WhatsApp alert.")
-                    else:
-                        try:
-                            sent, msg = send_wasender_alert_async(
-                                to_number=emergency_number,
-                                lat=lat, lon=lon,
-                                event_label=status,
-                                extra_text=extra,
-                                send_to_all=False
-                            )
-                            safe_print(f"[ALERT] Wasender dispatch -> {sent}: {msg}")
-                        except Exception as e:
-                            safe_print("Wasender send exception:", e)
+                    queue_alert(total_score, status, extra, emergency_number, lat, lon)
             except Exception as e:
                 safe_print("Error in alert trigger:", e)
 
+            if status != last_status:
+                try:
+                    get_alert_store().log_event("status", score=total_score, source="camera",
+                                                data={"from": last_status, "to": status, "info": info_text})
+                except Exception as e:
+                    safe_print("Event log error:", e)
+
             last_status = status
 
             # key handling
@@ -341,8 +539,6 @@ def main():
             except Exception:
                 pass
 
-            time.sleep(0.001)
-
     except Exception as e:
         safe_print("Unhandled exception:", e)
         traceback.print_exc()
@@ -352,11 +548,11 @@ def main():
             audio_checker.stop()
         except Exception:
             pass
-        try:
-            if cap and cap.isOpened():
-                cap.release()
-        except Exception:
-            pass
+        capture.stop()
+        inference.stop()
+        capture.join(timeout=2)
+        inference.join(timeout=5)
+        capture.release()
         try:
             cv2.destroyAllWindows()
         except Exception:
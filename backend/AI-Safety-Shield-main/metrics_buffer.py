@@ -0,0 +1,213 @@
+# metrics_buffer.py
+"""
+Fixed-memory time series of the fused scores, one buffer per stream (camera / browser session).
+
+Every record(...) stores (timestamp, weapon, audio, pose, proximity, total) in:
+- a raw ring buffer of the last RAW_CAPACITY samples (float64 timestamps, float32 scores)
+- a 1-second tier  : SECOND_SLOTS buckets (1 hour) of min / max / sum / count
+- a 1-minute tier  : MINUTE_SLOTS buckets (1 day)  of min / max / sum / count
+
+All arrays are allocated once, so memory per stream is constant no matter how long
+it runs (~0.6 MB with the defaults). window(seconds, points) picks the finest source
+covering the window and reduces it to `points` min / max / mean bins with vectorized
+NumPy reductions (argsort + reduceat) - no Python loop over samples.
+
+- MetricsBuffer      : one stream
+- MetricsRegistry    : stream id -> MetricsBuffer, least recently updated dropped first
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# --- CONFIGURATION ---
+FIELDS = ("weapon", "audio", "pose", "proximity", "total")
+RAW_CAPACITY = 4096         # raw samples (a minute at up to ~60 updates/s)
+SECOND_SLOTS = 3600         # 1 s buckets -> last hour
+MINUTE_SLOTS = 1440         # 60 s buckets -> last day
+MAX_STREAMS = 64
+WINDOWS = {"minute": 60, "hour": 3600, "day": 86400}
+DEFAULT_POINTS = 60
+
+
+class _Tier:
+    """Ring of fixed-width time buckets holding min / max / sum / count per field."""
+
+    def __init__(self, bucket_seconds, slots, n_fields):
+        self.width = bucket_seconds
+        self.slots = slots
+        self.bucket = np.full(slots, -1, np.int64)          # absolute bucket number in each slot
+        self.min = np.zeros((slots, n_fields), np.float32)
+        self.max = np.zeros((slots, n_fields), np.float32)
+        self.sum = np.zeros((slots, n_fields), np.float64)
+        self.count = np.zeros(slots, np.int32)
+
+    def add(self, ts, values):
+        b = int(ts // self.width)
+        i = b % self.slots
+        if self.bucket[i] != b:      # slot still holds an older bucket -> reuse it
+            self.bucket[i] = b
+            self.min[i] = values
+            self.max[i] = values
+            self.sum[i] = values
+            self.count[i] = 1
+        else:
+            np.minimum(self.min[i], values, out=self.min[i])
+            np.maximum(self.max[i], values, out=self.max[i])
+            self.sum[i] += values
+            self.count[i] += 1
+
+    def span(self):
+        return self.width * self.slots
+
+    def select(self, start, end):
+        """(ts, min, max, sum, count) of the buckets whose start lies in [start, end)."""
+        first, last = int(start // self.width), int(end // self.width)
+        mask = (self.bucket >= first) & (self.bucket <= last)
+        return (self.bucket[mask] * float(self.width), self.min[mask], self.max[mask],
+                self.sum[mask], self.count[mask])
+
+
+class MetricsBuffer:
+    def __init__(self, raw_capacity=RAW_CAPACITY, fields=FIELDS):
+        self.fields = tuple(fields)
+        n = len(self.fields)
+        self.capacity = int(raw_capacity)
+        self._ts = np.zeros(self.capacity, np.float64)
+        self._values = np.zeros((self.capacity, n), np.float32)
+        self._next = 0           # total samples written; slot = _next % capacity
+        self._tiers = [_Tier(1, SECOND_SLOTS, n), _Tier(60, MINUTE_SLOTS, n)]
+        self._scratch = np.zeros(n, np.float32)
+        self._lock = threading.Lock()
+
+    def record(self, ts=None, **scores):
+        """Store one sample; missing fields count as 0."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            v = self._scratch
+            for j, name in enumerate(self.fields):
+                v[j] = scores.get(name, 0)
+            i = self._next % self.capacity
+            self._ts[i] = ts
+            self._values[i] = v
+            self._next += 1
+            for tier in self._tiers:
+                tier.add(ts, v)
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    def latest(self):
+        """Most recent sample as {field: value, "ts": ts}, or None."""
+        with self._lock:
+            if not self._next:
+                return None
+            i = (self._next - 1) % self.capacity
+            out = {name: float(self._values[i, j]) for j, name in enumerate(self.fields)}
+            out["ts"] = float(self._ts[i])
+            return out
+
+    def _raw(self, start, end):
+        n = len(self)
+        mask = (self._ts[:n] >= start) & (self._ts[:n] < end)
+        vals = self._values[:n][mask]
+        return self._ts[:n][mask], vals, vals, vals.astype(np.float64), np.ones(len(vals), np.int32)
+
+    def window(self, seconds, points=DEFAULT_POINTS, now=None):
+        """
+        Downsample the last `seconds` into `points` bins.
+        Returns {"t": [bin start, ...], <field>: {"min": [...], "max": [...], "mean": [...]}};
+        empty bins are left out.
+        """
+        now = time.time() if now is None else now
+        start = now - seconds
+        points = max(1, int(points))
+        with self._lock:
+            oldest_raw = self._ts[self._next % self.capacity] if self._next >= self.capacity else 0.0
+            if oldest_raw <= start:
+                ts, mn, mx, sm, cnt = self._raw(start, now)
+            else:
+                tier = next((t for t in self._tiers if t.span() >= seconds), self._tiers[-1])
+                ts, mn, mx, sm, cnt = tier.select(start, now)
+
+        out = {"t": []}
+        for name in self.fields:
+            out[name] = {"min": [], "max": [], "mean": []}
+        if len(ts) == 0:
+            return out
+
+        width = seconds / points
+        bins = np.clip(((ts - start) // width).astype(np.int64), 0, points - 1)
+        order = np.argsort(bins, kind="stable")
+        bins, mn, mx = bins[order], mn[order], mx[order]
+        sm, cnt = sm[order], cnt[order]
+
+        # one reduceat segment per non-empty bin
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        used = bins[starts]
+        b_min = np.minimum.reduceat(mn, starts, axis=0)
+        b_max = np.maximum.reduceat(mx, starts, axis=0)
+        b_sum = np.add.reduceat(sm, starts, axis=0)
+        b_cnt = np.add.reduceat(cnt, starts)
+        b_mean = b_sum / b_cnt[:, None]
+
+        out["t"] = np.round(start + used * width, 3).tolist()
+        for j, name in enumerate(self.fields):
+            out[name] = {
+                "min": np.round(b_min[:, j], 2).tolist(),
+                "max": np.round(b_max[:, j], 2).tolist(),
+                "mean": np.round(b_mean[:, j], 2).tolist(),
+            }
+        return out
+
+    def nbytes(self):
+        arrays = [self._ts, self._values]
+        for t in self._tiers:
+            arrays += [t.bucket, t.min, t.max, t.sum, t.count]
+        return sum(a.nbytes for a in arrays)
+
+
+class MetricsRegistry:
+    def __init__(self, max_streams=MAX_STREAMS):
+        self.max_streams = max(1, int(max_streams))
+        self._streams = OrderedDict()    # stream id -> MetricsBuffer, least recently updated first
+        self._lock = threading.Lock()
+
+    def get(self, stream, create=True):
+        with self._lock:
+            buf = self._streams.get(stream)
+            if buf is not None:
+                self._streams.move_to_end(stream)
+            elif create:
+                buf = self._streams[stream] = MetricsBuffer()
+                while len(self._streams) > self.max_streams:
+                    self._streams.popitem(last=False)
+            return buf
+
+    def record(self, stream, ts=None, **scores):
+        self.get(stream).record(ts, **scores)
+
+    def latest_stream(self):
+        with self._lock:
+            return next(reversed(self._streams), None)
+
+    def discard(self, stream):
+        with self._lock:
+            self._streams.pop(stream, None)
+
+    def streams(self):
+        with self._lock:
+            return list(self._streams)
+
+    def snapshot(self, stream, windows=WINDOWS, points=DEFAULT_POINTS, now=None):
+        """Current values (top level, like the old metrics dict) plus downsampled windows."""
+        buf = self.get(stream, create=False)
+        if buf is None:
+            return None
+        now = time.time() if now is None else now
+        out = buf.latest() or {name: 0.0 for name in FIELDS}
+        out["stream"] = stream
+        out["windows"] = {name: buf.window(sec, points, now) for name, sec in windows.items()}
+        return out
@@ -0,0 +1,169 @@
+# model_registry.py
+"""
+Process-wide, lazy YOLO model registry.
+
+Nothing heavy (torch / ultralytics) is imported until a model is actually needed,
+and each (weights, device, precision) combination is loaded exactly once and
+shared by every module that asks for it (weapon_detector, vision_module, ...).
+
+Provides:
+- select_device()                          -> 0 / 1 / 'cpu' (cached, prints once)
+- get_model(weights, device, precision)    -> RegisteredModel (loads on first use)
+- warmup(weights, device, precision, imgsz)-> load + one dummy inference
+- unload(weights=None, ...)                -> drop one or all models and free GPU memory
+- loaded_models()                          -> list of keys currently resident
+- exported_path(weights, backend, precision) -> where export_model.py writes ONNX / OpenVINO models
+
+`weights` may be a PyTorch .pt file or an exported model (.onnx file or an
+*_openvino_model directory); ultralytics picks the matching runtime itself.
+"""
+
+import os
+import threading
+
+# --- CONFIGURATION ---
+DEFAULT_PRECISION = "fp32"      # "fp32", "fp16" (GPU only) or "int8" (exported CPU models)
+WARMUP_IMGSZ = (360, 480)       # (h, w) of the dummy warmup frame - matches our resize target
+EXPORT_DIR = os.getenv("MODEL_EXPORT_DIR", "exported_models")
+BACKENDS = ("torch", "onnx", "openvino")
+
+_models = {}
+_lock = threading.RLock()
+_device = None
+
+
+def select_device():
+    """Pick the inference device once (secondary GPU > primary GPU > CPU)."""
+    global _device
+    with _lock:
+        if _device is not None:
+            return _device
+        try:
+            import torch
+            if torch.cuda.device_count() > 1:
+                _device = 1
+                print(f"✅ Model Registry: Using Secondary GPU (cuda:1)")
+            elif torch.cuda.is_available():
+                _device = 0
+                print(f"✅ Model Registry: Using Primary GPU (cuda:0)")
+            else:
+                _device = 'cpu'
+                print("⚠️ Model Registry: No GPU found. Using CPU (Will be slower).")
+        except Exception as e:
+            print(f"⚠️ Model Registry: torch unavailable ({e}). Using CPU.")
+            _device = 'cpu'
+        return _device
+
+
+class RegisteredModel:
+    """
+    Thin wrapper around a loaded YOLO model.
+    Calling it works exactly like calling the YOLO object, but the registry's
+    device / half-precision settings are filled in unless the caller overrides them.
+    Attribute access (e.g. .names) is forwarded to the underlying model.
+    """
+
+    def __init__(self, model, weights, device, precision):
+        self.model = model
+        self.weights = weights
+        self.device = device
+        self.precision = precision
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("device", self.device)
+        if self.precision == "fp16" and self.device != 'cpu':
+            kwargs.setdefault("half", True)
+        return self.model(source, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __repr__(self):
+        return f"RegisteredModel({self.weights!r}, device={self.device!r}, precision={self.precision!r})"
+
+
+def exported_path(weights, backend, precision=DEFAULT_PRECISION):
+    """
+    File/dir name of an exported model, e.g.
+      ('yolov8n.pt', 'onnx', 'int8')     -> exported_models/yolov8n-int8.onnx
+      ('yolov8n.pt', 'openvino', 'fp32') -> exported_models/yolov8n_openvino_model
+    For backend 'torch' the original weights are returned unchanged.
+    """
+    if backend == "torch":
+        return weights
+    stem = os.path.splitext(os.path.basename(str(weights)))[0]
+    suffix = "-int8" if (precision or "").lower() == "int8" else ""
+    if backend == "onnx":
+        return os.path.join(EXPORT_DIR, f"{stem}{suffix}.onnx")
+    if backend == "openvino":
+        return os.path.join(EXPORT_DIR, f"{stem}{suffix}_openvino_model")
+    raise ValueError(f"Unknown backend {backend!r} (expected one of {BACKENDS})")
+
+
+def _key(weights, device, precision):
+    if device is None:
+        device = select_device()
+    return (str(weights), device, (precision or DEFAULT_PRECISION).lower())
+
+
+def get_model(weights="yolov8n.pt", device=None, precision=None):
+    """Return the shared model for this key, loading it on first use."""
+    key = _key(weights, device, precision)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            from ultralytics import YOLO
+            print(f"Loading YOLO model '{key[0]}' on {key[1]} ({key[2]})...")
+            if key[0].endswith(".pt"):
+                yolo = YOLO(key[0])
+            else:
+                # exported models don't always carry the task in their metadata
+                yolo = YOLO(key[0], task="detect")
+            model = RegisteredModel(yolo, *key)
+            _models[key] = model
+    return model
+
+
+def warmup(weights="yolov8n.pt", device=None, precision=None, imgsz=WARMUP_IMGSZ, **predict_kwargs):
+    """Load the model and push one blank frame through it so the first real request is fast."""
+    model = get_model(weights, device, precision)
+    try:
+        import numpy as np
+        dummy = np.zeros((imgsz[0], imgsz[1], 3), dtype=np.uint8)
+        model(dummy, verbose=False, **predict_kwargs)
+    except Exception as e:
+        print(f"⚠️ Warmup failed for {model!r}: {e}")
+    return model
+
+
+def unload(weights=None, device=None, precision=None):
+    """Drop one model (or every model if weights is None). Returns how many were removed."""
+    with _lock:
+        if weights is None:
+            keys = list(_models)
+        else:
+            keys = [_key(weights, device, precision)]
+        removed = 0
+        for k in keys:
+            if _models.pop(k, None) is not None:
+                removed += 1
+
+    if removed:
+        try:
+            import gc
+            gc.collect()
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+    return removed
+
+
+def loaded_models():
+    with _lock:
+        return list(_models)
@@ -0,0 +1,90 @@
+# motion_scheduler.py
+"""
+Motion-gated scheduler for the heavy detectors (YOLO, pose, proximity).
+
+Instead of running the models on every Nth frame, we measure how much a tiny
+grayscale thumbnail changed since the previous frame and decide from that:
+
+- big sudden change (spike)   -> run NOW (fast path, ignores MIN_INTERVAL)
+- normal motion               -> run, but at most once per MIN_INTERVAL
+- static / empty scene        -> only the periodic refresh every MAX_INTERVAL
+
+The motion measure is a mean absolute difference on a 64x48 thumbnail, which costs
+well under a millisecond, so idle feeds spend almost no CPU on inference.
+"""
+
+import time
+
+import cv2
+
+# --- CONFIGURATION ---
+THUMB_SIZE = (64, 48)       # (w, h) of the downscaled grayscale frame used for the motion signal
+MOTION_THRESHOLD = 2.0      # mean abs change (0-255 gray levels, above the noise floor) that counts as activity
+SPIKE_THRESHOLD = 8.0       # change that triggers inference immediately
+MIN_INTERVAL = 0.2          # seconds between runs while the scene is active
+MAX_INTERVAL = 2.0          # seconds: always refresh at least this often, even when nothing moves
+NOISE_ALPHA = 0.05          # how fast the sensor-noise floor adapts on quiet frames
+
+
+class MotionScheduler:
+    def __init__(self, motion_threshold=MOTION_THRESHOLD, spike_threshold=SPIKE_THRESHOLD,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, thumb_size=THUMB_SIZE):
+        self.motion_threshold = motion_threshold
+        self.spike_threshold = spike_threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.thumb_size = thumb_size
+
+        self._prev = None
+        self.noise_floor = 0.0
+        self.last_level = 0.0
+        self.last_run = 0.0
+        self.last_reason = ""
+
+        # counters
+        self.frames_seen = 0
+        self.runs = 0
+
+    def measure(self, frame):
+        """Motion level of this frame vs the previous one (noise floor subtracted)."""
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (3, 3), 0)
+
+        prev, self._prev = self._prev, small
+        if prev is None:
+            return 0.0
+
+        raw = float(cv2.absdiff(small, prev).mean())
+        level = max(0.0, raw - self.noise_floor)
+        # track the sensor noise only on quiet frames so real motion doesn't raise it
+        if level < self.motion_threshold:
+            self.noise_floor += NOISE_ALPHA * (raw - self.noise_floor)
+        return level
+
+    def should_run(self, frame, now=None):
+        """True if the detectors should run on this frame."""
+        now = time.monotonic() if now is None else now
+        self.frames_seen += 1
+        level = self.measure(frame)
+        self.last_level = level
+        since = now - self.last_run
+
+        if since >= self.max_interval:
+            reason = "refresh"
+        elif level >= self.spike_threshold:
+            reason = "spike"
+        elif level >= self.motion_threshold and since >= self.min_interval:
+            reason = "motion"
+        else:
+            return False
+
+        self.last_run = now
+        self.last_reason = reason
+        self.runs += 1
+        return True
+
+    def duty_cycle(self):
+        """Fraction of frames that triggered inference."""
+        return self.runs / self.frames_seen if self.frames_seen else 0.0
@@ -2,31 +2,148 @@ import cv2
 import mediapipe as mp
 import math
 
+from pose_pool import PoseEstimatorPool
+
 # --- INITIALIZATION ---
-# We initialize MediaPipe outside the function so it loads only once.
+# Pose objects keep per-stream tracking state and are not thread-safe, so each
+# session checks its own estimator out of a bounded pool instead of sharing one.
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    smooth_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
 mp_drawing = mp.solutions.drawing_utils
 
-def get_pose_score(frame):
+def _tracking_pose():
+    return mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=1,
+        smooth_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+# For person crops: every crop may be a different person, so frame-to-frame
+# tracking would mix people up -> static_image_mode=True.
+def _roi_pose():
+    return mp_pose.Pose(
+        static_image_mode=True,
+        model_complexity=1,
+        min_detection_confidence=0.5
+    )
+
+pose_pool = PoseEstimatorPool(_tracking_pose)
+roi_pose_pool = PoseEstimatorPool(_roi_pose)
+DEFAULT_SESSION = "default"
+
+# --- ROI CONFIG ---
+ROI_PADDING = 0.15      # extra margin around each YOLO person box (fraction of box size)
+MAX_PEOPLE = 6          # analyse at most this many people per frame (largest boxes first)
+MIN_ROI_SIZE = 32       # px: smaller crops are too tiny for MediaPipe
+PERSON_CLASS = 0
+
+SURRENDER_SCORE = 30
+FALL_SCORE = 20
+
+def _analyze_landmarks(landmarks):
+    """Returns (surrender, fall) booleans from one set of normalized pose landmarks."""
+    # --- GET KEY COORDINATES ---
+    # Note: y=0 is top of screen, y=1 is bottom
+    nose_y = landmarks[mp_pose.PoseLandmark.NOSE].y
+    left_wrist_y = landmarks[mp_pose.PoseLandmark.LEFT_WRIST].y
+    right_wrist_y = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].y
+
+    left_shoulder_y = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y
+    left_hip_y = landmarks[mp_pose.PoseLandmark.LEFT_HIP].y
+
+    # --- LOGIC 1: SURRENDER (Hands above Nose) ---
+    surrender = left_wrist_y < nose_y and right_wrist_y < nose_y
+
+    # --- LOGIC 2: FALL DETECTION ---
+    # Calculate vertical distance between shoulders and hips
+    # If distance is small, torso is horizontal -> Lying down
+    # Threshold: 0.1 is very small (horizontal).
+    # Standing person usually has > 0.3 or 0.4
+    torso_height = abs(left_shoulder_y - left_hip_y)
+    fall = torso_height < 0.15
+
+    return surrender, fall
+
+def _person_boxes(results):
+    from tracker import detections_from_results
+    xyxy, _, _ = detections_from_results(results, classes=[PERSON_CLASS])
+    return xyxy
+
+def get_pose_scores(frame, person_boxes, draw=True, session_id=DEFAULT_SESSION):
+    """
+    Runs pose only on padded crops of the given person boxes [(x1, y1, x2, y2), ...].
+    Returns one dict per analysed person:
+        {"box": (x1, y1, x2, y2), "surrender": bool, "fall": bool, "score": int}
+    """
+    # biggest (closest) people first
+    boxes = sorted(person_boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)[:MAX_PEOPLE]
+
+    people = []
+    with roi_pose_pool.checkout(session_id) as roi_pose:
+        for box in boxes:
+            person = _analyze_roi(frame, box, roi_pose, draw)
+            if person is not None:
+                people.append(person)
+    return people
+
+def _analyze_roi(frame, box, roi_pose, draw):
+    """Pose on one padded person crop. Returns the per-person dict or None."""
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = box
+    pad_x = (x2 - x1) * ROI_PADDING
+    pad_y = (y2 - y1) * ROI_PADDING
+    x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+    x2, y2 = min(w, int(x2 + pad_x)), min(h, int(y2 + pad_y))
+    if x2 - x1 < MIN_ROI_SIZE or y2 - y1 < MIN_ROI_SIZE:
+        return None
+
+    crop = frame[y1:y2, x1:x2]   # view: drawing on it draws on the frame
+    results = roi_pose.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+    if not results.pose_landmarks:
+        return None
+
+    surrender, fall = _analyze_landmarks(results.pose_landmarks.landmark)
+    score = SURRENDER_SCORE if surrender else 0
+    if fall:
+        score = FALL_SCORE
+
+    if draw:
+        mp_drawing.draw_landmarks(crop, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+        if surrender:
+            cv2.putText(frame, "SURRENDER", (x1, max(15, y1 - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        if fall:
+            cv2.putText(frame, "FALL", (x1, max(15, y1 - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
+
+    return {"box": (x1, y1, x2, y2), "surrender": surrender, "fall": fall, "score": score}
+
+def get_pose_score(frame, results=None, session_id=DEFAULT_SESSION):
     """
     Analyzes the frame for dangerous poses (Hands Up, Falling).
+    If YOLO `results` are given, pose runs only on the detected people (and not at
+    all when nobody is in view); otherwise the whole frame is analysed.
+    session_id selects this stream's own estimator from the pool, so concurrent
+    streams run in parallel and keep separate tracking state.
     Returns:
-        score (int): Threat points (0, 20, or 30).
+        score (int): Threat points (0, 20, or 30) - the worst person in view.
     """
+    if results is not None:
+        person_boxes = _person_boxes(results)
+        if len(person_boxes) == 0:
+            return 0
+        people = get_pose_scores(frame, person_boxes, session_id=session_id)
+        return max((p["score"] for p in people), default=0)
+
     score = 0
     
     # 1. Convert to RGB (MediaPipe requires RGB input)
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
-    # 2. Process the frame
-    results = pose.process(rgb_frame)
+    # 2. Process the frame (with this session's own tracking estimator)
+    with pose_pool.checkout(session_id) as pose:
+        results = pose.process(rgb_frame)
     
     # 3. If body detected, analyze landmarks
     if results.pose_landmarks:
@@ -37,35 +154,16 @@ def get_pose_score(frame):
             mp_pose.POSE_CONNECTIONS
         )
         
-        landmarks = results.pose_landmarks.landmark
-        
-        # --- GET KEY COORDINATES ---
-        # Note: y=0 is top of screen, y=1 is bottom
-        nose_y = landmarks[mp_pose.PoseLandmark.NOSE].y
-        left_wrist_y = landmarks[mp_pose.PoseLandmark.LEFT_WRIST].y
-        right_wrist_y = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].y
-        
-        left_shoulder_y = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y
-        left_hip_y = landmarks[mp_pose.PoseLandmark.LEFT_HIP].y
-        right_shoulder_y = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y
-        right_hip_y = landmarks[mp_pose.PoseLandmark.RIGHT_HIP].y
-
-        # --- LOGIC 1: SURRENDER (Hands above Nose) ---
-        if left_wrist_y < nose_y and right_wrist_y < nose_y:
-            score = 30
+        surrender, fall = _analyze_landmarks(results.pose_landmarks.landmark)
+
+        if surrender:
+            score = SURRENDER_SCORE
             # Visual Feedback
             cv2.putText(frame, "STATUS: SURRENDER", (50, 200), 
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
 
-        # --- LOGIC 2: FALL DETECTION ---
-        # Calculate vertical distance between shoulders and hips
-        # If distance is small, torso is horizontal -> Lying down
-        torso_height = abs(left_shoulder_y - left_hip_y)
-        
-        # Threshold: 0.1 is very small (horizontal). 
-        # Standing person usually has > 0.3 or 0.4
-        if torso_height < 0.15: 
-            score = 20
+        if fall: 
+            score = FALL_SCORE
             cv2.putText(frame, "STATUS: FALL DETECTED", (50, 250), 
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 165, 255), 3)
 
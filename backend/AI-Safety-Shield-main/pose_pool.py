@@ -0,0 +1,160 @@
+# pose_pool.py
+"""
+Bounded pool of pose estimators with per-session checkout / return.
+
+A MediaPipe Pose object keeps tracking state between frames and is not safe to
+share between threads. The pool gives each session (browser tab, camera, ...)
+its own estimator, so concurrent requests run in parallel and each stream keeps
+its own landmark smoothing.
+
+- checkout(key)  : context manager; yields the estimator for that key (creating it if needed).
+                   A second request for the SAME key waits until the first returns it.
+- max_size       : hard cap on live estimators. When full, the least recently used idle
+                   estimator is closed and reused for the new key; if all are busy we wait.
+- idle_timeout   : estimators unused for this long are closed on the next checkout.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+MAX_ESTIMATORS = 8          # live estimators per process
+IDLE_TIMEOUT = 300          # seconds before an unused estimator is closed
+CHECKOUT_TIMEOUT = 5        # seconds to wait for a busy / full pool
+
+
+class PoolExhausted(Exception):
+    """Raised when no estimator became free within the checkout timeout."""
+
+
+class _Entry:
+    __slots__ = ("estimator", "in_use", "last_used")
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+        self.in_use = False
+        self.last_used = time.monotonic()
+
+
+def _close(estimator):
+    try:
+        estimator.close()
+    except Exception:
+        pass
+
+
+class PoseEstimatorPool:
+    def __init__(self, factory, max_size=MAX_ESTIMATORS, idle_timeout=IDLE_TIMEOUT):
+        """factory: zero-argument callable creating a new estimator (e.g. lambda: mp_pose.Pose(...))."""
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()     # key -> _Entry, least recently used first
+        self._cond = threading.Condition()
+
+        # counters
+        self.created = 0
+        self.evicted = 0
+
+    # ---------- eviction ----------
+    def _evict_idle_locked(self, now):
+        for key in [k for k, e in self._entries.items()
+                    if not e.in_use and now - e.last_used > self.idle_timeout]:
+            _close(self._entries.pop(key).estimator)
+            self.evicted += 1
+
+    def _lru_idle_key_locked(self):
+        for key, e in self._entries.items():
+            if not e.in_use:
+                return key
+        return None
+
+    def evict_idle(self):
+        """Close every estimator idle longer than idle_timeout. Returns the number closed."""
+        with self._cond:
+            before = self.evicted
+            self._evict_idle_locked(time.monotonic())
+            return self.evicted - before
+
+    # ---------- checkout ----------
+    def _acquire(self, key, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle_locked(now)
+
+                entry = self._entries.get(key)
+                if entry is not None and not entry.in_use:
+                    entry.in_use = True
+                    self._entries.move_to_end(key)
+                    return entry
+
+                if entry is None:
+                    if len(self._entries) < self.max_size:
+                        # reserve the slot, build the estimator outside the lock
+                        entry = _Entry(None)
+                        entry.in_use = True
+                        self._entries[key] = entry
+                        break
+                    victim = self._lru_idle_key_locked()
+                    if victim is not None:
+                        _close(self._entries.pop(victim).estimator)
+                        self.evicted += 1
+                        continue
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolExhausted(f"No pose estimator free for {key!r} within {timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            entry.estimator = self.factory()
+            self.created += 1
+        except Exception:
+            with self._cond:
+                self._entries.pop(key, None)
+                self._cond.notify_all()
+            raise
+        return entry
+
+    def _release(self, entry):
+        with self._cond:
+            entry.in_use = False
+            entry.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    @contextmanager
+    def checkout(self, key="default", timeout=CHECKOUT_TIMEOUT):
+        entry = self._acquire(key, timeout)
+        try:
+            yield entry.estimator
+        finally:
+            self._release(entry)
+
+    # ---------- housekeeping ----------
+    def discard(self, key):
+        """Drop a session's estimator (e.g. when the session ends)."""
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.in_use:
+                _close(self._entries.pop(key).estimator)
+                self._cond.notify_all()
+                return True
+            return False
+
+    def close(self):
+        with self._cond:
+            for e in self._entries.values():
+                if e.estimator is not None:
+                    _close(e.estimator)
+            self._entries.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            busy = sum(1 for e in self._entries.values() if e.in_use)
+            return {"size": len(self._entries), "busy": busy, "max_size": self.max_size,
+                    "created": self.created, "evicted": self.evicted}
@@ -1,70 +1,124 @@
-import math
+import numpy as np
 
-def get_proximity_score(results, distance_threshold=100):
+# --- CONFIGURATION ---
+DISTANCE_THRESHOLD = 100    # px between box centers
+SIZE_RATIO_LIMIT = 1.5      # if one person is > 1.5x taller, they are at different depths
+PROXIMITY_POINTS = 15
+PERSON_CLASS = 0
+GRID_MIN_PEOPLE = 1024      # from this many people on, the spatial grid beats the full N x N matrix
+
+
+def _to_numpy(t):
+    return t.cpu().numpy() if hasattr(t, "cpu") else np.asarray(t)
+
+def _person_xyxy(results):
+    """All person boxes in the YOLO results as one float32 [N, 4] array (no per-box Python work)."""
+    out = []
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        xyxy = _to_numpy(boxes.xyxy).reshape(-1, 4)
+        cls = _to_numpy(boxes.cls).reshape(-1)
+        out.append(xyxy[cls.astype(np.int64) == PERSON_CLASS])
+    if not out:
+        return np.zeros((0, 4), np.float32)
+    return np.concatenate(out).astype(np.float32, copy=False)
+
+
+def _pair_mask(ca, ha, cb, hb, distance_threshold, size_ratio_limit):
+    """Boolean [len(a), len(b)] mask: same depth (height ratio) AND centers closer than the threshold."""
+    d2 = ((ca[:, None, :] - cb[None, :, :]) ** 2).sum(-1)
+    hmax = np.maximum(ha[:, None], hb[None, :])
+    hmin = np.minimum(ha[:, None], hb[None, :])
+    return (hmin > 0) & (hmax <= size_ratio_limit * hmin) & (d2 < distance_threshold ** 2)
+
+
+def _pairs_dense(centers, heights, distance_threshold, size_ratio_limit):
+    mask = _pair_mask(centers, heights, centers, heights, distance_threshold, size_ratio_limit)
+    return np.argwhere(np.triu(mask, k=1))
+
+
+def _pairs_grid(centers, heights, distance_threshold, size_ratio_limit):
+    """
+    Uniform grid with cell size = threshold: any close pair lies in the same or a
+    neighbouring cell, so we only compare small blocks instead of all N^2 pairs.
+    """
+    cells = np.floor(centers / distance_threshold).astype(np.int64)
+    keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+    order = np.argsort(inverse.reshape(-1), kind="stable")
+    bounds = np.cumsum(np.bincount(inverse.reshape(-1), minlength=len(keys)))[:-1]
+    buckets = dict(zip(map(tuple, keys.tolist()), np.split(order, bounds)))
+
+    found = []
+    # half of the 3x3 neighbourhood, so each cell pair is visited once
+    for (gx, gy), a in buckets.items():
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            b = buckets.get((gx + dx, gy + dy))
+            if b is None:
+                continue
+            mask = _pair_mask(centers[a], heights[a], centers[b], heights[b],
+                              distance_threshold, size_ratio_limit)
+            if dx == 0 and dy == 0:
+                mask = np.triu(mask, k=1)
+            ii, jj = np.nonzero(mask)
+            if len(ii):
+                found.append(np.stack([a[ii], b[jj]], axis=1))
+    if not found:
+        return np.zeros((0, 2), np.int64)
+    pairs = np.concatenate(found)
+    return np.sort(pairs, axis=1)
+
+
+def find_close_pairs(xyxy, distance_threshold=DISTANCE_THRESHOLD, size_ratio_limit=SIZE_RATIO_LIMIT):
+    """
+    Index pairs (i, j), i < j, of person boxes that are close together AND at a similar
+    depth (height ratio <= size_ratio_limit). Background vs foreground pairs are ignored.
+    """
+    xyxy = np.asarray(xyxy, np.float32).reshape(-1, 4)
+    if len(xyxy) < 2:
+        return np.zeros((0, 2), np.int64)
+
+    centers = np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2], axis=1)
+    heights = xyxy[:, 3] - xyxy[:, 1]
+
+    if len(xyxy) >= GRID_MIN_PEOPLE:
+        return _pairs_grid(centers, heights, distance_threshold, size_ratio_limit)
+    return _pairs_dense(centers, heights, distance_threshold, size_ratio_limit)
+
+
+def get_proximity_pairs_from_boxes(boxes, distance_threshold=DISTANCE_THRESHOLD):
+    """
+    Returns:
+        score (int): PROXIMITY_POINTS if any pair is too close, else 0.
+        pairs (np.ndarray [K, 2, 4]): the two boxes of every offending pair.
+    """
+    xyxy = np.asarray(boxes, np.float32).reshape(-1, 4)
+    idx = find_close_pairs(xyxy, distance_threshold)
+    score = PROXIMITY_POINTS if len(idx) else 0
+    return score, xyxy[idx]
+
+
+def get_proximity_pairs(results, distance_threshold=DISTANCE_THRESHOLD):
+    """Same as get_proximity_pairs_from_boxes, taking the person boxes straight from YOLO results."""
+    if results is None:
+        return 0, np.zeros((0, 2, 4), np.float32)
+    return get_proximity_pairs_from_boxes(_person_xyxy(results), distance_threshold)
+
+
+def get_proximity_score(results, distance_threshold=DISTANCE_THRESHOLD):
     """
     Calculates threat score based on distance, BUT ignores background people.
-    
+
     Args:
         distance_threshold (int): Reduced to 100px (stricter).
     """
-    
-    person_boxes = []
-    proximity_score = 0
+    return get_proximity_pairs(results, distance_threshold)[0]
 
-    # --- 1. EXTRACT PERSON DATA ---
-    if results is None:
-        return 0
 
-    for r in results:
-        boxes = r.boxes
-        for box in boxes:
-            # Class 0 is 'Person'
-            if int(box.cls[0]) == 0:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                # Calculate Center
-                cx = (x1 + x2) / 2
-                cy = (y1 + y2) / 2
-                
-                # Calculate Height (Used for Depth Estimation)
-                height = y2 - y1
-                
-                # Store Center AND Height
-                person_boxes.append({
-                    "center": (cx, cy),
-                    "height": height,
-                    "coords": (x1, y1, x2, y2)
-                })
-
-    # --- 2. CALCULATE INTELLIGENT DISTANCE ---
-    if len(person_boxes) < 2:
-        return 0
-
-    for i in range(len(person_boxes)):
-        for j in range(i + 1, len(person_boxes)):
-            p1 = person_boxes[i]
-            p2 = person_boxes[j]
-            
-            # --- DEPTH CHECK (The Fix) ---
-            # Compare heights. If one person is > 1.5x taller, they are at different depths.
-            h1 = p1["height"]
-            h2 = p2["height"]
-            
-            # Avoid division by zero
-            if h1 == 0 or h2 == 0: continue
-            
-            size_ratio = max(h1, h2) / min(h1, h2)
-            
-            # If size difference is too big, IGNORE this pair (Background vs Foreground)
-            if size_ratio > 1.5:
-                continue 
-
-            # --- STANDARD DISTANCE CHECK ---
-            c1 = p1["center"]
-            c2 = p2["center"]
-            distance = math.sqrt((c1[0] - c2[0])**2 + (c1[1] - c2[1])**2)
-            
-            if distance < distance_threshold:
-                return 15 # DANGER: Close and same size
-
-    return 0
+def get_proximity_score_from_boxes(boxes, distance_threshold=DISTANCE_THRESHOLD):
+    """
+    Same scoring as get_proximity_score, but from plain person boxes
+    [(x1, y1, x2, y2), ...] - e.g. the tracker's predicted boxes between YOLO runs.
+    """
+    return get_proximity_pairs_from_boxes(boxes, distance_threshold)[0]
@@ -0,0 +1,235 @@
+# score_fusion.py
+"""
+One scoring path for the desktop loop (main_surveillance.py) and the web server (app.py).
+
+Detectors publish timestamped readings onto an EventBus instead of being polled:
+    bus.publish(stream, sensor, level, ts)      level in [0, 1], ts = when it was observed
+A reading taken from a frame carries that frame's capture time, so an audio hit and a
+weapon seen a few frames earlier are aligned on the same clock.
+
+ScoreFuser drains the bus and keeps, per (stream, sensor), a peak that decays with
+HALF_LIFE and no longer counts once it is older than WINDOW seconds. A new reading
+replaces the peak only if it is higher than what is left of it, so one missed detection
+doesn't zero a sensor and an old hit fades out instead of flipping off.
+
+    score = sum(WEIGHTS[sensor] * decayed level)
+
+Status uses hysteresis: WARNING / DANGER are entered at WARNING_AT / DANGER_AT and only
+left again once the score drops HYSTERESIS points below that, so a score hovering at
+the threshold doesn't flap (or re-alert).
+
+All streams live in (streams x sensors) NumPy arrays, so evaluate() scores every camera /
+browser session in one vectorized pass; fuse(stream) scores just one row.
+
+- level(sensor, points)    : a detector's own points (e.g. weapon 40, pose 20/30) -> level
+- EventBus                 : lock-free (deque append / popleft are atomic) bounded queue
+- ScoreFuser.fuse(stream)  -> {"score", "status", "changed", "parts": {sensor: points}}
+- ScoreFuser.evaluate()    -> (stream ids, scores, statuses) for all streams
+- get_fuser()              : process-wide fuser with its bus
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# --- CONFIGURATION ---
+SENSORS = ("weapon", "audio", "pose", "proximity")
+# points for a reading of level 1.0
+WEIGHTS = {"weapon": 40, "audio": 40, "pose": 30, "proximity": 15}
+HALF_LIFE = 2.0             # seconds for a reading to lose half its points
+WINDOW = 5.0                # seconds after the last reading of a sensor before it counts 0
+WARNING_AT = 35
+DANGER_AT = 60
+HYSTERESIS = 10             # points below a threshold before that status is left
+STATUSES = ("SAFE", "WARNING", "DANGER")
+MAX_EVENTS = 10000          # bus capacity; the oldest events are dropped beyond this
+MAX_STREAMS = 1024
+
+
+def level(sensor, points):
+    """Points as produced by a detector -> level in [0, 1] for that sensor."""
+    weight = WEIGHTS.get(sensor, 0)
+    return min(1.0, max(0.0, points / weight)) if weight else 0.0
+
+
+class EventBus:
+    """Many producers, one consumer; no locks (CPython deque operations are atomic)."""
+
+    def __init__(self, maxlen=MAX_EVENTS):
+        self._events = deque(maxlen=maxlen)
+        self.published = 0
+
+    def publish(self, stream, sensor, level, ts=None):
+        self._events.append((time.time() if ts is None else ts, stream, sensor, float(level)))
+        self.published += 1
+
+    def drain(self):
+        """Everything published so far, oldest first."""
+        out = []
+        pop = self._events.popleft
+        try:
+            while True:
+                out.append(pop())
+        except IndexError:
+            return out
+
+    def __len__(self):
+        return len(self._events)
+
+
+class ScoreFuser:
+    def __init__(self, bus=None, sensors=SENSORS, weights=WEIGHTS, half_life=HALF_LIFE, window=WINDOW,
+                 warning_at=WARNING_AT, danger_at=DANGER_AT, hysteresis=HYSTERESIS, max_streams=MAX_STREAMS):
+        self.bus = bus if bus is not None else EventBus()
+        self.sensors = tuple(sensors)
+        self._sensor_index = {name: j for j, name in enumerate(self.sensors)}
+        self.weights = np.array([weights.get(name, 0) for name in self.sensors], np.float64)
+        self.decay = np.log(2) / half_life
+        self.window = window
+        self._enter = np.array([warning_at, danger_at], np.float64)
+        self._exit = self._enter - hysteresis
+        self.max_streams = max(1, int(max_streams))
+        self._lock = threading.Lock()
+
+        self._rows = {}             # stream id -> row
+        self._ids = []              # row -> stream id (None = free)
+        self._free = []
+        self._alloc(16)
+
+        # counters
+        self.events = 0
+        self.dropped_streams = 0
+
+    # ---------- rows ----------
+    def _alloc(self, n):
+        k = len(self.sensors)
+        old = len(self._ids)
+        peak = np.zeros((n, k))
+        peak_ts = np.zeros((n, k))
+        seen_ts = np.full((n, k), -np.inf)          # last reading of any level (least active stream goes first)
+        level = np.zeros(n, np.int8)
+        if old:
+            peak[:old], peak_ts[:old], seen_ts[:old], level[:old] = \
+                self._peak, self._peak_ts, self._seen_ts, self._level
+        self._peak, self._peak_ts, self._seen_ts, self._level = peak, peak_ts, seen_ts, level
+        self._ids.extend([None] * (n - old))
+        self._free.extend(range(n - 1, old - 1, -1))
+
+    def _row(self, stream, now):
+        row = self._rows.get(stream)
+        if row is not None:
+            return row
+        if len(self._rows) >= self.max_streams:
+            # full: reuse the stream that reported least recently
+            rows = np.fromiter(self._rows.values(), np.int64)
+            victim = int(rows[np.argmin(self._seen_ts[rows].max(axis=1))])
+            self._release(self._ids[victim])
+            self.dropped_streams += 1
+        if not self._free:
+            self._alloc(2 * len(self._ids))
+        row = self._free.pop()
+        self._rows[stream] = row
+        self._ids[row] = stream
+        self._peak[row] = 0
+        self._peak_ts[row] = now
+        self._seen_ts[row] = -np.inf
+        self._level[row] = 0
+        return row
+
+    def _release(self, stream):
+        row = self._rows.pop(stream, None)
+        if row is not None:
+            self._ids[row] = None
+            self._free.append(row)
+
+    def discard(self, stream):
+        with self._lock:
+            self._release(stream)
+
+    # ---------- events ----------
+    def _apply(self, events):
+        for ts, stream, sensor, value in events:
+            j = self._sensor_index.get(sensor)
+            if j is None:
+                continue
+            i = self._row(stream, ts)
+            peak, peak_ts = self._peak[i, j], self._peak_ts[i, j]
+            # compare on the later of the two timestamps (events may arrive out of order)
+            if ts >= peak_ts:
+                left = peak * np.exp(-self.decay * (ts - peak_ts)) if ts - peak_ts <= self.window else 0.0
+                if value >= left:
+                    self._peak[i, j], self._peak_ts[i, j] = value, ts
+            elif value * np.exp(-self.decay * (peak_ts - ts)) > peak:
+                self._peak[i, j], self._peak_ts[i, j] = value, ts
+            if ts > self._seen_ts[i, j]:
+                self._seen_ts[i, j] = ts
+        self.events += len(events)
+
+    def _points(self, rows, now):
+        """(len(rows) x sensors) points at `now`."""
+        age = np.maximum(now - self._peak_ts[rows], 0.0)
+        levels = self._peak[rows] * np.exp(-self.decay * age)
+        levels[age > self.window] = 0.0
+        return levels * self.weights
+
+    def _update_status(self, rows, scores):
+        cur = self._level[rows]
+        up = np.searchsorted(self._enter, scores, side="right")      # level the score qualifies for
+        down = np.searchsorted(self._exit, scores, side="right")     # level the score can still hold
+        new = np.where(up > cur, up, np.where(down < cur, down, cur)).astype(np.int8)
+        self._level[rows] = new
+        return new, new != cur
+
+    # ---------- scoring ----------
+    def fuse(self, stream, now=None):
+        """Score one stream after applying everything on the bus."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._apply(self.bus.drain())
+            rows = np.array([self._row(stream, now)])
+            points = self._points(rows, now)
+            scores = np.rint(points.sum(axis=1))
+            levels, changed = self._update_status(rows, scores)
+        return {
+            "score": int(scores[0]),
+            "status": STATUSES[levels[0]],
+            "changed": bool(changed[0]),
+            "parts": {name: int(round(points[0, j])) for j, name in enumerate(self.sensors)},
+        }
+
+    def evaluate(self, now=None):
+        """Score every stream in one pass -> (stream ids, int scores, status names)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._apply(self.bus.drain())
+            if not self._rows:
+                return [], np.zeros(0, np.int64), []
+            ids = list(self._rows)
+            rows = np.fromiter(self._rows.values(), np.int64, len(ids))
+            scores = np.rint(self._points(rows, now).sum(axis=1)).astype(np.int64)
+            levels, _ = self._update_status(rows, scores)
+        return ids, scores, [STATUSES[x] for x in levels]
+
+    def stats(self):
+        return {
+            "streams": len(self._rows),
+            "events": self.events,
+            "published": self.bus.published,
+            "queued": len(self.bus),
+            "dropped_streams": self.dropped_streams,
+        }
+
+
+# --- SHARED FUSER ---
+_fuser = None
+_fuser_lock = threading.Lock()
+
+def get_fuser():
+    """Return the process-wide fuser (publish onto get_fuser().bus)."""
+    global _fuser
+    with _fuser_lock:
+        if _fuser is None:
+            _fuser = ScoreFuser()
+        return _fuser
@@ -0,0 +1,288 @@
+# session_store.py
+"""
+Bounded per-session state for the web server (one entry per browser session id).
+
+Each SessionState holds:
+- scores        : rolling history of (timestamp, total score), at most HISTORY_LEN entries
+- last_alert_ts : when this session last sent an alert (per-user cooldown)
+- status        : the last status sent to the client (SAFE / WARNING / DANGER)
+- detections    : the latest detection result
+- handles       : per-session objects (tracker, pose, ...); anything with close() is
+                  closed when the session is evicted
+
+SessionStore keeps the states in an OrderedDict in least-recently-used order, so
+get / touch / evict are all O(1). At most MAX_SESSIONS states are kept (the least
+recently used one is evicted first) and sessions idle for longer than SESSION_TTL
+are dropped.
+
+Backends (SESSION_BACKEND):
+- memory : state lives only in this process (default, single worker).
+- sqlite : score history and alert cooldown are also kept in a local SQLite file
+           (SESSION_DB), so several gunicorn workers on one machine share them.
+           Handles and detections always stay in the process that created them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# --- CONFIGURATION ---
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")      # memory | sqlite
+SESSION_DB = os.getenv("SESSION_DB", "sessions.sqlite")
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", "1000"))           # hard cap on live sessions
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))          # seconds idle before eviction
+ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN", "60"))      # seconds between alerts per session
+HISTORY_LEN = 120                                              # scores kept per session
+
+
+class SessionState:
+    __slots__ = ("sid", "created", "last_seen", "scores", "last_alert_ts", "status", "detections", "handles")
+
+    def __init__(self, sid, now=None):
+        now = time.time() if now is None else now
+        self.sid = sid
+        self.created = now
+        self.last_seen = now
+        self.scores = deque(maxlen=HISTORY_LEN)
+        self.last_alert_ts = None
+        self.status = "SAFE"
+        self.detections = None
+        self.handles = {}
+
+    def push_score(self, score, now=None):
+        self.scores.append((time.time() if now is None else now, score))
+
+    def mean_score(self, window=10.0, now=None):
+        """Average score over the last `window` seconds (0 if there is none)."""
+        cutoff = (time.time() if now is None else now) - window
+        recent = [s for ts, s in reversed(self.scores) if ts >= cutoff]
+        return sum(recent) / len(recent) if recent else 0
+
+    def close(self):
+        for handle in self.handles.values():
+            close = getattr(handle, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"[sessions] Error closing handle for {self.sid}: {e}")
+        self.handles.clear()
+
+
+# ---------- backends ----------
+class MemoryBackend:
+    """Nothing shared: the process-local SessionState is the only copy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def load(self, state):
+        pass
+
+    def append_score(self, state, score, now):
+        state.push_score(score, now)
+
+    def claim_alert(self, state, cooldown, now):
+        with self._lock:
+            if state.last_alert_ts is not None and now - state.last_alert_ts < cooldown:
+                return False
+            state.last_alert_ts = now
+            return True
+
+    def delete(self, sid):
+        pass
+
+    def purge(self, cutoff):
+        pass
+
+
+class SqliteBackend:
+    """Score history + alert cooldown in a local SQLite file shared by all workers."""
+
+    def __init__(self, path=SESSION_DB):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS session_state (
+                            sid TEXT PRIMARY KEY,
+                            last_seen REAL NOT NULL,
+                            last_alert_ts REAL,
+                            scores TEXT)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_session_state_last_seen ON session_state (last_seen)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)   # autocommit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, state):
+        row = self._conn().execute(
+            "SELECT last_alert_ts, scores FROM session_state WHERE sid = ?", (state.sid,)).fetchone()
+        if row is None:
+            return
+        state.last_alert_ts = row[0]
+        if row[1]:
+            state.scores.clear()
+            state.scores.extend(tuple(x) for x in json.loads(row[1]))
+
+    def append_score(self, state, score, now):
+        # read-modify-write in one write transaction so concurrent workers don't lose scores
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT last_alert_ts, scores FROM session_state WHERE sid = ?", (state.sid,)).fetchone()
+            state.scores.clear()
+            if row is not None:
+                state.last_alert_ts = row[0]
+                if row[1]:
+                    state.scores.extend(tuple(x) for x in json.loads(row[1]))
+            state.push_score(score, now)
+            conn.execute(
+                """INSERT INTO session_state (sid, last_seen, scores) VALUES (?, ?, ?)
+                   ON CONFLICT(sid) DO UPDATE SET last_seen = excluded.last_seen, scores = excluded.scores""",
+                (state.sid, now, json.dumps(list(state.scores))))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim_alert(self, state, cooldown, now):
+        # the conditional UPDATE is atomic across workers: only one of them wins the cooldown
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO session_state (sid, last_seen) VALUES (?, ?)", (state.sid, now))
+        cur = conn.execute(
+            """UPDATE session_state SET last_alert_ts = ?
+               WHERE sid = ? AND (last_alert_ts IS NULL OR ? - last_alert_ts >= ?)""",
+            (now, state.sid, now, cooldown))
+        if cur.rowcount == 1:
+            state.last_alert_ts = now
+            return True
+        return False
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM session_state WHERE sid = ?", (sid,))
+
+    def purge(self, cutoff):
+        self._conn().execute("DELETE FROM session_state WHERE last_seen < ?", (cutoff,))
+
+
+def make_backend(name=SESSION_BACKEND):
+    if name == "sqlite":
+        return SqliteBackend()
+    if name != "memory":
+        print(f"[sessions] Unknown SESSION_BACKEND {name!r}, using memory")
+    return MemoryBackend()
+
+
+# ---------- store ----------
+class SessionStore:
+    def __init__(self, backend=None, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL, on_evict=None):
+        """on_evict: optional callable(state) run after a session is evicted or discarded."""
+        self.backend = backend if backend is not None else make_backend()
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._states = OrderedDict()     # sid -> SessionState, least recently used first
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+        # counters
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, sid, now=None):
+        """State for `sid` (created on first use); marks the session as active."""
+        now = time.time() if now is None else now
+        evicted = []
+        with self._lock:
+            state = self._states.get(sid)
+            is_new = state is None
+            if not is_new:
+                self._states.move_to_end(sid)
+            else:
+                state = self._states[sid] = SessionState(sid, now)
+                self.created += 1
+                while len(self._states) > self.max_sessions:
+                    evicted.append(self._states.popitem(last=False)[1])
+            state.last_seen = now
+            # idle sessions sit at the front: stop at the first one still active
+            while self._states:
+                oldest = next(iter(self._states.values()))
+                if now - oldest.last_seen <= self.ttl:
+                    break
+                evicted.append(self._states.popitem(last=False)[1])
+        if is_new:
+            # another worker may already know this session
+            self.backend.load(state)
+        self._finish_evictions(evicted, now)
+        return state
+
+    def record_score(self, sid, score, now=None):
+        """Append a score to the session history (and share it with the other workers)."""
+        now = time.time() if now is None else now
+        state = self.get(sid, now)
+        self.backend.append_score(state, score, now)
+        return state
+
+    def claim_alert(self, sid, cooldown=ALERT_COOLDOWN, now=None):
+        """True if this session may alert now (and starts its cooldown), False while cooling down."""
+        now = time.time() if now is None else now
+        return self.backend.claim_alert(self.get(sid, now), cooldown, now)
+
+    def discard(self, sid):
+        with self._lock:
+            state = self._states.pop(sid, None)
+        self.backend.delete(sid)
+        if state is not None:
+            self._finish_evictions([state], None)
+
+    def evict_idle(self, now=None):
+        """Drop every session idle longer than ttl. Returns the number evicted."""
+        now = time.time() if now is None else now
+        evicted = []
+        with self._lock:
+            while self._states:
+                oldest = next(iter(self._states.values()))
+                if now - oldest.last_seen <= self.ttl:
+                    break
+                evicted.append(self._states.popitem(last=False)[1])
+        self._finish_evictions(evicted, now)
+        return len(evicted)
+
+    def _finish_evictions(self, evicted, now):
+        for state in evicted:
+            self.evicted += 1
+            state.close()
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(state)
+                except Exception as e:
+                    print(f"[sessions] on_evict error for {state.sid}: {e}")
+        # shared rows of sessions nobody touches any more (at most once a minute)
+        if now is not None and now - self._last_purge > 60:
+            self._last_purge = now
+            self.backend.purge(now - self.ttl)
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, sid):
+        return sid in self._states
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "sessions": len(self._states),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,50 @@
+# test_alert_outbox.py
+"""
+Concurrent enqueues to one number must queue a single message (per-target cooldown).
+Each thread uses its own AlertOutbox on the same file, like two server workers or
+main_surveillance.py next to app.py.
+
+Run:  python test_alert_outbox.py   (or pytest test_alert_outbox.py)
+"""
+
+import os
+import tempfile
+import threading
+
+from alert_outbox import AlertOutbox
+
+THREADS = 8
+TRIALS = 50
+
+
+def _enqueue_at_once(path):
+    outboxes = [AlertOutbox(path, cooldown=60) for _ in range(THREADS)]
+    barrier = threading.Barrier(THREADS)
+    added = []
+
+    def worker(i):
+        barrier.wait()
+        added.append(outboxes[i].enqueue("test", ["+100"], 70, event_id=f"event-{i}")[1])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    conn = outboxes[0]._conn()
+    queued = conn.execute("SELECT COUNT(*) FROM outbox WHERE target = '+100'").fetchone()[0]
+    logged = conn.execute("SELECT COUNT(*) FROM alerts WHERE target = '+100'").fetchone()[0]
+    return sum(added), queued, logged
+
+
+def test_concurrent_enqueue_respects_cooldown():
+    for trial in range(TRIALS):
+        with tempfile.TemporaryDirectory() as tmp:
+            added, queued, logged = _enqueue_at_once(os.path.join(tmp, "outbox.sqlite"))
+        assert (added, queued) == (1, 1), f"trial {trial}: {queued} messages queued to one number"
+        assert logged == THREADS, f"trial {trial}: {logged} of {THREADS} alerts logged"
+
+
+if __name__ == "__main__":
+    test_concurrent_enqueue_respects_cooldown()
+    print(f"OK: {TRIALS} trials of {THREADS} concurrent enqueues, one message each")
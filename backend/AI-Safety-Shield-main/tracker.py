@@ -0,0 +1,226 @@
+# tracker.py
+"""
+Lightweight SORT-style multi-object tracker for person / weapon boxes.
+
+YOLO only runs on some frames (see motion_scheduler). The tracker gives every box a
+persistent track ID and predicts where it is on the frames in between, so overlays
+and proximity stay current at camera FPS.
+
+- Motion model : constant-velocity Kalman filter on (cx, cy, w, h), time-based (dt in seconds)
+- Association  : IoU between predicted tracks and new detections, per class
+                 (Hungarian via scipy if installed, greedy otherwise)
+- Lifecycle    : unmatched detections start new tracks; tracks not seen for MAX_AGE seconds die
+
+Provides:
+- detections_from_results(results, classes=None) -> (xyxy[N,4], cls[N], conf[N]) numpy arrays
+- ObjectTracker.update(xyxy, cls, conf, now)      -> list[Track]   (on inference frames)
+- ObjectTracker.predict(now)                      -> list[Track]   (on every other frame)
+
+Only update() moves the filter state, and only to the time the detections were taken.
+predict(now) just extrapolates the displayed box to `now`, so a detection that finishes
+after a newer frame was already drawn is still fused at its own capture time.
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# --- CONFIGURATION ---
+IOU_THRESHOLD = 0.3     # minimum IoU to match a detection to a track
+MAX_AGE = 3.0           # seconds a track survives without a matching detection (> motion_scheduler.MAX_INTERVAL)
+MIN_HITS = 1            # detections needed before a track is reported
+PROCESS_NOISE = 50.0    # how quickly we allow velocity to change (px/s^2 scale)
+MEASUREMENT_NOISE = 4.0 # box jitter in px
+
+
+def detections_from_results(results, classes=None):
+    """Flatten YOLO results into numpy arrays (xyxy, cls, conf), optionally keeping only `classes`."""
+    empty = (np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32))
+    if results is None:
+        return empty
+
+    xyxy, cls, conf = [], [], []
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        xyxy.append(np.asarray(boxes.xyxy.cpu().numpy() if hasattr(boxes.xyxy, "cpu") else boxes.xyxy, np.float32))
+        cls.append(np.asarray(boxes.cls.cpu().numpy() if hasattr(boxes.cls, "cpu") else boxes.cls).astype(np.int32))
+        conf.append(np.asarray(boxes.conf.cpu().numpy() if hasattr(boxes.conf, "cpu") else boxes.conf, np.float32))
+    if not xyxy:
+        return empty
+
+    xyxy, cls, conf = np.concatenate(xyxy), np.concatenate(cls), np.concatenate(conf)
+    if classes is not None:
+        keep = np.isin(cls, list(classes))
+        xyxy, cls, conf = xyxy[keep], cls[keep], conf[keep]
+    return xyxy, cls, conf
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between boxes a[N,4] and b[M,4] (xyxy)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def _assign(iou, threshold):
+    """Matched (row, col) pairs with iou >= threshold."""
+    if iou.size == 0:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+        pairs = zip(rows, cols)
+    else:
+        # greedy: best remaining IoU first
+        order = np.dstack(np.unravel_index(np.argsort(-iou, axis=None), iou.shape))[0]
+        used_r, used_c, pairs = set(), set(), []
+        for r, c in order:
+            if r in used_r or c in used_c:
+                continue
+            used_r.add(r); used_c.add(c)
+            pairs.append((r, c))
+    return [(int(r), int(c)) for r, c in pairs if iou[r, c] >= threshold]
+
+
+def _xyxy_to_z(box):
+    x1, y1, x2, y2 = box
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], np.float64)
+
+
+class Track:
+    """One tracked object: Kalman state x = [cx, cy, w, h, vx, vy, vw, vh] (velocities per second)."""
+
+    _H = np.hstack([np.eye(4), np.zeros((4, 4))])
+
+    def __init__(self, track_id, box, cls, conf, now):
+        self.id = track_id
+        self.cls = int(cls)
+        self.conf = float(conf)
+        self.x = np.concatenate([_xyxy_to_z(box), np.zeros(4)])
+        self.P = np.diag([10, 10, 10, 10, 1000, 1000, 1000, 1000]).astype(np.float64)
+        self.t = now                 # time the state refers to
+        self.last_update = now
+        self.hits = 1
+        self.view = None             # box extrapolated by ObjectTracker.predict (display only)
+
+    def predict(self, now):
+        dt = now - self.t
+        if dt <= 0:
+            return
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        q = PROCESS_NOISE * dt
+        Q = np.diag([q * dt, q * dt, q * dt, q * dt, q, q, q, q])
+        self.x = F @ self.x
+        # boxes can't have negative size
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = F @ self.P @ F.T + Q
+        self.t = now
+
+    def update(self, box, conf, now):
+        if now < self.t:
+            # older than the state (out-of-order result): fusing it would pull the box back
+            return
+        self.predict(now)
+        self.view = None
+        z = _xyxy_to_z(box)
+        H = self._H
+        S = H @ self.P @ H.T + np.eye(4) * MEASUREMENT_NOISE ** 2
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - H @ self.x)
+        self.P = (np.eye(8) - K @ H) @ self.P
+        self.conf = float(conf)
+        self.last_update = max(self.last_update, now)
+        self.hits += 1
+
+    def box_at(self, now):
+        """Box extrapolated to `now` with the current velocity; the state is left alone."""
+        dt = max(0.0, now - self.t)
+        cx, cy, w, h = self.x[:4] + self.x[4:] * dt
+        w, h = max(w, 1.0), max(h, 1.0)
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], np.float32)
+
+    @property
+    def box(self):
+        if self.view is not None:
+            return self.view
+        cx, cy, w, h = self.x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], np.float32)
+
+    def __repr__(self):
+        return f"Track(id={self.id}, cls={self.cls}, box={self.box.round(1).tolist()})"
+
+
+class ObjectTracker:
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_age=MAX_AGE, min_hits=MIN_HITS):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def _visible(self):
+        return [t for t in self.tracks if t.hits >= self.min_hits]
+
+    def predict(self, now=None):
+        """Where every track is at `now` (no detections). Returns the visible tracks."""
+        now = time.time() if now is None else now
+        for t in self.tracks:
+            t.view = t.box_at(now)
+        self.tracks = [t for t in self.tracks if now - t.last_update <= self.max_age]
+        return self._visible()
+
+    def update(self, xyxy, cls, conf=None, now=None):
+        """
+        Feed one frame's detections (taken at time `now`). Boxes are matched per class,
+        so a knife can never inherit a person's track ID.
+        """
+        now = time.time() if now is None else now
+        xyxy = np.asarray(xyxy, np.float32).reshape(-1, 4)
+        cls = np.asarray(cls, np.int32).reshape(-1)
+        conf = np.ones(len(xyxy), np.float32) if conf is None else np.asarray(conf, np.float32).reshape(-1)
+
+        for t in self.tracks:
+            t.predict(now)
+            t.view = None       # match against the state at the detections' own time
+
+        matched_dets = set()
+        for c in np.unique(np.concatenate([cls, [t.cls for t in self.tracks]]).astype(np.int32)):
+            det_idx = np.flatnonzero(cls == c)
+            trk = [t for t in self.tracks if t.cls == c]
+            if len(det_idx) == 0 or not trk:
+                continue
+            iou = iou_matrix(np.stack([t.box for t in trk]), xyxy[det_idx])
+            for ti, di in _assign(iou, self.iou_threshold):
+                trk[ti].update(xyxy[det_idx[di]], conf[det_idx[di]], now)
+                matched_dets.add(int(det_idx[di]))
+
+        for i in range(len(xyxy)):
+            if i not in matched_dets:
+                self.tracks.append(Track(next(self._ids), xyxy[i], cls[i], conf[i], now))
+
+        self.tracks = [t for t in self.tracks if now - t.last_update <= self.max_age]
+        return self._visible()
+
+    def boxes(self, classes=None):
+        """(xyxy, cls, ids) of visible tracks as numpy arrays, optionally filtered by class."""
+        tracks = [t for t in self._visible() if classes is None or t.cls in classes]
+        if not tracks:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.int32)
+        return (np.stack([t.box for t in tracks]),
+                np.array([t.cls for t in tracks], np.int32),
+                np.array([t.id for t in tracks], np.int32))
@@ -1,28 +1,43 @@
-from ultralytics import YOLO
+import os
 import cv2
 import math
 
+import model_registry
+
 # --- CONFIGURATION ---
 # CHANGED: Using 'yolov8s.pt' (Small) instead of Nano for better knife detection
-MODEL_PATH = "yolov8s.pt" 
+# Set VISION_MODEL to the weapon detector's weights to share one model in memory.
+MODEL_PATH = os.getenv("VISION_MODEL", "yolov8s.pt")
 
 # CHANGED: Lowered to 0.25 so it catches the knife even if blurry
 CONFIDENCE_THRESHOLD = 0.25 
 
 class WeaponDetector:
     def __init__(self):
-        # Initialize the YOLO model
-        try:
-            self.model = YOLO(MODEL_PATH)
-            print(f"✅ Model '{MODEL_PATH}' loaded successfully.")
-        except Exception as e:
-            print(f"❌ Error loading model: {e}")
-            self.model = None
+        # The YOLO model is fetched from the shared registry on first use, so
+        # constructing a detector is cheap and identical weights are loaded only once.
+        self._model = None
+        self._load_failed = False
 
         # Class IDs for YOLOv8 standard model:
         # 43 = Knife, 76 = Scissors (sometimes knives look like scissors to AI)
         self.weapon_classes = [43, 76] 
 
+    @property
+    def model(self):
+        if self._model is None and not self._load_failed:
+            try:
+                self._model = model_registry.get_model(MODEL_PATH)
+                print(f"✅ Model '{MODEL_PATH}' loaded successfully.")
+            except Exception as e:
+                print(f"❌ Error loading model: {e}")
+                self._load_failed = True
+        return self._model
+
+    def warmup(self):
+        """Load the model now instead of on the first frame."""
+        return self.model is not None
+
     def detect_frame(self, frame):
         if not self.model:
             return frame, False, ""
@@ -1,22 +1,95 @@
-import torch
-from ultralytics import YOLO
-
-# --- SMART DEVICE SELECTION ---
-if torch.cuda.device_count() > 1:
-    TARGET_DEVICE = 1 
-    print(f"✅ Weapon Detector: Using Secondary GPU (cuda:1)")
-elif torch.cuda.is_available():
-    TARGET_DEVICE = 0 
-    print(f"✅ Weapon Detector: Using Primary GPU (cuda:0)")
-else:
-    TARGET_DEVICE = 'cpu'
-    print("⚠️ Weapon Detector: No GPU found. Using CPU (Will be slower).")
-
-print("Loading YOLOv8 Model...")
-try:
-    model = YOLO('yolov8n.pt')
-except Exception as e:
-    print(f"Error loading model: {e}")
+import os
+
+import model_registry
+
+# --- MODEL ---
+# Loaded lazily through model_registry, so importing this module is cheap and the
+# same weights are shared with any other module that asks for them.
+MODEL_WEIGHTS = os.getenv("WEAPON_MODEL", "yolov8n.pt")
+MODEL_PRECISION = os.getenv("WEAPON_PRECISION", model_registry.DEFAULT_PRECISION).lower()
+
+# --- BACKEND ---
+# "torch"    : stock PyTorch weights (default)
+# "onnx"     : ONNX Runtime on CPU   (create with: python export_model.py --format onnx [--int8])
+# "openvino" : OpenVINO on CPU       (create with: python export_model.py --format openvino [--int8])
+# Exported models are looked up in model_registry.EXPORT_DIR; if missing we fall back to PyTorch.
+WEAPON_BACKEND = os.getenv("WEAPON_BACKEND", "torch").lower()
+EXPORT_IMGSZ = int(os.getenv("WEAPON_IMGSZ", "640"))    # must match the --imgsz used when exporting
+
+# --- CLASSES ---
+# 0 = Person (needed by proximity_logic), 34 = Baseball Bat, 43 = Knife, 76 = Scissors
+WEAPON_CLASSES = [34, 43, 76]
+DETECT_CLASSES = [0] + WEAPON_CLASSES
+
+# Webcams are blurry, so we accept lower confidence
+CONFIDENCE_THRESHOLD = 0.25
+
+_model_spec = None
+
+def _resolve_model_spec():
+    """(weights, device, precision, predict_kwargs) for the configured backend, resolved once."""
+    global _model_spec
+    if _model_spec is not None:
+        return _model_spec
+
+    if WEAPON_BACKEND != "torch":
+        path = model_registry.exported_path(MODEL_WEIGHTS, WEAPON_BACKEND, MODEL_PRECISION)
+        if os.path.exists(path):
+            print(f"✅ Weapon Detector: Using {WEAPON_BACKEND} backend ({MODEL_PRECISION}) -> {path}")
+            _model_spec = (path, 'cpu', MODEL_PRECISION, {"imgsz": EXPORT_IMGSZ})
+            return _model_spec
+        print(f"⚠️ Weapon Detector: '{path}' not found (run export_model.py). Falling back to PyTorch.")
+
+    # PyTorch weights; INT8 only exists for exported models
+    precision = MODEL_PRECISION if MODEL_PRECISION != "int8" else model_registry.DEFAULT_PRECISION
+    _model_spec = (MODEL_WEIGHTS, None, precision, {})
+    return _model_spec
+
+def _get_model():
+    weights, device, precision, _ = _resolve_model_spec()
+    return model_registry.get_model(weights, device=device, precision=precision)
+
+def _predict(source):
+    kwargs = _resolve_model_spec()[3]
+    return _get_model()(source, classes=DETECT_CLASSES, verbose=False, **kwargs)
+
+def __getattr__(name):
+    # Keep the old module attributes working without loading anything at import time
+    if name == "TARGET_DEVICE":
+        device = _resolve_model_spec()[1]
+        return device if device is not None else model_registry.select_device()
+    if name == "model":
+        return _get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warmup():
+    """Load the weapon model now (and run one dummy frame) instead of on the first request."""
+    weights, device, precision, kwargs = _resolve_model_spec()
+    return model_registry.warmup(weights, device=device, precision=precision, **kwargs)
+
+def _score_result(r):
+    """Turn one YOLO Results object into (threat_score, detected_weapons)."""
+    threat_score = 0
+    detected_weapons = []
+    names = _get_model().names
+
+    boxes = r.boxes
+    for box in boxes:
+        cls = int(box.cls[0])
+        conf = float(box.conf[0])
+        name = names[cls]
+
+        # --- DEBUG PRINT ---
+        # This will show you in the terminal what the AI sees
+        # print(f"DEBUG: Saw {name} with confidence {conf:.2f}")
+
+        if conf > CONFIDENCE_THRESHOLD:
+            if cls in WEAPON_CLASSES:
+                threat_score = 40
+                detected_weapons.append(name)
+                print(f"!!! WEAPON FOUND: {name} ({conf:.2f}) !!!")
+
+    return threat_score, detected_weapons
 
 def get_weapon_score(frame):
     threat_score = 0
@@ -24,29 +97,40 @@ def get_weapon_score(frame):
     
     try:
         # Run YOLO
-        results = model(frame, device=TARGET_DEVICE, classes=[0, 34, 43, 76], verbose=False)
+        results = _predict(frame)
         
         for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                name = model.names[cls]
-
-                # --- DEBUG PRINT ---
-                # This will show you in the terminal what the AI sees
-                # print(f"DEBUG: Saw {name} with confidence {conf:.2f}")
-
-                # --- NEW LOWER THRESHOLD (0.25) ---
-                # Webcams are blurry, so we accept lower confidence
-                if conf > 0.25:
-                    if cls in [34, 43, 76]: # Knife, Bat, Scissors
-                        threat_score = 40
-                        detected_weapons.append(name)
-                        print(f"!!! WEAPON FOUND: {name} ({conf:.2f}) !!!")
+            score, weapons = _score_result(r)
+            threat_score = max(threat_score, score)
+            detected_weapons.extend(weapons)
                         
     except Exception as e:
         print(f"Weapon Error: {e}")
         return 0, [], None
 
-    return threat_score, detected_weapons, results
\ No newline at end of file
+    return threat_score, detected_weapons, results
+
+def get_weapon_scores(frames):
+    """
+    Batched version of get_weapon_score: runs ONE model call for a list of frames.
+    Returns a list with one (threat_score, detected_weapons, results) tuple per frame,
+    where results is a single-item list so proximity_logic can iterate it as before.
+    """
+    if not frames:
+        return []
+
+    try:
+        results = _predict(list(frames))
+    except Exception as e:
+        print(f"Weapon Error (batch of {len(frames)}): {e}")
+        return [(0, [], None) for _ in frames]
+
+    out = []
+    for r in results:
+        try:
+            score, weapons = _score_result(r)
+            out.append((score, weapons, [r]))
+        except Exception as e:
+            print(f"Weapon Error: {e}")
+            out.append((0, [], None))
+    return out
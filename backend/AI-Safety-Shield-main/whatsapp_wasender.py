@@ -7,14 +7,24 @@ Environment variables (optional):
 - EMERGENCY_NUMBERS    : CSV of E.164 numbers (not required if you pass to_number to the send function).
 - COOLDOWN_SECONDS     : seconds between sends (default 60)
 - HTTP_TIMEOUT         : request timeout seconds (default 10)
+- WASENDER_WORKERS     : concurrent sends / pooled keep-alive connections (default 8)
+
+WasenderDispatcher keeps one requests.Session (keep-alive connection pool) and a bounded
+thread pool for the whole process. An alert to several numbers is sent to all of them
+concurrently, so it takes as long as the slowest single send. Failed sends are retried
+with exponential backoff + jitter and every recipient gets its own delivery result.
+Point WASENDER_SEND_URL (or WasenderDispatcher(send_url=...)) at a local stub server to test.
 
 This file contains the Wasender API key provided by you and will use it directly.
 """
 import os
 import time
+import random
 import threading
 import requests
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 
 # ---------- CONFIG ----------
 # Embedded Wasender API key (from user)
@@ -29,9 +39,11 @@ EMERGENCY_NUMBERS = [n.strip() for n in os.getenv("EMERGENCY_NUMBERS", "").split
 COOLDOWN_SECONDS = int(os.getenv("COOLDOWN_SECONDS", "60"))
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "10"))
 
-# Retry/backoff settings
+# Retry/backoff settings (delay before retry n: random in [0, min(BACKOFF_MAX, BACKOFF_SECONDS * 2**n)])
 MAX_RETRIES = 2
 BACKOFF_SECONDS = 1
+BACKOFF_MAX = 8
+MAX_WORKERS = int(os.getenv("WASENDER_WORKERS", "8"))
 # ----------------------------
 
 # Internal state for cooldown
@@ -58,23 +70,143 @@ def _make_maps_link(lat, lon, label=None):
         q = f"{lat},{lon} ({label})"
     return f"https://www.google.com/maps/?q={urllib.parse.quote(q)}"
 
+def build_alert_message(lat: float = None, lon: float = None,
+                        event_label: str = "DANGER DETECTED", extra_text: str = None) -> str:
+    maps_link = _make_maps_link(lat, lon, event_label)
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    parts = [f"⚠️ {event_label}"]
+    if extra_text:
+        parts.append(extra_text)
+    parts.append(f"Location: {maps_link}")
+    parts.append(f"Time: {timestamp}")
+    return "\n".join(p for p in parts if p)
+
+def _retryable(status) -> bool:
+    # network errors, rate limiting and server errors are worth another try; other 4xx are not
+    return status is None or status == 429 or status >= 500
+
+
+class WasenderDispatcher:
+    """Long-lived sender: pooled keep-alive HTTP session + bounded worker pool."""
+
+    def __init__(self, api_key: str = None, send_url: str = None, max_workers: int = MAX_WORKERS,
+                 timeout: float = HTTP_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 backoff_base: float = BACKOFF_SECONDS, backoff_max: float = BACKOFF_MAX):
+        self.api_key = WASENDER_API_KEY if api_key is None else api_key
+        self.send_url = send_url or WASENDER_SEND_URL
+        self.timeout = timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wasender")
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": spreads the retries of concurrent sends instead of syncing them up
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def send_one(self, number: str, message: str) -> dict:
+        """
+        Blocking send with retries. Returns the delivery result:
+        {"to", "ok", "status", "response", "attempts", "elapsed"}
+        """
+        if not self.api_key:
+            return {"to": number, "ok": False, "status": None, "attempts": 0, "elapsed": 0.0,
+                    "response": "WASENDER_API_KEY is not configured"}
+        payload = {
+            "to": number,
+            "text": message
+        }
+        t0 = time.monotonic()
+        status, text = None, None
+        attempt = 0
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                resp = self.session.post(self.send_url, json=payload, timeout=self.timeout)
+                status, text = resp.status_code, resp.text
+                if 200 <= status < 300:
+                    print(f"[wasender] Sent to {number} (status {status})")
+                    break
+                print(f"[wasender] Non-2xx response to {number}: {status} / {text}")
+            except requests.RequestException as e:
+                status, text = None, str(e)
+                print(f"[wasender] Exception sending to {number}: {e}")
+            if not _retryable(status) or attempt > self.max_retries:
+                break
+            time.sleep(self._backoff(attempt - 1))
+        ok = status is not None and 200 <= status < 300
+        return {"to": number, "ok": ok, "status": status, "response": text,
+                "attempts": attempt, "elapsed": round(time.monotonic() - t0, 3)}
+
+    def submit(self, number: str, message: str):
+        """Queue one send; returns a Future resolving to its delivery result."""
+        return self._pool.submit(self.send_one, number, message)
+
+    def send(self, numbers, message: str, timeout: float = None) -> list:
+        """Send to all numbers concurrently and wait; one result per number (same order)."""
+        futures = [self.submit(n, message) for n in numbers]
+        done, _ = wait(futures, timeout=timeout)
+        return [f.result() if f in done else
+                {"to": n, "ok": False, "status": None, "response": "timed out", "attempts": 0, "elapsed": timeout}
+                for n, f in zip(numbers, futures)]
+
+    def send_async(self, numbers, message: str, on_done=None) -> list:
+        """
+        Fire-and-forget fan-out. Returns the per-number futures; on_done(results) is
+        called (from a worker thread) once every recipient has a result.
+        """
+        futures = [self.submit(n, message) for n in numbers]
+        if on_done is not None:
+            remaining = [len(futures)]
+            lock = threading.Lock()
+
+            def _one_done(_):
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    try:
+                        on_done([f.result() for f in futures])
+                    except Exception as e:
+                        print(f"[wasender] on_done callback error: {e}")
+
+            for f in futures:
+                f.add_done_callback(_one_done)
+        return futures
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.session.close()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher() -> WasenderDispatcher:
+    """Process-wide dispatcher (created on first use)."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = WasenderDispatcher()
+        return _dispatcher
+
 def _send_wasender_blocking(number: str, message: str):
     """
-    Blocking call to Wasender API.
+    Blocking single attempt through the shared session.
     Payload: {"to": "<number>", "text": "<message>"}
     """
     if not WASENDER_API_KEY:
         raise RuntimeError("WASENDER_API_KEY is not configured")
-
-    headers = {
-        "Authorization": f"Bearer {WASENDER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "to": number,
-        "text": message
-    }
-    resp = requests.post(WASENDER_SEND_URL, json=payload, headers=headers, timeout=HTTP_TIMEOUT)
+    d = get_dispatcher()
+    resp = d.session.post(d.send_url, json={"to": number, "text": message}, timeout=d.timeout)
     return resp.status_code, resp.text
 
 def send_wasender_alert_async(to_number: str = None,
@@ -82,11 +214,15 @@ def send_wasender_alert_async(to_number: str = None,
                               lon: float = None,
                               event_label: str = "DANGER DETECTED",
                               extra_text: str = None,
-                              send_to_all: bool = True):
+                              send_to_all: bool = True,
+                              use_cooldown: bool = True,
+                              on_done=None):
     """
     Asynchronously send a WhatsApp alert via Wasender (non-blocking).
     - to_number: single recipient (overrides EMERGENCY_NUMBERS if provided).
     - send_to_all: if True and EMERGENCY_NUMBERS present, send to all numbers.
+    - use_cooldown: set False if the caller already rate-limits (e.g. per session in app.py).
+    - on_done: optional callable(results) with one delivery result per recipient.
     Returns: (True, msg) or (False, reason)
     """
     # Determine targets
@@ -99,39 +235,17 @@ def send_wasender_alert_async(to_number: str = None,
     else:
         return False, "No emergency numbers configured (provide to_number or set EMERGENCY_NUMBERS env var)"
 
-    if not _can_send():
+    if use_cooldown and not _can_send():
         return False, "Cooldown active"
 
-    maps_link = _make_maps_link(lat, lon, event_label)
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    parts = [f"⚠️ {event_label}"]
-    if extra_text:
-        parts.append(extra_text)
-    parts.append(f"Location: {maps_link}")
-    parts.append(f"Time: {timestamp}")
-    final_msg = "\n".join(p for p in parts if p)
-
-    def _worker(targets_list, message_text):
-        _mark_sent()
-        for number in targets_list:
-            last_resp = None
-            sent_ok = False
-            for attempt in range(MAX_RETRIES + 1):
-                try:
-                    status, resp_text = _send_wasender_blocking(number, message_text)
-                    last_resp = (status, resp_text)
-                    if 200 <= status < 300:
-                        print(f"[wasender] Sent to {number} (status {status})")
-                        sent_ok = True
-                        break
-                    else:
-                        print(f"[wasender] Non-2xx response to {number}: {status} / {resp_text}")
-                except Exception as e:
-                    last_resp = ("exception", str(e))
-                    print(f"[wasender] Exception sending to {number}: {e}")
-                time.sleep(BACKOFF_SECONDS)
-            print(f"[wasender] Final result for {number}: {last_resp}")
-
-    thread = threading.Thread(target=_worker, args=(targets, final_msg), daemon=True)
-    thread.start()
+    final_msg = build_alert_message(lat, lon, event_label, extra_text)
+
+    def _log_results(results):
+        for r in results:
+            print(f"[wasender] Final result for {r['to']}: {r['status']} / {r['response']}")
+        if on_done is not None:
+            on_done(results)
+
+    _mark_sent()
+    get_dispatcher().send_async(targets, final_msg, on_done=_log_results)
     return True, f"Dispatched to {len(targets)} target(s)"